@@ -49,6 +49,10 @@ module kb_assembly_compare {
         workspace_name workspace_name;
 	data_obj_ref   input_assembly_refs;   /* Assemblies or AssemblySets */
         /*data_obj_name  output_name;*/
+	string         stats_format;          /* tsv, json, both or none (default tsv) */
+	bool           dump_contig_lengths;   /* sorted contig lengths as int64s (default 0) */
+	int            min_gap_length;        /* N-runs this long are scaffold gaps (default 10) */
+	bool           find_duplicate_contigs; /* count duplicate contigs by hash (default 0) */
     } Contig_Distribution_Compare_Params;
 
     typedef structure {
@@ -59,6 +63,25 @@ module kb_assembly_compare {
     funcdef run_contig_distribution_compare (Contig_Distribution_Compare_Params params)  returns (Contig_Distribution_Compare_Output) authentication required;
 
 
+    /* combine_assemblies()
+    **
+    **  Merge Assemblies into one non-redundant Assembly
+    */
+    typedef structure {
+        workspace_name workspace_name;
+	data_obj_ref   input_assembly_refs;   /* Assemblies or AssemblySets */
+	bool           remove_contained_contigs; /* also drop contigs within longer ones (default 1) */
+        data_obj_name  output_name;
+    } Combine_Assemblies_Params;
+
+    typedef structure {
+	data_obj_name report_name;
+	data_obj_ref  report_ref;
+    } Combine_Assemblies_Output;
+
+    funcdef run_combine_assemblies (Combine_Assemblies_Params params)  returns (Combine_Assemblies_Output) authentication required;
+
+
     /* benchmark_assemblies_against_genomes_with_MUMmer4()
     **
     **  Align benchmark genomes to assembly contigs
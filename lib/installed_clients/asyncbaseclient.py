@@ -0,0 +1,265 @@
+############################################################
+#
+# asyncio counterpart of baseclient.BaseClient
+#
+# Requires aiohttp.  All HTTP traffic of a client goes through one pooled
+# aiohttp session, and the number of requests in flight is bounded, so a job
+# can have hundreds of calls outstanding on one thread.
+#
+############################################################
+
+import asyncio as _asyncio
+import random as _random
+import traceback as _traceback
+
+try:
+    import aiohttp as _aiohttp
+except ImportError:
+    _aiohttp = None
+
+try:
+    # baseclient and this client are in a package
+    from .baseclient import BaseClient as _BaseClient  # @UnusedImport
+    from .baseclient import ServerError, _CHECK_JOB_RETRYS  # @UnusedImport
+    from .baseclient import _JobCheckSchedule, _job_result  # @UnusedImport
+    from . import jsoncodec as _jsoncodec  # @UnusedImport
+except ImportError:
+    # no they aren't
+    from baseclient import BaseClient as _BaseClient  # @Reimport
+    from baseclient import ServerError, _CHECK_JOB_RETRYS  # @Reimport
+    from baseclient import _JobCheckSchedule, _job_result  # @Reimport
+    import jsoncodec as _jsoncodec  # @Reimport
+
+_AJ = 'application/json'
+
+
+class AsyncBaseClient(_BaseClient):
+    '''
+    The KBase base client, asyncio version.  Takes the same arguments as
+    BaseClient, plus:
+    max_concurrency - the maximum number of requests in flight at once.
+        Further calls wait for a free slot. Default 50.
+    max_connections - the size of the HTTP connection pool. Default
+        max_concurrency.
+
+    _call(), call_method(), run_job() etc. are coroutines with the same
+    arguments as the BaseClient methods.  Call close() (or use the client as
+    an async context manager) when done to release the connection pool.
+    '''
+    def __init__(self, url=None, max_concurrency=50, max_connections=None,
+                 **kwargs):
+        super(AsyncBaseClient, self).__init__(url, **kwargs)
+        self._init_async(max_concurrency, max_connections)
+
+    @classmethod
+    def from_client(cls, client, max_concurrency=50, max_connections=None):
+        '''
+        Make an AsyncBaseClient with the url, token and settings of an
+        existing BaseClient.
+        '''
+        new = cls.__new__(cls)
+        new.__dict__.update(client.__dict__)
+        new._headers = dict(client._headers)
+        new._init_async(max_concurrency, max_connections)
+        return new
+
+    def _init_async(self, max_concurrency, max_connections):
+        if _aiohttp is None:
+            raise ImportError('aiohttp is required for AsyncBaseClient')
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        self.max_concurrency = int(max_concurrency)
+        self.max_connections = int(max_connections or max_concurrency)
+        self._session = None
+        self._semaphore = None
+
+    async def _get_session(self):
+        # the session and semaphore must be created inside the running loop
+        if self._session is None or self._session.closed:
+            connector = _aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = _aiohttp.ClientSession(
+                connector=connector,
+                timeout=_aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = _asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _call(self, url, method, params, context=None):
+        arg_hash = {'method': method,
+                    'params': params,
+                    'version': '1.1',
+                    'id': str(_random.random())[2:]
+                    }
+        if context:
+            if type(context) is not dict:
+                raise ValueError('context is not type dict as required.')
+            arg_hash['context'] = context
+
+        body = self._codec.dumpb(arg_hash)
+        headers = self._headers
+        if (self.compress_requests and
+                len(body) >= _jsoncodec.COMPRESS_MIN_BYTES):
+            body = _jsoncodec.gzip_compress(body)
+            headers = dict(self._headers)
+            headers['Content-Encoding'] = _jsoncodec.GZIP
+        post_kwargs = {}
+        if self.trust_all_ssl_certificates:
+            post_kwargs['ssl'] = False
+        session = await self._get_session()
+        async with self._semaphore:
+            # aiohttp transparently decompresses gzip encoded responses
+            async with session.post(url, data=body, headers=headers,
+                                    **post_kwargs) as ret:
+                content = await ret.read()
+                if ret.status == 500:
+                    # the mimetype, without any charset
+                    if ret.content_type == _AJ:
+                        err = self._codec.loads(content)
+                        if 'error' in err:
+                            raise ServerError(**err['error'])
+                        else:
+                            raise ServerError('Unknown', 0,
+                                              content.decode('utf-8'))
+                    else:
+                        raise ServerError('Unknown', 0,
+                                          content.decode('utf-8'))
+                if not ret.ok:
+                    ret.raise_for_status()
+        resp = self._codec.loads(content)
+        if 'result' not in resp:
+            raise ServerError('Unknown', 0, 'An unknown server error occurred')
+        if not resp['result']:
+            return
+        if len(resp['result']) == 1:
+            return resp['result'][0]
+        return resp['result']
+
+    async def _get_service_url(self, service_method, service_version):
+        if not self.lookup_url:
+            return self.url
+        service, _ = service_method.split('.')
+        service_status_ret = await self._call(
+            self.url, 'ServiceWizard.get_service_status',
+            [{'module_name': service, 'version': service_version}])
+        return service_status_ret['url']
+
+    async def _check_job(self, service, job_id):
+        return await self._call(self.url, service + '._check_job', [job_id])
+
+    async def _submit_job(self, service_method, args, service_ver=None,
+                          context=None):
+        context = self._set_up_context(service_ver, context)
+        mod, meth = service_method.split('.')
+        return await self._call(self.url, mod + '._' + meth + '_submit',
+                                args, context)
+
+    async def run_job(self, service_method, args, service_ver=None,
+                      context=None, expected_runtime=None):
+        '''
+        Run a SDK method asynchronously.  The job state is checked on the
+        same schedule as BaseClient.run_job, without blocking the loop.
+        Required arguments:
+        service_method - the service and method to run, e.g. myserv.mymeth.
+        args - a list of arguments to the method.
+        Optional arguments:
+        service_ver - the version of the service to run, e.g. a git hash
+            or dev/beta/release.
+        context - the rpc context dict.
+        expected_runtime - a guess at the job runtime in seconds, used by
+            the adaptive job check strategy.
+        '''
+        mod, _ = service_method.split('.')
+        job_id = await self._submit_job(service_method, args, service_ver,
+                                        context)
+        schedule = _JobCheckSchedule(self, expected_runtime)
+        job_state = None
+        check_job_failures = 0
+        while check_job_failures < _CHECK_JOB_RETRYS:
+            await _asyncio.sleep(schedule.next_wait(job_state))
+
+            try:
+                job_state = await self._check_job(mod, job_id)
+            except (_aiohttp.ClientConnectionError, _asyncio.TimeoutError):
+                _traceback.print_exc()
+                check_job_failures += 1
+                continue
+
+            if job_state['finished']:
+                return _job_result(job_state)
+        raise RuntimeError("_check_job failed {} times and exceeded limit".format(
+            check_job_failures))
+
+    async def run_jobs(self, jobs, service_ver=None, context=None,
+                       expected_runtime=None):
+        '''
+        Run several SDK methods asynchronously and wait on them together.
+        An async generator yielding (index, result) tuples in the order the
+        jobs finish, where index is the position of the job in jobs.
+        Required arguments:
+        jobs - a list of (service_method, args) tuples.
+        Optional arguments are as for run_job() and apply to every job.
+        '''
+        async def _run(i, service_method, args):
+            return i, await self.run_job(service_method, args, service_ver,
+                                         context, expected_runtime)
+        tasks = [_asyncio.ensure_future(_run(i, service_method, args))
+                 for i, (service_method, args) in enumerate(jobs)]
+        try:
+            for next_done in _asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call_method(self, service_method, args, service_ver=None,
+                          context=None):
+        '''
+        Call a standard or dynamic service synchronously (from the point of
+        view of the caller's coroutine).
+        Required arguments:
+        service_method - the service and method to run, e.g. myserv.mymeth.
+        args - a list of arguments to the method.
+        Optional arguments:
+        service_ver - the version of the service to run, e.g. a git hash
+            or dev/beta/release.
+        context - the rpc context dict.
+        '''
+        url = await self._get_service_url(service_method, service_ver)
+        context = self._set_up_context(service_ver, context)
+        return await self._call(url, service_method, args, context)
+
+
+def use_async(client, max_concurrency=50, max_connections=None):
+    '''
+    Switch a generated client (e.g. Workspace, DataFileUtil, AssemblyUtil,
+    SetAPI) to the asyncio transport.  Its methods then return coroutines:
+
+        au = use_async(AssemblyUtil(callback_url, token=token))
+        paths = await asyncio.gather(*[au.get_assembly_as_fasta({'ref': r})
+                                       for r in refs])
+        await close_async(au)
+
+    At most max_concurrency requests are in flight at once.  Returns the
+    client.
+    '''
+    client._client = AsyncBaseClient.from_client(
+        client._client, max_concurrency=max_concurrency,
+        max_connections=max_connections)
+    return client
+
+
+async def close_async(client):
+    '''Release the connection pool of a client switched with use_async().'''
+    await client._client.close()
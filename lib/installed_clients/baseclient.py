@@ -7,6 +7,7 @@
 
 from __future__ import print_function
 
+import heapq as _heapq
 import json as _json
 import requests as _requests
 import random as _random
@@ -26,10 +27,20 @@ except ImportError:
     from urlparse import urlparse as _urlparse  # py2
 import time
 
+try:
+    # jsoncodec and this client are in a package
+    from . import jsoncodec as _jsoncodec  # @UnusedImport
+except ImportError:
+    # no they aren't
+    import jsoncodec as _jsoncodec  # @Reimport
+
 _CT = 'content-type'
 _AJ = 'application/json'
 _URL_SCHEME = frozenset(['http', 'https'])
 _CHECK_JOB_RETRYS = 3
+_CHECK_STRATEGY_ENV = 'KB_ASYNC_JOB_CHECK_STRATEGY'
+_EXPONENTIAL = 'exponential'
+_ADAPTIVE = 'adaptive'
 
 
 def _get_token(user_id, password, auth_svc):
@@ -97,6 +108,68 @@ class _JSONObjectEncoder(_json.JSONEncoder):
         return _json.JSONEncoder.default(self, obj)
 
 
+def _job_result(job_state):
+    if not job_state['result']:
+        return
+    if len(job_state['result']) == 1:
+        return job_state['result'][0]
+    return job_state['result']
+
+
+def _estimate_remaining(job_state, elapsed, expected_runtime):
+    # seconds until the job should finish, or None if there is nothing to go
+    # on.  Job reported values win over the caller's expected runtime.
+    if job_state:
+        if job_state.get('estimated_remaining') is not None:
+            return max(float(job_state['estimated_remaining']), 0.0)
+        if job_state.get('estimated_runtime') is not None:
+            return max(float(job_state['estimated_runtime']) - elapsed, 0.0)
+        progress = job_state.get('progress')
+        if progress:
+            progress = float(progress)
+            if progress > 1:
+                progress /= 100.0  # percent
+            if 0 < progress < 1:
+                return elapsed * (1 - progress) / progress
+    if expected_runtime is not None:
+        return max(float(expected_runtime) - elapsed, 0.0)
+    return None
+
+
+class _JobCheckSchedule(object):
+    '''
+    The waits between _check_job calls for one job.
+    exponential - start at async_job_check_time and scale by
+        async_job_check_time_scale_percent up to async_job_check_max_time.
+    adaptive - wait async_job_latency_percent of the time the job has run so
+        far, or half the estimated remaining time if the job reports progress
+        or an estimated runtime (or the caller gave an expected_runtime),
+        whichever is longer.  The wait is never shorter than
+        async_job_check_time and never longer than async_job_max_latency, so
+        a finished job goes unnoticed for at most async_job_max_latency.
+    '''
+    def __init__(self, client, expected_runtime=None):
+        self.client = client
+        self.expected_runtime = expected_runtime
+        self.start = time.time()
+        self.wait = client.async_job_check_time
+
+    def next_wait(self, job_state=None):
+        c = self.client
+        if c.async_job_check_strategy != _ADAPTIVE:
+            wait = self.wait
+            self.wait = min(self.wait * c.async_job_check_time_scale_percent /
+                            100.0, c.async_job_check_max_time)
+            return wait
+        elapsed = time.time() - self.start
+        wait = elapsed * c.async_job_latency_percent / 100.0
+        remaining = _estimate_remaining(job_state, elapsed,
+                                        self.expected_runtime)
+        if remaining is not None:
+            wait = max(wait, 0.5 * remaining)
+        return min(max(wait, c.async_job_check_time), c.async_job_max_latency)
+
+
 class BaseClient(object):
     '''
     The KBase base client.
@@ -120,6 +193,21 @@ class BaseClient(object):
     lookup_url - set to true when contacting KBase dynamic services.
     async_job_check_time_ms - the wait time between checking job state for
         asynchronous jobs run with the run_job method.
+    async_job_check_strategy - how the wait between job state checks is
+        chosen: 'exponential' (the default, scaled by
+        async_job_check_time_scale_percent up to async_job_check_max_time_ms)
+        or 'adaptive' (driven by job progress and runtime, see
+        async_job_latency_percent and async_job_max_latency_ms). The default
+        can be set with the KB_ASYNC_JOB_CHECK_STRATEGY environment variable.
+    async_job_latency_percent - for the adaptive strategy, the wait between
+        checks as a percentage of the time the job has run so far.
+    async_job_max_latency_ms - for the adaptive strategy, the longest wait
+        between checks, i.e. the longest a finished job can go unnoticed.
+    compress_requests - set to True to gzip request bodies larger than
+        jsoncodec.COMPRESS_MIN_BYTES. The service must accept
+        Content-Encoding: gzip.
+    json_codec - the name of the JSON codec to use (orjson, ujson or json).
+        Default: the fastest one installed.
     '''
     def __init__(
             self, url=None, timeout=30 * 60, user_id=None,
@@ -129,7 +217,12 @@ class BaseClient(object):
             lookup_url=False,
             async_job_check_time_ms=100,
             async_job_check_time_scale_percent=150,
-            async_job_check_max_time_ms=300000):
+            async_job_check_max_time_ms=300000,
+            compress_requests=False,
+            json_codec=None,
+            async_job_check_strategy=None,
+            async_job_latency_percent=10,
+            async_job_max_latency_ms=30000):
         if url is None:
             raise ValueError('A url is required')
         scheme, _, _, _, _, _ = _urlparse(url)
@@ -144,6 +237,17 @@ class BaseClient(object):
         self.async_job_check_time_scale_percent = (
             async_job_check_time_scale_percent)
         self.async_job_check_max_time = async_job_check_max_time_ms / 1000.0
+        if async_job_check_strategy is None:
+            async_job_check_strategy = _os.environ.get(_CHECK_STRATEGY_ENV,
+                                                       _EXPONENTIAL)
+        if async_job_check_strategy not in (_EXPONENTIAL, _ADAPTIVE):
+            raise ValueError('Unknown async_job_check_strategy: ' +
+                             str(async_job_check_strategy))
+        self.async_job_check_strategy = async_job_check_strategy
+        self.async_job_latency_percent = async_job_latency_percent
+        self.async_job_max_latency = async_job_max_latency_ms / 1000.0
+        self.compress_requests = compress_requests
+        self._codec = _jsoncodec.get_codec(json_codec)
         # token overrides user_id and password
         if token is not None:
             self._headers['AUTHORIZATION'] = token
@@ -175,14 +279,21 @@ class BaseClient(object):
                 raise ValueError('context is not type dict as required.')
             arg_hash['context'] = context
 
-        body = _json.dumps(arg_hash, cls=_JSONObjectEncoder)
-        ret = _requests.post(url, data=body, headers=self._headers,
+        body = self._codec.dumpb(arg_hash)
+        headers = self._headers
+        if (self.compress_requests and
+                len(body) >= _jsoncodec.COMPRESS_MIN_BYTES):
+            body = _jsoncodec.gzip_compress(body)
+            headers = dict(self._headers)
+            headers['Content-Encoding'] = _jsoncodec.GZIP
+        # requests transparently decompresses gzip encoded responses
+        ret = _requests.post(url, data=body, headers=headers,
                              timeout=self.timeout,
                              verify=not self.trust_all_ssl_certificates)
         ret.encoding = 'utf-8'
         if ret.status_code == 500:
             if ret.headers.get(_CT) == _AJ:
-                err = ret.json()
+                err = self._codec.loads(ret.content)
                 if 'error' in err:
                     raise ServerError(**err['error'])
                 else:
@@ -191,7 +302,7 @@ class BaseClient(object):
                 raise ServerError('Unknown', 0, ret.text)
         if not ret.ok:
             ret.raise_for_status()
-        resp = ret.json()
+        resp = self._codec.loads(ret.content)
         if 'result' not in resp:
             raise ServerError('Unknown', 0, 'An unknown server error occurred')
         if not resp['result']:
@@ -226,7 +337,8 @@ class BaseClient(object):
         return self._call(self.url, mod + '._' + meth + '_submit',
                           args, context)
 
-    def run_job(self, service_method, args, service_ver=None, context=None):
+    def run_job(self, service_method, args, service_ver=None, context=None,
+                expected_runtime=None):
         '''
         Run a SDK method asynchronously.
         Required arguments:
@@ -236,18 +348,16 @@ class BaseClient(object):
         service_ver - the version of the service to run, e.g. a git hash
             or dev/beta/release.
         context - the rpc context dict.
+        expected_runtime - a guess at the job runtime in seconds, used by
+            the adaptive job check strategy.
         '''
         mod, _ = service_method.split('.')
         job_id = self._submit_job(service_method, args, service_ver, context)
-        async_job_check_time = self.async_job_check_time
+        schedule = _JobCheckSchedule(self, expected_runtime)
+        job_state = None
         check_job_failures = 0
         while check_job_failures < _CHECK_JOB_RETRYS:
-            time.sleep(async_job_check_time)
-            async_job_check_time = (async_job_check_time *
-                                    self.async_job_check_time_scale_percent /
-                                    100.0)
-            if async_job_check_time > self.async_job_check_max_time:
-                async_job_check_time = self.async_job_check_max_time
+            time.sleep(schedule.next_wait(job_state))
 
             try:
                 job_state = self._check_job(mod, job_id)
@@ -257,14 +367,54 @@ class BaseClient(object):
                 continue
 
             if job_state['finished']:
-                if not job_state['result']:
-                    return
-                if len(job_state['result']) == 1:
-                    return job_state['result'][0]
-                return job_state['result']
+                return _job_result(job_state)
         raise RuntimeError("_check_job failed {} times and exceeded limit".format(
             check_job_failures))
 
+    def run_jobs(self, jobs, service_ver=None, context=None,
+                 expected_runtime=None):
+        '''
+        Run several SDK methods asynchronously and wait on them together.
+        All jobs are submitted up front, then each job is checked on its own
+        schedule.  This is a generator yielding (index, result) tuples in the
+        order the jobs finish, where index is the position of the job in jobs.
+        Required arguments:
+        jobs - a list of (service_method, args) tuples.
+        Optional arguments are as for run_job() and apply to every job.
+        '''
+        pending = []
+        for i, (service_method, args) in enumerate(jobs):
+            mod, _ = service_method.split('.')
+            job_id = self._submit_job(service_method, args, service_ver,
+                                      context)
+            schedule = _JobCheckSchedule(self, expected_runtime)
+            _heapq.heappush(pending, (time.time() + schedule.next_wait(), i,
+                                      mod, job_id, schedule, 0))
+        while pending:
+            check_at, i, mod, job_id, schedule, check_job_failures = \
+                _heapq.heappop(pending)
+            delay = check_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            job_state = None
+            try:
+                job_state = self._check_job(mod, job_id)
+            except (ConnectionError, ProtocolError):
+                _traceback.print_exc()
+                check_job_failures += 1
+                if check_job_failures >= _CHECK_JOB_RETRYS:
+                    raise RuntimeError(
+                        "_check_job failed {} times and exceeded limit".format(
+                            check_job_failures))
+            else:
+                if job_state['finished']:
+                    yield i, _job_result(job_state)
+                    continue
+            _heapq.heappush(pending, (time.time() + schedule.next_wait(job_state),
+                                      i, mod, job_id, schedule,
+                                      check_job_failures))
+
     def call_method(self, service_method, args, service_ver=None,
                     context=None):
         '''
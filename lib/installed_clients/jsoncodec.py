@@ -0,0 +1,205 @@
+############################################################
+#
+# JSON codec used by the JSON-RPC clients and server.
+#
+# A faster JSON library (orjson, then ujson) is used when one is installed,
+# otherwise the standard library json module is used.  The codec can be
+# forced with the KB_JSON_CODEC environment variable (orjson, ujson, json).
+#
+# Also contains helpers for gzip compressed request and response bodies.
+#
+############################################################
+
+import gzip as _gzip
+import json as _json
+import os as _os
+
+GZIP = 'gzip'
+GZIP_MAGIC = b'\x1f\x8b'
+# bodies smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = 16 * 1024
+CODEC_ENV = 'KB_JSON_CODEC'
+
+
+def _default(obj):
+    if isinstance(obj, set):
+        return list(obj)
+    if isinstance(obj, frozenset):
+        return list(obj)
+    if hasattr(obj, 'toJSONable'):
+        return obj.toJSONable()
+    raise TypeError('Object of type ' + type(obj).__name__ +
+                    ' is not JSON serializable')
+
+
+class _JSONObjectEncoder(_json.JSONEncoder):
+
+    def default(self, obj):
+        try:
+            return _default(obj)
+        except TypeError:
+            return _json.JSONEncoder.default(self, obj)
+
+
+def _std_dumps(obj):
+    return _json.dumps(obj, cls=_JSONObjectEncoder)
+
+
+def _std_loads(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return _json.loads(data)
+
+
+class JSONCodec(object):
+    '''
+    The standard library codec, and the base class for the faster ones.
+    dumps() returns a str, dumpb() returns utf-8 encoded bytes, and loads()
+    accepts either.
+    '''
+    name = 'json'
+
+    def dumps(self, obj):
+        return _std_dumps(obj)
+
+    def dumpb(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        return _std_loads(data)
+
+
+class _OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self, orjson):
+        self._orjson = orjson
+        self._opts = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(self, obj):
+        try:
+            return self._orjson.dumps(obj, default=_default,
+                                      option=self._opts)
+        except TypeError:
+            # e.g. ints wider than 64 bits, which the stdlib handles
+            return _std_dumps(obj).encode('utf-8')
+
+    def dumps(self, obj):
+        return self.dumpb(obj).decode('utf-8')
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except ValueError:
+            # e.g. NaN / Infinity, accepted by the stdlib parser
+            return _std_loads(data)
+
+
+class _UjsonCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self, ujson):
+        self._ujson = ujson
+
+    def dumps(self, obj):
+        try:
+            return self._ujson.dumps(obj, default=_default,
+                                     ensure_ascii=False)
+        except (TypeError, OverflowError):
+            return _std_dumps(obj)
+
+    def loads(self, data):
+        try:
+            return self._ujson.loads(data)
+        except ValueError:
+            return _std_loads(data)
+
+
+def _load_codec(name):
+    if name == 'orjson':
+        try:
+            import orjson
+            return _OrjsonCodec(orjson)
+        except ImportError:
+            return None
+    if name == 'ujson':
+        try:
+            import ujson
+            return _UjsonCodec(ujson)
+        except ImportError:
+            return None
+    if name == 'json':
+        return JSONCodec()
+    raise ValueError('Unknown JSON codec: ' + str(name))
+
+
+_codecs = {}
+
+
+def get_codec(name=None):
+    '''
+    Return the JSON codec to use.  With no name the codec named in the
+    KB_JSON_CODEC environment variable is used, and if that isn't set the
+    fastest installed codec is picked.
+    '''
+    if name is None:
+        name = _os.environ.get(CODEC_ENV)
+    if name is None:
+        if None not in _codecs:
+            for candidate in ('orjson', 'ujson', 'json'):
+                codec = _load_codec(candidate)
+                if codec is not None:
+                    _codecs[None] = codec
+                    break
+        return _codecs[None]
+    if name not in _codecs:
+        codec = _load_codec(name)
+        if codec is None:
+            raise ImportError('JSON codec ' + name + ' is not installed')
+        _codecs[name] = codec
+    return _codecs[name]
+
+
+def dumps(obj):
+    return get_codec().dumps(obj)
+
+
+def dumpb(obj):
+    return get_codec().dumpb(obj)
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+def gzip_compress(data, compresslevel=5):
+    return _gzip.compress(data, compresslevel=compresslevel)
+
+
+def gzip_decompress(data):
+    return _gzip.decompress(data)
+
+
+def maybe_gzip_decompress(data):
+    '''Decompress data if it starts with the gzip magic bytes.'''
+    if data[:2] == GZIP_MAGIC:
+        return _gzip.decompress(data)
+    return data
+
+
+def accepts_gzip(accept_encoding):
+    '''True if an Accept-Encoding header value allows a gzip response.'''
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(','):
+        parts = coding.strip().split(';')
+        if parts[0].strip().lower() not in (GZIP, 'x-gzip', '*'):
+            continue
+        qvals = [p.strip()[2:] for p in parts[1:] if p.strip().startswith('q=')]
+        try:
+            if qvals and float(qvals[0]) == 0:
+                continue
+        except ValueError:
+            continue
+        return True
+    return False
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Command line contig stats, filtering, comparison and combining of FASTA files.
+
+Runs the computations of the app methods without KBase services.  Inputs
+are FASTA files, or directories searched for FASTA files, and are processed
+on a pool of worker processes:
+
+    python -m kb_assembly_compare.cli stats assemblies/ --jobs 16 > stats.tsv
+    python -m kb_assembly_compare.cli filter a.fa b.fa --min-contig-length 1000 \
+        --output-dir filtered
+    python -m kb_assembly_compare.cli compare a.fa b.fa --output-dir report
+    python -m kb_assembly_compare.cli combine a.fa b.fa --output combined.fa
+"""
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from kb_assembly_compare import (  # noqa: E402
+    contig_combine, contig_compare, contig_stats, fasta_chunks,
+    parallel_scan, scoring, stats_export)
+
+FASTA_EXTENSIONS = ('.fa', '.fasta', '.fna', '.fas', '.ffn', '.contigs')
+
+
+def find_fasta_files(paths):
+    """The FASTA files among paths, with directories searched recursively."""
+    fasta_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for dir_path, _, files in os.walk(path):
+                for file_name in files:
+                    if file_name.lower().endswith(FASTA_EXTENSIONS):
+                        found.append(os.path.join(dir_path, file_name))
+            fasta_paths.extend(sorted(found))
+        elif os.path.isfile(path):
+            fasta_paths.append(path)
+        else:
+            raise ValueError("No such file or directory: "+path)
+    if not fasta_paths:
+        raise ValueError("No FASTA files found")
+    return fasta_paths
+
+
+def assembly_name(path):
+    """The file name without its FASTA extension."""
+    name = os.path.basename(path)
+    root, ext = os.path.splitext(name)
+    if ext.lower() in FASTA_EXTENSIONS:
+        return root
+    return name
+
+
+def stats_scores(all_stats, percs=contig_stats.PERCS,
+                 len_buckets=contig_stats.LEN_BUCKETS):
+    """
+    The scoring.score_assemblies() of the assemblies' assembly_stats(), as
+    colored in the report table.
+    """
+    return scoring.score_assemblies(
+        [stats['max_len'] for stats in all_stats],
+        {perc: [stats['N'].get(perc, 0) for stats in all_stats]
+         for perc in percs},
+        {perc: [stats['L'].get(perc, 0) for stats in all_stats]
+         for perc in percs},
+        [stats['summary_stats'] for stats in all_stats],
+        [stats['cumulative_len_stats'] for stats in all_stats],
+        percs, len_buckets)
+
+
+def _chunk_bytes(args):
+    if args.chunk_mb:
+        return int(args.chunk_mb * 1024 * 1024)
+    return parallel_scan.scan_chunk_bytes()
+
+
+def run_stats(args, out):
+    paths = find_fasta_files(args.inputs)
+    all_stats = [contig_compare.assembly_stats(lens) for lens in
+                 parallel_scan.scan_contig_lengths(paths, args.jobs, None,
+                                                   _chunk_bytes(args))]
+    columns = stats_export.stats_columns()
+    rows = [stats_export.stats_row(assembly_name(path), stats)
+            for path, stats in zip(paths, all_stats)]
+    if args.colors:
+        scores = stats_scores(all_stats)
+        colors = scoring.cell_colors(scores).T.tolist()
+    if args.format == 'json':
+        records = [dict(zip(columns, row), path=path)
+                   for path, row in zip(paths, rows)]
+        if args.colors:
+            for record, ass_colors in zip(records, colors):
+                record['colors'] = dict(zip(scores['metrics'], ass_colors))
+        json.dump(records, out, indent=2)
+        out.write("\n")
+    else:
+        if args.colors:
+            columns = columns + [metric+'_color'
+                                 for metric in scores['metrics']]
+            rows = [row + ass_colors for row, ass_colors in zip(rows, colors)]
+        out.write("\t".join(columns)+"\n")
+        for row in rows:
+            out.write("\t".join(str(val) for val in row)+"\n")
+
+
+def run_filter(args, out):
+    paths = find_fasta_files(args.inputs)
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+    filtered_paths = [os.path.join(args.output_dir, assembly_name(path) +
+                                   ".min_contig_length" +
+                                   str(args.min_contig_length)+"bp.fa")
+                      for path in paths]
+    counts = parallel_scan.filter_assemblies(paths, filtered_paths,
+                                             args.min_contig_length, args.jobs,
+                                             _chunk_bytes(args))
+    out.write("\t".join(['assembly', 'original_contigs', 'filtered_contigs',
+                         'output'])+"\n")
+    for path, filtered_path, (original_count, filtered_count) in \
+            zip(paths, filtered_paths, counts):
+        if filtered_count == 0:
+            os.remove(filtered_path)
+            filtered_path = ''
+        out.write("\t".join([assembly_name(path), str(original_count),
+                             str(filtered_count), filtered_path])+"\n")
+
+
+def run_compare(args, out):
+    stats_formats = stats_export.parse_stats_formats(args.stats_format)
+    if args.min_gap_length < 1:
+        raise ValueError("--min-gap-length must be at least 1")
+    paths = find_fasta_files(args.inputs)
+    names = [assembly_name(path) for path in paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Assembly file names must be unique")
+    scans = parallel_scan.scan_contig_composition(paths, args.jobs, None,
+                                                  _chunk_bytes(args),
+                                                  args.min_gap_length,
+                                                  args.duplicates)
+    lens = [scan['lens'] for scan in scans]
+    for name, ass_lens in zip(names, lens):
+        if not ass_lens:
+            raise ValueError("Assembly "+name+" has no contigs")
+    dist = contig_compare.compare_contig_distributions(lens,
+                                                       composition=scans)
+    out.write(contig_compare.distribution_report_text(names, dist))
+    if args.output_dir:
+        if not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+        rendered = contig_compare.render_distribution_report(
+            names, dist, args.output_dir)
+        out.write("HTML report: " +
+                  os.path.join(args.output_dir, rendered['html_file'])+"\n")
+        for stats_file, _ in stats_export.export_stats(
+                names, dist, args.output_dir, stats_formats,
+                args.dump_lengths):
+            out.write("Stats file: " +
+                      os.path.join(args.output_dir, stats_file)+"\n")
+
+
+def run_combine(args, out):
+    paths = find_fasta_files(args.inputs)
+    names = [assembly_name(path) for path in paths]
+    output_dir = os.path.dirname(args.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    combined = contig_combine.combine_assemblies(
+        paths, names, args.output, not args.keep_contained, args.jobs, None,
+        _chunk_bytes(args), args.kmer_length, args.kmer_scale)
+    out.write(contig_combine.combine_report_text(names, combined))
+    out.write("Combined assembly: "+args.output+"\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m kb_assembly_compare.cli',
+        description=__doc__.strip().split('\n')[0])
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    def _add_common(subparser):
+        subparser.add_argument('inputs', nargs='+',
+                               help='FASTA files or directories of them')
+        subparser.add_argument('--jobs', '-j', type=int,
+                               default=parallel_scan.scan_workers(),
+                               help='worker processes (default: all cores, '
+                               'or KB_SCAN_WORKERS)')
+        subparser.add_argument('--chunk-mb', type=float,
+                               help='split larger files into chunks of this '
+                               'size, scanned in parallel (default: 64, or '
+                               'KB_SCAN_CHUNK_MB)')
+
+    stats_parser = subparsers.add_parser(
+        'stats', help='one row of length statistics per assembly')
+    _add_common(stats_parser)
+    stats_parser.add_argument('--format', choices=['tsv', 'json'],
+                              default='tsv')
+    stats_parser.add_argument('--colors', action='store_true',
+                              help='add the best to worst color of each '
+                              'statistic, as in the report table')
+    stats_parser.set_defaults(run=run_stats)
+
+    filter_parser = subparsers.add_parser(
+        'filter', help='keep the contigs of at least a minimum length')
+    _add_common(filter_parser)
+    filter_parser.add_argument('--min-contig-length', type=int, required=True)
+    filter_parser.add_argument('--output-dir', required=True)
+    filter_parser.set_defaults(run=run_filter)
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare contig length distributions, as in the '
+        'Compare Assembled Contig Distributions app')
+    _add_common(compare_parser)
+    compare_parser.add_argument('--output-dir',
+                                help='write the HTML report, figures and '
+                                'stats files here')
+    compare_parser.add_argument('--stats-format', default='tsv',
+                                help='stats files to write with the report: '
+                                'tsv, json, both or none (default: tsv)')
+    compare_parser.add_argument('--dump-lengths', action='store_true',
+                                help='also write the sorted contig lengths '
+                                'as int64s ('+stats_export.LENS_FILE+')')
+    compare_parser.add_argument(
+        '--min-gap-length', type=int,
+        default=fasta_chunks.DEFAULT_MIN_GAP_LENGTH,
+        help='N-runs of at least this many bp are scaffold gaps (default: ' +
+        str(fasta_chunks.DEFAULT_MIN_GAP_LENGTH)+')')
+    compare_parser.add_argument('--duplicates', action='store_true',
+                                help='count the duplicate contigs within '
+                                'and across the assemblies, reverse '
+                                'complements included')
+    compare_parser.set_defaults(run=run_compare)
+
+    combine_parser = subparsers.add_parser(
+        'combine', help='merge the assemblies into one without duplicate or '
+        'contained contigs, as in the Combine Assemblies app')
+    _add_common(combine_parser)
+    combine_parser.add_argument('--output', required=True,
+                                help='the combined FASTA file')
+    combine_parser.add_argument('--keep-contained', action='store_true',
+                                help='only remove exact duplicates, not the '
+                                'contigs contained in longer ones')
+    combine_parser.add_argument(
+        '--kmer-length', type=int, default=fasta_chunks.DEFAULT_KMER_LENGTH,
+        help='k-mer length of the containment index, up to 32 (default: ' +
+        str(fasta_chunks.DEFAULT_KMER_LENGTH)+')')
+    combine_parser.add_argument(
+        '--kmer-scale', type=int, default=fasta_chunks.DEFAULT_KMER_SCALE,
+        help='index about one in this many k-mers; higher uses less memory '
+        'but leaves more short contigs unchecked (default: ' +
+        str(fasta_chunks.DEFAULT_KMER_SCALE)+')')
+    combine_parser.set_defaults(run=run_combine)
+    return parser
+
+
+def main(argv=None, out=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args, out or sys.stdout)
+    except ValueError as e:
+        sys.stderr.write("ERROR: "+str(e)+"\n")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Combining assemblies into one non-redundant assembly, from local FASTA files.
+
+This is the computation behind run_combine_assemblies without any KBase
+services.  The assemblies are read through memory maps a contig at a time
+and their sequence is never held: each contig is kept in memory as its
+record offset, length and 64 bit canonical digest, and each distinct contig
+as a sample of its k-mer hashes.
+
+1. The contigs are keyed in parallel (parallel_scan.scan_contig_keys()),
+   and all but the first copy of each sequence, reverse complements
+   included, are dropped (contig_index.first_copies()).
+2. With remove_contained, about one in kmer_scale of the canonical k-mers
+   of the distinct contigs are hashed (parallel_scan.sample_contig_kmers()),
+   and the contigs that lie within a longer one are found from an index of
+   the hashes and confirmed by finding the one sequence in the other
+   (contig_index.contained_contigs()).
+3. The remaining contigs are copied to one FASTA file in input order, their
+   headers prefixed by the name of their assembly.
+
+    combined = combine_assemblies(paths, names, 'combined.fa')
+    print(combine_report_text(names, combined))
+
+Memory is about 24 bytes per contig, plus about 24 bytes per sampled k-mer
+while looking for contained contigs (0.25 bytes per distinct bp with the
+default kmer_scale).  Contigs without any sampled k-mer, mostly those under
+a few kmer_scale bp, are kept without looking for a contig containing them.
+"""
+from contextlib import ExitStack
+
+import numpy as np
+
+from kb_assembly_compare import contig_index, fasta_chunks, parallel_scan
+
+# the per assembly counts of combine_assemblies(), each with its bp
+COMBINE_COUNTS = ('contigs', 'duplicates', 'contained', 'combined')
+
+
+def header_prefixes(assembly_names):
+    """
+    The prefix of the contig headers of each assembly in the combined
+    assembly: its name without whitespace, numbered if names repeat.
+    """
+    names = ['_'.join(name.split()) for name in assembly_names]
+    repeated = set(name for name in names if names.count(name) > 1)
+    return [(name+'_'+str(ass_i+1) if name in repeated else name)+'.'
+            for ass_i, name in enumerate(names)]
+
+
+def _contained(fasta_paths, files, offsets, lens, kmer_counts, kmer_hashes):
+    """
+    contig_index.contained_contigs() of the distinct contigs at the offsets
+    of the files, confirmed from their sequences.  The candidates come in
+    the order of their longest containing contig, so that contig's sequence
+    is read once for all the contigs in it.
+    """
+    with ExitStack() as stack:
+        maps = {}
+        longer_seq = [None, None]
+
+        def _sequence(contig):
+            file_i = int(files[contig])
+            if file_i not in maps:
+                maps[file_i] = stack.enter_context(
+                    fasta_chunks.mapped_file(fasta_paths[file_i]))
+            return fasta_chunks.upper_sequence(fasta_chunks.read_contig(
+                maps[file_i], int(offsets[contig]))[1])
+
+        def _is_contained(contig, longer_contig):
+            if longer_seq[0] != longer_contig:
+                longer_seq[:] = [longer_contig, _sequence(longer_contig)]
+            return fasta_chunks.contains_sequence(longer_seq[1],
+                                                  _sequence(contig))
+
+        return contig_index.contained_contigs(lens, kmer_counts, kmer_hashes,
+                                              _is_contained)
+
+
+def combine_assemblies(fasta_paths, assembly_names, combined_path,
+                       remove_contained=True, workers=1, tmp_dir=None,
+                       chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES,
+                       kmer_length=fasta_chunks.DEFAULT_KMER_LENGTH,
+                       kmer_scale=fasta_chunks.DEFAULT_KMER_SCALE):
+    """
+    Write the contigs of the assemblies to combined_path without their
+    exact duplicates and, with remove_contained, without the contigs that
+    lie within longer ones.  Returns lists of the per assembly counts of
+    COMBINE_COUNTS, the 'contigs' read, the 'duplicates' and 'contained'
+    contigs dropped and the 'combined' contigs written, each with its bp
+    (e.g. 'duplicates_bp'), and the count of 'unsampled' distinct contigs,
+    not looked for in longer ones.
+    """
+    kmer_length = int(kmer_length)
+    kmer_scale = int(kmer_scale)
+    if not 1 <= kmer_length <= 32:
+        raise ValueError("The k-mer length must be from 1 to 32")
+    if kmer_scale < 1:
+        raise ValueError("The k-mer scale must be at least 1")
+    if len(assembly_names) != len(fasta_paths):
+        raise ValueError("Every assembly needs a name")
+    keys = parallel_scan.scan_contig_keys(fasta_paths, workers, tmp_dir,
+                                          chunk_bytes)
+    lens = [np.asarray(ass_keys['lens'], dtype=np.int64) for ass_keys in keys]
+    offsets = [np.asarray(ass_keys['offsets'], dtype=np.int64)
+               for ass_keys in keys]
+    is_first = contig_index.first_copies(lens, [ass_keys['digests']
+                                                for ass_keys in keys])
+    del keys
+    is_contained = [np.zeros(len(ass_lens), dtype=bool) for ass_lens in lens]
+    unsampled = 0
+    if remove_contained:
+        distinct_offsets = [ass_offsets[ass_first]
+                            for ass_offsets, ass_first in zip(offsets,
+                                                              is_first)]
+        samples = parallel_scan.sample_contig_kmers(
+            fasta_paths, distinct_offsets, workers, chunk_bytes, kmer_length,
+            kmer_scale)
+        kmer_counts = np.concatenate([np.asarray(counts, dtype=np.int64)
+                                      for counts, _ in samples] +
+                                     [np.zeros(0, dtype=np.int64)])
+        kmer_hashes = np.concatenate([ass_hashes for _, hashes in samples
+                                      for ass_hashes in hashes] +
+                                     [np.zeros(0, dtype=np.uint64)])
+        del samples
+        unsampled = int((kmer_counts == 0).sum())
+        distinct_contained = _contained(
+            fasta_paths,
+            np.repeat(np.arange(len(fasta_paths)),
+                      [len(ass_offsets) for ass_offsets in distinct_offsets]),
+            np.concatenate(distinct_offsets + [np.zeros(0, dtype=np.int64)]),
+            np.concatenate([ass_lens[ass_first] for ass_lens, ass_first in
+                            zip(lens, is_first)] +
+                           [np.zeros(0, dtype=np.int64)]),
+            kmer_counts, kmer_hashes)
+        del kmer_hashes
+        distinct_start = 0
+        for ass_contained, ass_first in zip(is_contained, is_first):
+            n_distinct = int(ass_first.sum())
+            ass_contained[ass_first] = distinct_contained[
+                distinct_start:distinct_start+n_distinct]
+            distinct_start += n_distinct
+
+    combined = {count: [] for count in COMBINE_COUNTS}
+    combined.update({count+'_bp': [] for count in COMBINE_COUNTS})
+    with open(combined_path, 'wb', fasta_chunks.WRITE_BUF_SIZE) as \
+            combined_handle:
+        for path, prefix, ass_lens, ass_offsets, ass_first, ass_contained in \
+                zip(fasta_paths, header_prefixes(assembly_names), lens,
+                    offsets, is_first, is_contained):
+            is_kept = ass_first & ~ass_contained
+            fasta_chunks.write_contigs(path, ass_offsets[is_kept],
+                                       combined_handle, prefix.encode())
+            for count, is_counted in (('contigs', None),
+                                      ('duplicates', ~ass_first),
+                                      ('contained', ass_contained),
+                                      ('combined', is_kept)):
+                counted_lens = ass_lens if is_counted is None \
+                    else ass_lens[is_counted]
+                combined[count].append(len(counted_lens))
+                combined[count+'_bp'].append(int(counted_lens.sum()))
+    combined['unsampled'] = unsampled
+    combined['remove_contained'] = bool(remove_contained)
+    return combined
+
+
+def combine_report_text(assembly_names, combined):
+    """The plain text counts of a combine_assemblies(), as in the report."""
+    rows = [("Input contigs", 'contigs'),
+            ("Exact duplicates removed", 'duplicates')]
+    if combined['remove_contained']:
+        rows += [("Contained contigs removed", 'contained')]
+    rows += [("Contigs kept", 'combined')]
+    report_text = "COMBINED ASSEMBLY of "+str(len(assembly_names)) + \
+        " assemblies (reverse complements included)\n"
+    for label, count in rows:
+        report_text += "\t"+label+":\t"+str(sum(combined[count])) + \
+            " ("+str(sum(combined[count+'_bp']))+" bp)\n"
+    if combined['remove_contained']:
+        report_text += "\t"+"Too short to look for in longer contigs:\t" + \
+            str(combined['unsampled'])+"\n"
+    report_text += "\n"
+    for ass_i, ass_name in enumerate(assembly_names):
+        report_text += "ASSEMBLY "+ass_name+"\n"
+        for label, count in rows:
+            report_text += "\t"+label+":\t"+str(combined[count][ass_i]) + \
+                " ("+str(combined[count+'_bp'][ass_i])+" bp)\n"
+        report_text += "\n"
+    return report_text
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Contig length comparison of assemblies in local FASTA files.
+
+This is the computation behind run_contig_distribution_compare without any
+KBase services: the statistics of each assembly, the text report, and the
+HTML report with its figures, written to a local directory.
+
+    lens = [contig_stats.read_contig_lengths(path) for path in paths]
+    dist = compare_contig_distributions(lens)
+
+or, with the base composition of each assembly from the same scan:
+
+    scans = parallel_scan.scan_contig_composition(paths)
+    dist = compare_contig_distributions([scan['lens'] for scan in scans],
+                                        composition=scans)
+    print(distribution_report_text(names, dist))
+    render_distribution_report(names, dist, 'report_dir')
+"""
+import os
+
+from kb_assembly_compare import contig_index, contig_stats, plots, \
+    report_html, scoring
+
+HTML_FILE = 'contig_distribution_report.html'
+HIST_FOLDER_NAME = 'histograms'
+# the figures shared by all the assemblies: (file name, description)
+KEY_PLOT = ('key_plot', 'KEY')
+CUMULATIVE_PLOT = ('cumulative_len_plot', 'Cumulative Length (in Mbp)')
+SORTED_PLOT = ('sorted_contig_lengths', 'Sorted Contig Lengths (in Mbp)')
+GC_PLOT = ('gc_content_plot', 'GC Content (in Mbp per 1% GC)')
+LENGTH_GC_PLOT = ('length_vs_gc_plot', 'Contig Length vs GC Content')
+# the longest contigs of each assembly drawn in the length vs GC plot
+LENGTH_GC_MAX_CONTIGS = 20000
+
+
+def assembly_stats(lens, percs=contig_stats.PERCS,
+                   len_buckets=contig_stats.LEN_BUCKETS):
+    """
+    The summary statistics of one assembly: contig count, total and longest
+    length, Nx/Lx, and the count and summed length of the contigs >= each
+    bucket length.  lens is sorted in place.
+    """
+    contig_stats.sort_lens(lens)
+    cumulative, total_len = contig_stats.cumulative_lens(lens)
+    N, L = contig_stats.n_stats(lens, cumulative, total_len, percs)
+    summary_stats, cumulative_len_stats = contig_stats.bucket_counts(
+        lens, len_buckets)
+    return {'contigs': len(lens),
+            'total_len': total_len,
+            'max_len': lens[0] if lens else 0,
+            'N': N,
+            'L': L,
+            'summary_stats': summary_stats,
+            'cumulative_len_stats': cumulative_len_stats}
+
+
+def compare_contig_distributions(lens, percs=contig_stats.PERCS,
+                                 len_buckets=contig_stats.LEN_BUCKETS,
+                                 composition=None):
+    """
+    Everything the distribution reports need, from the contig lengths of each
+    assembly.  The lengths are sorted in place.  N and L hold a list over the
+    assemblies for each percentage.  composition optionally holds the 'gc'
+    and 'ambiguous' counts of each assembly's contigs in the file order of
+    its lengths (see parallel_scan.scan_contig_composition()); their
+    contig_stats.composition_stats() are then the 'composition' of the
+    result, with the contig_stats.gap_stats() and 'min_gap_length' of scans
+    that looked for scaffold gaps.  The contig_index.duplicate_stats() of
+    scans with contig 'digests' are the 'duplicates' of the result.
+    """
+    for ass_i, ass_lens in enumerate(lens):
+        if not ass_lens:
+            raise ValueError("Assembly "+str(ass_i+1)+" has no contigs")
+    duplicates = None
+    if composition is not None:
+        # before the sort, while the counts line up with the lengths
+        scans = composition
+        if all(scan.get('digests') for scan in scans):
+            duplicates = contig_index.duplicate_stats(
+                lens, [scan['digests'] for scan in scans])
+        composition = []
+        for ass_lens, counts in zip(lens, scans):
+            ass_composition = contig_stats.composition_stats(
+                ass_lens, counts['gc'], counts['ambiguous'])
+            if 'gaps' in counts:
+                ass_composition.update(contig_stats.gap_stats(
+                    ass_lens, counts['gaps'], counts['gap_bp'],
+                    counts['split_lens'], percs))
+                ass_composition['min_gap_length'] = counts['min_gap_length']
+            composition.append(ass_composition)
+    for ass_lens in lens:
+        contig_stats.sort_lens(ass_lens)  # sorting is critical
+    max_lens = [ass_lens[0] for ass_lens in lens]
+    max_len = max(max_lens)
+
+    cumulative_lens = []
+    total_lens = []
+    N = {perc: [] for perc in percs}
+    L = {perc: [] for perc in percs}
+    summary_stats = []
+    cumulative_len_stats = []
+    hist_cnt_by_bin = []  # the histograms, and their shared heights
+    hist_binwidth = contig_stats.hist_binwidths(max_len)
+    for ass_lens in lens:
+        this_cumulative_lens, this_total_len = \
+            contig_stats.cumulative_lens(ass_lens)
+        cumulative_lens.append(this_cumulative_lens)
+        total_lens.append(this_total_len)
+        this_N, this_L = contig_stats.n_stats(
+            ass_lens, this_cumulative_lens, this_total_len, percs)
+        for perc in percs:
+            N[perc].append(this_N[perc])
+            L[perc].append(this_L[perc])
+        hist_cnt_by_bin.append(contig_stats.length_histograms(
+            ass_lens, max_len, hist_binwidth))
+        this_summary_stats, this_cumulative_len_stats = \
+            contig_stats.bucket_counts(ass_lens, len_buckets)
+        summary_stats.append(this_summary_stats)
+        cumulative_len_stats.append(this_cumulative_len_stats)
+    scores = scoring.score_assemblies(max_lens, N, L, summary_stats,
+                                      cumulative_len_stats, percs, len_buckets)
+    best_val, worst_val = scoring.best_and_worst_vals(scores)
+
+    dist = {'lens': lens,
+            'percs': percs,
+            'len_buckets': len_buckets,
+            'max_lens': max_lens,
+            'max_len': max_len,
+            'cumulative_lens': cumulative_lens,
+            'total_lens': total_lens,
+            'N': N,
+            'L': L,
+            'summary_stats': summary_stats,
+            'cumulative_len_stats': cumulative_len_stats,
+            'hist_cnt_by_bin': hist_cnt_by_bin,
+            'hist_binwidth': hist_binwidth,
+            'top_hist_cnt': contig_stats.top_hist_counts(hist_cnt_by_bin),
+            'scores': scores,
+            'best_val': best_val,
+            'worst_val': worst_val}
+    if composition is not None:
+        dist['composition'] = composition
+    if duplicates is not None:
+        dist['duplicates'] = duplicates
+    return dist
+
+
+def distribution_report_text(assembly_names, dist):
+    """The plain text statistics of each assembly, as in the report message."""
+    report_text = ''
+    for ass_i, ass_name in enumerate(assembly_names):
+        report_text += "ASSEMBLY STATS for "+ass_name+"\n"
+
+        report_text += "\t"+"Len longest contig: " + \
+            str(dist['max_lens'][ass_i])+" bp"+"\n"
+        if 'composition' in dist:
+            ass_composition = dist['composition'][ass_i]
+            report_text += "\t"+"GC content:\t" + \
+                "{:.2f}".format(100 * ass_composition['gc_fraction'])+" %\n"
+            report_text += "\t"+"Ambiguous bases:\t" + \
+                str(ass_composition['ambiguous'])+" bp (" + \
+                "{:.2f}".format(100 * ass_composition['ambiguous_fraction']) + \
+                " %)\n"
+            if 'gaps' in ass_composition:
+                report_text += "\t"+"Gaps (N-runs >= " + \
+                    str(ass_composition['min_gap_length'])+" bp):\t" + \
+                    str(ass_composition['gaps'])+" (" + \
+                    str(ass_composition['gap_bp'])+" bp)\n"
+                report_text += "\t"+"Contigs split at gaps:\t" + \
+                    str(ass_composition['contigs'])+"\n"
+                for perc in dist['percs']:
+                    report_text += "\t"+"Contig N"+str(perc)+" (L" + \
+                        str(perc)+"):\t" + \
+                        str(ass_composition['contig_N'][perc])+" (" + \
+                        str(ass_composition['contig_L'][perc])+")"+"\n"
+        if 'duplicates' in dist:
+            duplicates = dist['duplicates']
+            report_text += "\t"+"Duplicate contigs within assembly:\t" + \
+                str(duplicates['within'][ass_i])+" (" + \
+                str(duplicates['within_bp'][ass_i])+" bp)\n"
+            report_text += "\t"+"Contigs shared with other assemblies:\t" + \
+                str(duplicates['shared'][ass_i])+" (" + \
+                str(duplicates['shared_bp'][ass_i])+" bp)\n"
+        for perc in dist['percs']:
+            report_text += "\t"+"N"+str(perc)+" (L"+str(perc)+"):\t" + \
+                str(dist['N'][perc][ass_i])+" (" + \
+                str(dist['L'][perc][ass_i])+")"+"\n"
+        for bucket in dist['len_buckets']:
+            report_text += "\t"+"Num contigs >= "+str(bucket)+" bp:\t" + \
+                str(dist['summary_stats'][ass_i][bucket])+"\n"
+        report_text += "\n"
+
+        for bucket in dist['len_buckets']:
+            report_text += "\t"+"Len contigs >= "+str(bucket)+" bp:\t" + \
+                str(dist['cumulative_len_stats'][ass_i][bucket])+" bp"+"\n"
+        report_text += "\n"
+    if 'duplicates' in dist:
+        duplicates = dist['duplicates']
+        report_text += "DUPLICATE CONTIGS across all assemblies " + \
+            "(reverse complements included)\n"
+        report_text += "\t"+"Distinct contig sequences:\t" + \
+            str(duplicates['distinct'])+" of "+str(duplicates['contigs']) + \
+            " contigs\n"
+        report_text += "\t"+"In more than one assembly:\t" + \
+            str(duplicates['distinct_shared'])+"\n"
+        report_text += "\t"+"Redundant copies:\t" + \
+            str(duplicates['redundant'])+" (" + \
+            str(duplicates['redundant_bp'])+" bp)\n"
+        report_text += "\n"
+    return report_text
+
+
+def _hist_plot_name(ass_name, hist_i, max_len):
+    long_len = contig_stats.hist_long_len(hist_i, max_len)
+    min_hist_val = contig_stats.HIST_MIN_VAL_ACCEPT[hist_i]
+    plot_name = "hist_len_plot-"+ass_name+"_hist_window_" + \
+        str(min_hist_val)+"-"+str(long_len)
+    plot_name_desc = "Histogram of Contig Lengths "+str(min_hist_val)+"-" + \
+        str(long_len)+" (in bp)"
+    return plot_name, plot_name_desc
+
+
+def render_distribution_report(assembly_names, dist, html_output_dir,
+                               log=None):
+    """
+    Draw the figures and write the HTML report into html_output_dir, with
+    the histograms in its HIST_FOLDER_NAME subdirectory.  Returns a dict
+    with the 'html_file' name, the shared 'figures' as (png, pdf,
+    description) tuples, and the 'hist_dir' path.  A dist with a
+    'composition' adds the GC content and length vs GC figures.
+    """
+    hist_output_dir = os.path.join(html_output_dir, HIST_FOLDER_NAME)
+    if not os.path.exists(hist_output_dir):
+        os.makedirs(hist_output_dir)
+
+    def _log(message):
+        if log is not None:
+            log(message)
+
+    shared_plots = [(KEY_PLOT, plots.plot_key, assembly_names),
+                    (CUMULATIVE_PLOT, plots.plot_cumulative_lengths,
+                     dist['cumulative_lens']),
+                    (SORTED_PLOT, plots.plot_sorted_lengths, dist['lens'])]
+    if 'composition' in dist:
+        shared_plots += [
+            (GC_PLOT, plots.plot_gc_content,
+             [ass_composition['gc_hist']
+              for ass_composition in dist['composition']]),
+            (LENGTH_GC_PLOT, plots.plot_length_vs_gc,
+             [(ass_lens[:LENGTH_GC_MAX_CONTIGS],
+               ass_composition['contig_gc'][:LENGTH_GC_MAX_CONTIGS])
+              for ass_lens, ass_composition in zip(dist['lens'],
+                                                   dist['composition'])])]
+    figures = []
+    hist_lens_png_files = []
+    # all the figures are drawn on one Figure, released at the end
+    with plots.FigureRenderer() as renderer:
+        for (plot_name, plot_name_desc), plot_function, data in shared_plots:
+            _log("GENERATING PLOT "+plot_name_desc)
+            png_file = plot_name+".png"
+            pdf_file = plot_name+".pdf"
+            plot_function(data, os.path.join(html_output_dir, png_file),
+                          os.path.join(html_output_dir, pdf_file),
+                          plot_name_desc, renderer=renderer)
+            figures.append((png_file, pdf_file, plot_name_desc))
+
+        for ass_i, ass_name in enumerate(assembly_names):
+            hist_lens_png_files.append([])
+            for hist_i, top_cnt in enumerate(dist['top_hist_cnt']):
+                if not any(dist['hist_cnt_by_bin'][ass_i][hist_i]):
+                    continue
+                plot_name, plot_name_desc = _hist_plot_name(
+                    ass_name, hist_i, dist['max_len'])
+                _log("GENERATING PLOT for "+ass_name+" "+plot_name_desc)
+                png_file = plot_name+".png"
+                pdf_file = plot_name+".pdf"
+                hist_lens_png_files[ass_i].append(
+                    HIST_FOLDER_NAME+'/'+png_file)
+                plots.plot_length_histogram(
+                    dist['hist_cnt_by_bin'][ass_i][hist_i], hist_i,
+                    contig_stats.hist_long_len(hist_i, dist['max_len']),
+                    dist['hist_binwidth'][hist_i], top_cnt,
+                    os.path.join(hist_output_dir, png_file),
+                    os.path.join(hist_output_dir, pdf_file),
+                    renderer=renderer)
+
+    _log("CREATING HTML REPORT")
+    with open(os.path.join(html_output_dir, HTML_FILE), 'w') as html_handle:
+        report_html.write_contig_distribution_html(
+            html_handle, assembly_names, dist['max_lens'], dist['N'],
+            dist['L'], dist['summary_stats'], dist['cumulative_len_stats'],
+            dist['scores'], dist['percs'], dist['len_buckets'],
+            figures[0][0], figures[1][0], figures[2][0], hist_lens_png_files,
+            composition_png_files=[png for png, _, _ in figures[3:]])
+
+    return {'html_file': HTML_FILE,
+            'figures': figures,
+            'hist_dir': hist_output_dir}
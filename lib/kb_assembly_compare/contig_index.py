@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Duplicate contigs within and across assemblies, from a hash index.
+
+Each contig is keyed by its length and the canonical_digest() of its
+sequence (see fasta_chunks.py), which is the same for a contig and its
+reverse complement, so the index holds two int64s per contig whatever the
+size of the sequences.  The keys of all the assemblies are sorted together
+with NumPy, which puts the copies of a sequence next to each other, those
+of one assembly first.
+
+    scans = parallel_scan.scan_contig_composition(paths, hash_contigs=True)
+    duplicates = duplicate_stats([scan['lens'] for scan in scans],
+                                 [scan['digests'] for scan in scans])
+
+first_copies() picks one copy of each sequence to keep.  Contigs contained
+in longer ones are found from a second index, of the sampled k-mer hashes
+of the distinct contigs (fasta_chunks.sampled_kmers()), sorted by hash:
+the hashes of a contained contig are all among those of the contigs that
+contain it, so only contigs that share every one of a contig's hashes are
+candidates, and contained_contigs() has the candidates confirmed from the
+sequences.  The index takes about 24 bytes per sampled hash.
+"""
+import numpy as np
+
+# the keys looked up per search when checking containment candidates
+MAX_PROBES = 4 * 1024 * 1024
+
+
+def _concatenated(lens, digests):
+    """The assembly, length and digest of every contig, as three arrays."""
+    ass_ids = np.concatenate([np.full(len(ass_lens), ass_i, dtype=np.int64)
+                              for ass_i, ass_lens in enumerate(lens)] +
+                             [np.zeros(0, dtype=np.int64)])
+    all_lens = np.concatenate([np.asarray(ass_lens, dtype=np.int64)
+                               for ass_lens in lens] +
+                              [np.zeros(0, dtype=np.int64)])
+    all_digests = np.concatenate([np.asarray(ass_digests, dtype=np.int64)
+                                  for ass_digests in digests] +
+                                 [np.zeros(0, dtype=np.int64)])
+    if len(all_digests) != len(all_lens):
+        raise ValueError("Every contig needs a digest")
+    return ass_ids, all_lens, all_digests
+
+
+def _new_keys(key_digests, key_lens):
+    """Whether each sorted key differs from the one before."""
+    new_key = np.ones(len(key_lens), dtype=bool)
+    new_key[1:] = (key_digests[1:] != key_digests[:-1]) | \
+        (key_lens[1:] != key_lens[:-1])
+    return new_key
+
+
+def sorted_keys(lens, digests):
+    """
+    The (digest, length, assembly) of every contig of the assemblies, as
+    three arrays sorted by digest and length, then assembly and file order.
+    """
+    ass_ids, all_lens, all_digests = _concatenated(lens, digests)
+    order = np.lexsort((ass_ids, all_lens, all_digests))
+    return all_digests[order], all_lens[order], ass_ids[order]
+
+
+def first_copies(lens, digests):
+    """
+    Whether each contig is the first copy of its sequence over the
+    assemblies, in assembly then file order, as a bool array per assembly.
+    Keeping those contigs keeps one copy of every distinct sequence.
+    """
+    _, all_lens, all_digests = _concatenated(lens, digests)
+    order = np.lexsort((np.arange(len(all_lens)), all_lens, all_digests))
+    is_first = np.empty(len(all_lens), dtype=bool)
+    is_first[order] = _new_keys(all_digests[order], all_lens[order])
+    return np.split(is_first, np.cumsum([len(ass_lens)
+                                         for ass_lens in lens])[:-1])
+
+
+def duplicate_stats(lens, digests):
+    """
+    The duplicate contigs of the assemblies, from the lengths and digests
+    of each assembly's contigs.  Per assembly: the 'within' count and
+    'within_bp' of its contigs that repeat an earlier contig of the same
+    assembly, and the 'shared' count and 'shared_bp' of its contigs whose
+    sequence is also in another assembly.  Over all the assemblies: the
+    'contigs', the 'distinct' sequences, the distinct sequences in more than
+    one assembly ('distinct_shared'), and the 'redundant' copies beyond the
+    first of each sequence with their 'redundant_bp'.
+    """
+    n_assemblies = len(lens)
+    key_digests, key_lens, key_ass = sorted_keys(lens, digests)
+    n_contigs = len(key_lens)
+    new_key = _new_keys(key_digests, key_lens)
+    new_ass = np.ones(n_contigs, dtype=bool)
+    new_ass[1:] = key_ass[1:] != key_ass[:-1]
+    # a copy of the previous contig in the same assembly
+    within = ~new_key & ~new_ass
+    key_ids = np.cumsum(new_key) - 1
+    # the number of assemblies with each sequence
+    key_assemblies = np.bincount(key_ids[new_key | new_ass],
+                                 minlength=int(new_key.sum()))
+    shared = key_assemblies[key_ids] > 1
+
+    def _per_assembly(is_counted, weights=None):
+        return np.bincount(key_ass[is_counted], minlength=n_assemblies,
+                           weights=None if weights is None
+                           else weights[is_counted]).astype(np.int64).tolist()
+
+    return {'within': _per_assembly(within),
+            'within_bp': _per_assembly(within, key_lens),
+            'shared': _per_assembly(shared),
+            'shared_bp': _per_assembly(shared, key_lens),
+            'contigs': n_contigs,
+            'distinct': int(new_key.sum()),
+            'distinct_shared': int((key_assemblies > 1).sum()),
+            'redundant': int((~new_key).sum()),
+            'redundant_bp': int(key_lens[~new_key].sum())}
+
+
+def _ranges(starts, ends):
+    """The indexes of the ranges [starts, ends), one range after another."""
+    range_lens = ends - starts
+    return np.arange(range_lens.sum()) + \
+        np.repeat(starts - (np.cumsum(range_lens) - range_lens), range_lens)
+
+
+def containment_candidates(lens, kmer_counts, kmer_hashes):
+    """
+    The contigs whose sampled k-mer hashes are all among those of a longer
+    contig, as (contig, the longer contigs longest first) pairs, in the
+    order of their longest candidate.  lens are the lengths of distinct
+    contigs, kmer_counts the number of hashes of each, and kmer_hashes the
+    hashes, sorted and unique per contig, contig after contig (as from
+    fasta_chunks.contig_kmers()).  Contigs without hashes have no
+    candidates.
+
+    Each hash is replaced by its rank among the distinct hashes, and the
+    index holds the key rank * contigs + contig of every hash of every
+    contig, sorted.  The contigs sharing a contig's first hash are found
+    with one range search over the keys, and whether they have each of its
+    other hashes with one search of the keys they would have, for all the
+    contigs at once (in batches of MAX_PROBES).
+    """
+    lens = np.asarray(lens, dtype=np.int64)
+    kmer_counts = np.asarray(kmer_counts, dtype=np.int64)
+    kmer_hashes = np.asarray(kmer_hashes, dtype=np.uint64)
+    n_contigs = len(lens)
+    if len(kmer_counts) != n_contigs or \
+            kmer_counts.sum() != len(kmer_hashes):
+        raise ValueError("Every contig needs a count of its k-mer hashes")
+    hash_starts = np.concatenate(([0], np.cumsum(kmer_counts)))
+    order = np.argsort(kmer_hashes, kind='stable')
+    sorted_hashes = kmer_hashes[order]
+    new_hash = np.ones(len(sorted_hashes), dtype=bool)
+    new_hash[1:] = sorted_hashes[1:] != sorted_hashes[:-1]
+    del sorted_hashes
+    sorted_ranks = np.cumsum(new_hash) - 1
+    del new_hash
+    # sorted, as the stable sort keeps the contigs of a hash in order
+    index_keys = sorted_ranks * n_contigs + \
+        np.repeat(np.arange(n_contigs), kmer_counts)[order]
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = sorted_ranks
+    del order, sorted_ranks
+
+    # the longer contigs with each contig's first hash
+    queries = np.flatnonzero(kmer_counts)
+    first_keys = ranks[hash_starts[queries]] * n_contigs
+    pair_starts = np.searchsorted(index_keys, first_keys)
+    pair_ends = np.searchsorted(index_keys, first_keys + n_contigs)
+    pair_queries = np.repeat(queries, pair_ends - pair_starts)
+    pair_contigs = index_keys[_ranges(pair_starts, pair_ends)] % n_contigs
+    is_longer = lens[pair_contigs] > lens[pair_queries]
+    pair_queries = pair_queries[is_longer]
+    pair_contigs = pair_contigs[is_longer]
+
+    # the pairs whose longer contig has all the other hashes
+    n_probes = kmer_counts[pair_queries] - 1
+    probe_ends = np.cumsum(n_probes)
+    has_all = np.ones(len(pair_queries), dtype=bool)
+    batch_start = 0
+    while batch_start < len(pair_queries):
+        batch_end = max(batch_start + 1, int(np.searchsorted(
+            probe_ends, probe_ends[batch_start] - n_probes[batch_start] +
+            MAX_PROBES, side='right')))
+        batch_queries = pair_queries[batch_start:batch_end]
+        batch_probes = n_probes[batch_start:batch_end]
+        probe_keys = ranks[_ranges(hash_starts[batch_queries] + 1,
+                                   hash_starts[batch_queries + 1])] * \
+            n_contigs + np.repeat(pair_contigs[batch_start:batch_end],
+                                  batch_probes)
+        found_i = np.searchsorted(index_keys, probe_keys)
+        is_missing = found_i == len(index_keys)
+        is_missing[~is_missing] = index_keys[found_i[~is_missing]] != \
+            probe_keys[~is_missing]
+        has_all[batch_start:batch_end] = np.bincount(
+            np.repeat(np.arange(batch_end - batch_start), batch_probes),
+            weights=is_missing, minlength=batch_end - batch_start) == 0
+        batch_start = batch_end
+    pair_queries = pair_queries[has_all]
+    pair_contigs = pair_contigs[has_all]
+    if not len(pair_queries):
+        return []
+
+    # grouped by contig, longest candidate first, in the order of the first
+    pair_order = np.lexsort((-lens[pair_contigs], pair_queries))
+    pair_queries = pair_queries[pair_order]
+    pair_contigs = pair_contigs[pair_order]
+    group_starts = np.flatnonzero(np.concatenate(
+        ([True], pair_queries[1:] != pair_queries[:-1])))
+    group_order = np.argsort(pair_contigs[group_starts], kind='stable')
+    groups = np.split(pair_contigs, group_starts[1:])
+    return [(int(pair_queries[group_starts[group_i]]), groups[group_i])
+            for group_i in group_order.tolist()]
+
+
+def contained_contigs(lens, kmer_counts, kmer_hashes, is_contained):
+    """
+    Whether each distinct contig is contained in a longer one, as a bool
+    array: the containment_candidates() confirmed by is_contained(contig,
+    longer contig).  The longest contig that contains a contig is not
+    itself contained in another, so dropping every contained contig loses
+    no sequence.
+    """
+    contained = np.zeros(len(lens), dtype=bool)
+    for contig, longer_contigs in containment_candidates(lens, kmer_counts,
+                                                         kmer_hashes):
+        for longer_contig in longer_contigs.tolist():
+            if is_contained(contig, longer_contig):
+                contained[contig] = True
+                break
+    return contained
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Contig length statistics used by the app methods.
+
+Lengths are plain lists of ints.  The N/L statistics, bucket counts and
+histograms expect the lengths sorted longest first (sort_lens()).  The base
+composition statistics take the per-contig counts of a scan in file order.
+"""
+import numpy as np
+
+from kb_assembly_compare import fasta_chunks
+
+# Nx/Lx percentages reported
+PERCS = [50, 75, 90]
+# "num contigs >= bucket" and "len contigs >= bucket" rows of the report
+LEN_BUCKETS = [1000000, 100000, 10000, 1000, 500, 1]
+# the three length histograms: 0-10Kbp, 10Kbp-100Kbp and >= 100Kbp
+HIST_MIN_VAL_ACCEPT = [0, 10000, 100000]
+HIST_MAX_VAL_ACCEPT = [10000, 100000, 100000000000000000000]
+LONG_CONTIG_NBINS = 70
+# the G+C content histogram has a bin per 1% G+C
+GC_BINS = 100
+
+
+def read_contig_lengths(fasta_path):
+    """
+    The length of each contig of a FASTA file, in file order.  The file is
+    memory mapped and scanned as bytes (see fasta_chunks.py).
+    """
+    return fasta_chunks.file_lengths(fasta_path)
+
+
+def filter_fasta(fasta_path, filtered_path, min_contig_length):
+    """
+    Write the contigs of at least min_contig_length bp to filtered_path, with
+    the sequence unwrapped onto one line.  Returns the number of contigs read
+    and written.
+    """
+    return fasta_chunks.filter_file(fasta_path, filtered_path,
+                                    min_contig_length)
+
+
+def sort_lens(lens):
+    """Sort lengths longest first, in place."""
+    lens.sort(key=int, reverse=True)
+    return lens
+
+
+def cumulative_lens(lens):
+    """The running sums of the lengths, and the total length."""
+    total_len = 0
+    cumulative = []
+    for val in lens:
+        total_len += val
+        cumulative.append(total_len)
+    return cumulative, total_len
+
+
+def n_stats(lens, cumulative, total_len, percs=PERCS):
+    """
+    Nx and Lx for each percentage x: the length of the contig at which the
+    sorted contigs reach x% of the total length, and its rank.
+    """
+    N = dict()
+    L = dict()
+    for perc in percs:
+        frac = perc / 100.0
+        for val_i, val in enumerate(lens):
+            if cumulative[val_i] >= frac * total_len:
+                N[perc] = val
+                L[perc] = val_i + 1
+                break
+    return N, L
+
+
+def bucket_counts(lens, len_buckets=LEN_BUCKETS):
+    """The number and summed length of the contigs >= each bucket length."""
+    summary_stats = dict()
+    cumulative_len_stats = dict()
+    for bucket in len_buckets:
+        summary_stats[bucket] = 0
+        cumulative_len_stats[bucket] = 0
+    curr_bucket_i = 0
+    for val in lens:
+        for bucket_i in range(curr_bucket_i, len(len_buckets)):
+            bucket = len_buckets[bucket_i]
+            if val >= bucket:
+                summary_stats[bucket] += 1
+                cumulative_len_stats[bucket] += val
+            else:
+                curr_bucket_i = bucket_i + 1
+    return summary_stats, cumulative_len_stats
+
+
+def hist_binwidths(max_len):
+    """The bin width of each of the three histograms."""
+    return [500, 5000, max(1, max_len // LONG_CONTIG_NBINS)]
+
+
+def hist_long_len(hist_i, max_len):
+    """The upper end of the range shown by histogram hist_i."""
+    if hist_i < len(HIST_MAX_VAL_ACCEPT) - 1:
+        return HIST_MAX_VAL_ACCEPT[hist_i]
+    return max_len
+
+
+def length_histograms(lens, max_len, hist_binwidth):
+    """
+    Bin the lengths into the three histograms.  Returns the count in each
+    bin of each histogram: bin bin_i counts the lengths in
+    [bin_i, bin_i+1) * hist_binwidth[hist_i].
+    """
+    hist_cnt_by_bin = []
+    for hist_i in range(len(HIST_MIN_VAL_ACCEPT)):
+        long_len = hist_long_len(hist_i, max_len)
+        hist_cnt_by_bin.append([0] * ((long_len // hist_binwidth[hist_i]) + 1))
+
+    for val in lens:
+        this_hist_i = 0
+        for hist_i in range(len(HIST_MIN_VAL_ACCEPT)):
+            if val >= HIST_MIN_VAL_ACCEPT[hist_i] and \
+                    val < HIST_MAX_VAL_ACCEPT[hist_i]:
+                this_hist_i = hist_i
+                break
+        bin_i = val // hist_binwidth[this_hist_i]
+        hist_cnt_by_bin[this_hist_i][bin_i] += 1
+    return hist_cnt_by_bin
+
+
+def top_hist_counts(hist_cnt_by_bin_by_assembly):
+    """The highest bin count of each histogram over all the assemblies."""
+    top_hist_cnt = [0] * len(HIST_MIN_VAL_ACCEPT)
+    for hist_cnt_by_bin in hist_cnt_by_bin_by_assembly:
+        for hist_i, cnts in enumerate(hist_cnt_by_bin):
+            if cnts:
+                top_hist_cnt[hist_i] = max(top_hist_cnt[hist_i], max(cnts))
+    return top_hist_cnt
+
+
+def composition_stats(lens, gc_counts, ambiguous_counts):
+    """
+    The base composition of one assembly, from the lengths, G+C counts and
+    ambiguous base counts of its contigs in file order (see
+    fasta_chunks.chunk_composition()): the G+C fraction of its called
+    (A, C, G or T) bases, its ambiguous base count and fraction, the
+    'contig_gc' fraction of each contig in sort_lens() order (NaN for a
+    contig without called bases), and the 'gc_hist' summed length of the
+    contigs in each 1% G+C bin.
+    """
+    lens = np.asarray(lens, dtype=np.int64)
+    gc_counts = np.asarray(gc_counts, dtype=np.int64)
+    ambiguous_counts = np.asarray(ambiguous_counts, dtype=np.int64)
+    called = lens - ambiguous_counts
+    total_len = int(lens.sum())
+    total_called = int(called.sum())
+    total_ambiguous = total_len - total_called
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contig_gc = gc_counts / called
+    has_called = called > 0
+    gc_bins = np.minimum((contig_gc[has_called] * GC_BINS).astype(np.int64),
+                         GC_BINS - 1)
+    return {'gc_fraction': (int(gc_counts.sum()) / float(total_called)
+                            if total_called else 0.0),
+            'ambiguous': total_ambiguous,
+            'ambiguous_fraction': (total_ambiguous / float(total_len)
+                                   if total_len else 0.0),
+            'contig_gc': contig_gc[np.argsort(-lens, kind='stable')],
+            'gc_hist': np.bincount(gc_bins, weights=lens[has_called],
+                                   minlength=GC_BINS)}
+
+
+def gap_stats(lens, gap_counts, gap_lens, split_lens, percs=PERCS):
+    """
+    The scaffold gaps of one assembly, from the per-contig gap counts and
+    lengths of a scan and the split_lens of the contigs between the gaps
+    (see fasta_chunks.chunk_composition()): the number of 'gaps' and their
+    'gap_bp', and the 'contigs', 'contig_len' and 'contig_N' and
+    'contig_L' Nx/Lx of the assembly split at its gaps.
+    """
+    gap_counts = np.asarray(gap_counts, dtype=np.int64)
+    contig_lens = np.concatenate((
+        np.asarray(lens, dtype=np.int64)[gap_counts == 0],
+        np.asarray(split_lens, dtype=np.int64)))
+    contig_lens = sort_lens(contig_lens.tolist())
+    cumulative, contig_len = cumulative_lens(contig_lens)
+    contig_N, contig_L = n_stats(contig_lens, cumulative, contig_len, percs)
+    return {'gaps': int(gap_counts.sum()),
+            'gap_bp': int(np.asarray(gap_lens, dtype=np.int64).sum()),
+            'contigs': len(contig_lens),
+            'contig_len': contig_len,
+            'contig_N': {perc: contig_N.get(perc, 0) for perc in percs},
+            'contig_L': {perc: contig_L.get(perc, 0) for perc in percs}}
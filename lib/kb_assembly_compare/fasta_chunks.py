@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+"""
+Memory mapped, bytes-only reading of FASTA files, by byte range chunks.
+
+The file is mapped and never decoded or split into lines: records are found
+with find(b'>') (a memchr) plus a check that the '>' starts a line, and a
+contig's length is the size of its sequence bytes less their line ends.
+Filtering copies the header and sequence bytes straight to the output.
+
+plan_chunks() splits a file into ranges of about chunk_bytes whose starts
+are moved forward to the next record, so every record lies in exactly one
+chunk.  chunk_lengths() and filter_chunk() work on one range; the
+concatenated results of the chunks of a plan are those of the whole file,
+as given by file_lengths() and filter_file().  Results are those of reading
+the file in text mode line by line: sequence whitespace is dropped, \r\n
+line ends count as \n, empty records are skipped, and text before the
+first header is a contig without a header.
+
+chunk_composition() scans the same records for their base composition as
+well: the bytes of each sequence are counted with one np.bincount() over
+the raw buffer, which gives the length, the G+C count and the count of
+ambiguous bases (anything but A, C, G or T) together.  Sequences with
+enough Ns to hold a scaffold gap (a run of at least min_gap_length Ns) are
+then searched for their N-runs with NumPy over the same bytes, for the gap
+count and size and the lengths of the contigs between the gaps.  With
+hash_contigs, each contig is also fingerprinted by canonical_digest(), so
+that duplicates, reverse complements included, can be found by comparing
+one int64 per contig.
+
+chunk_contig_keys() gives the record offset of each contig with its length
+and digest, so that chosen contigs can be read back from the mapped file
+(read_contig(), write_contigs()), and contig_kmers() hashes a sample of the
+canonical k-mers of chosen contigs (sampled_kmers()).  The k-mers are packed
+2 bits a base into uint64s with NumPy, in cache sized blocks, and short
+contigs are joined into one block to save the per-call overhead.
+"""
+import hashlib
+import mmap
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+WRITE_BUF_SIZE = 1024 * 1024
+# the whitespace that str.split() drops from sequence lines in FASTA files
+SEQ_WHITESPACE = b' \t\r\n\x0b\x0c'
+GC_BASES = b'GCgc'
+CALLED_BASES = b'ACGTacgt'
+# bytes counted per np.bincount() call, which works on an intp copy
+COUNT_BLOCK_BYTES = 4 * 1024 * 1024
+# runs of at least this many Ns are scaffold gaps
+DEFAULT_MIN_GAP_LENGTH = 10
+# sampled k-mers: 2 bit packed in a uint64, so at most 32 bp, and about one
+# in kmer_scale of them kept
+DEFAULT_KMER_LENGTH = 31
+DEFAULT_KMER_SCALE = 100
+# bases packed into k-mers per block, so that the block's arrays stay in
+# the CPU cache (twice as fast as 1M base blocks)
+KMER_BLOCK_BASES = 64 * 1024
+
+_N_CODES = np.frombuffer(b'Nn', dtype=np.uint8)
+# upper cases the IUPAC codes, and complements the upper case ones
+_UPPER_CASE = bytes.maketrans(b'acgtunrykmbvdhsw', b'ACGTUNRYKMBVDHSW')
+_COMPLEMENT = bytes.maketrans(b'ACGTUNRYKMBVDHSW', b'TGCAANYRMKVBHDSW')
+# the bit that lower cases an ASCII letter
+_LOWER_CASE_BIT = 0x20
+# the 2 bit code of each base byte, 4 for anything but A, C, G or T
+_BASE_CODES = np.full(256, 4, dtype=np.uint8)
+_BASE_CODES[np.frombuffer(CALLED_BASES, dtype=np.uint8)] = [0, 1, 2, 3] * 2
+
+
+def _open_mmap(fasta_handle):
+    return mmap.mmap(fasta_handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _next_record(mm, pos, end):
+    """The position of the first '>' at the start of a line in [pos, end)."""
+    find = mm.find
+    record_i = find(b'>', pos, end)
+    while record_i > 0 and mm[record_i-1] != 10:  # not after a \n
+        record_i = find(b'>', record_i+1, end)
+    return record_i
+
+
+def plan_chunks(fasta_path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    (start, end) byte ranges covering the file, each starting at a record
+    boundary (or the start of the file).
+    """
+    size = os.path.getsize(fasta_path)
+    if size == 0:
+        return []
+    chunk_bytes = max(1, int(chunk_bytes))
+    if size <= chunk_bytes:
+        return [(0, size)]
+    starts = [0]
+    with open(fasta_path, 'rb') as fasta_handle, \
+            _open_mmap(fasta_handle) as mm:
+        split = chunk_bytes
+        while split < size:
+            record_i = _next_record(mm, max(split, starts[-1] + 1), size)
+            if record_i < 0:
+                break
+            starts.append(record_i)
+            split = max(record_i + 1, split + chunk_bytes)
+    ends = starts[1:] + [size]
+    return list(zip(starts, ends))
+
+
+def _seq_len(seq):
+    seq_len = len(seq) - seq.count(b'\n')
+    if b'\r' in seq:
+        seq_len -= seq.count(b'\r')
+    if b' ' in seq or b'\t' in seq:
+        seq_len = len(seq.translate(None, SEQ_WHITESPACE))
+    return seq_len
+
+
+def _byte_classes(*classes):
+    """A (byte value, class) matrix of the bytes of each class."""
+    matrix = np.zeros((256, len(classes)), dtype=np.int64)
+    for class_i, class_bytes in enumerate(classes):
+        matrix[np.frombuffer(class_bytes, dtype=np.uint8), class_i] = 1
+    return matrix
+
+
+# byte counts . _BYTE_CLASSES = the whitespace, G+C, called base and N counts
+_BYTE_CLASSES = _byte_classes(SEQ_WHITESPACE, GC_BASES, CALLED_BASES, b'Nn')
+
+
+def _byte_counts(seq):
+    """The count of each byte value in seq."""
+    codes = np.frombuffer(seq, dtype=np.uint8)
+    if len(codes) <= COUNT_BLOCK_BYTES:
+        return np.bincount(codes, minlength=256)
+    counts = np.zeros(256, dtype=np.int64)
+    for block_start in range(0, len(codes), COUNT_BLOCK_BYTES):
+        counts += np.bincount(
+            codes[block_start:block_start+COUNT_BLOCK_BYTES], minlength=256)
+    return counts
+
+
+def _gap_runs(seq, min_gap_length):
+    """
+    The start and end offsets of the runs of at least min_gap_length Ns in
+    the sequence with its whitespace dropped, and that sequence's length.
+    The runs are found from the offsets of the Ns: a run ends wherever the
+    next N is not the next base.
+    """
+    codes = np.frombuffer(seq.translate(None, SEQ_WHITESPACE), dtype=np.uint8)
+    n_offsets = np.flatnonzero((codes | _LOWER_CASE_BIT) == _N_CODES[1])
+    run_breaks = np.flatnonzero(np.diff(n_offsets) != 1)
+    starts = n_offsets[np.insert(run_breaks + 1, 0, 0)]
+    ends = n_offsets[np.append(run_breaks, len(n_offsets) - 1)] + 1
+    is_gap = ends - starts >= min_gap_length
+    return starts[is_gap], ends[is_gap], len(codes)
+
+
+def _split_lens(gap_starts, gap_ends, seq_len):
+    """The lengths of the non-empty pieces of a sequence between its gaps."""
+    piece_lens = np.append(gap_starts, seq_len) - np.insert(gap_ends, 0, 0)
+    return piece_lens[piece_lens > 0].tolist()
+
+
+def _seq_composition(seq, min_gap_length=DEFAULT_MIN_GAP_LENGTH):
+    """
+    The length, G+C count, ambiguous base count, gap count and gap length of
+    a sequence, and the lengths of the contigs between its gaps (None when
+    it has no gaps).
+    """
+    whitespace_count, gc_count, called_count, n_count = \
+        _byte_counts(seq).dot(_BYTE_CLASSES).tolist()
+    seq_len = len(seq) - whitespace_count
+    ambiguous_count = seq_len - called_count
+    if n_count < min_gap_length:
+        return seq_len, gc_count, ambiguous_count, 0, 0, None
+    gap_starts, gap_ends, _ = _gap_runs(seq, min_gap_length)
+    if not len(gap_starts):
+        return seq_len, gc_count, ambiguous_count, 0, 0, None
+    return (seq_len, gc_count, ambiguous_count, len(gap_starts),
+            int((gap_ends - gap_starts).sum()),
+            _split_lens(gap_starts, gap_ends, seq_len))
+
+
+def canonical_digest(seq):
+    """
+    A signed 64 bit fingerprint of a sequence that is the same for its
+    reverse complement: the SHA-1 of the upper cased sequence without
+    whitespace or of its reverse complement, whichever sorts first.
+    """
+    forward = upper_sequence(seq)
+    reverse = reverse_complement(forward)
+    return int.from_bytes(hashlib.sha1(min(forward, reverse)).digest()[:8],
+                          'little', signed=True)
+
+
+def upper_sequence(seq):
+    """The sequence upper cased, without whitespace."""
+    return seq.translate(_UPPER_CASE, SEQ_WHITESPACE)
+
+
+def reverse_complement(seq):
+    """The reverse complement of an upper_sequence()."""
+    return seq.translate(_COMPLEMENT)[::-1]
+
+
+def contains_sequence(seq, sub_seq):
+    """
+    Whether sub_seq or its reverse complement is part of seq, both given as
+    upper_sequence()s.
+    """
+    return sub_seq in seq or reverse_complement(sub_seq) in seq
+
+
+def _packed_kmers(codes, kmer_length):
+    """
+    The 2 bit packed k-mer starting at each position of the base codes, as
+    uint64s with the first base highest, joined from packed 1, 2, 4, ...
+    -mers by doubling.
+    """
+    def _join(left, left_len, right, right_len):
+        n_out = len(right) - left_len
+        joined = left[:n_out] << np.uint64(2 * right_len)
+        joined |= right[left_len:left_len+n_out]
+        return joined
+
+    power = codes.astype(np.uint64)
+    power_len = 1
+    kmers = None
+    kmers_len = 0
+    remaining = kmer_length
+    while True:
+        if remaining & 1:
+            if kmers is None:
+                kmers = power
+            else:
+                kmers = _join(kmers, kmers_len, power, power_len)
+            kmers_len += power_len
+        remaining >>= 1
+        if not remaining:
+            return kmers
+        power = _join(power, power_len, power, power_len)
+        power_len *= 2
+
+
+def _reverse_complements(kmers, kmer_length):
+    """
+    The packed reverse complements of packed k-mers: the bits complemented,
+    the 2 bit codes reversed (within nibbles, within bytes, then the bytes)
+    and shifted down to the k-mer's length.
+    """
+    reverse = ~kmers
+    reverse = ((reverse >> np.uint64(2)) & np.uint64(0x3333333333333333)) | \
+        ((reverse & np.uint64(0x3333333333333333)) << np.uint64(2))
+    reverse = ((reverse >> np.uint64(4)) & np.uint64(0x0f0f0f0f0f0f0f0f)) | \
+        ((reverse & np.uint64(0x0f0f0f0f0f0f0f0f)) << np.uint64(4))
+    reverse = reverse.byteswap()
+    return reverse >> np.uint64(64 - 2 * kmer_length)
+
+
+def _mix(values):
+    """The splitmix64 finalizer of uint64s, in place."""
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xbf58476d1ce4e5b9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94d049bb133111eb)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def _block_samples(block, kmer_length, max_hash):
+    """
+    The start offsets and hashes of the sampled canonical k-mers of a block
+    of base codes.
+    """
+    kmers = _packed_kmers(block & 3, kmer_length)
+    hashes = _mix(np.minimum(kmers, _reverse_complements(kmers, kmer_length)))
+    is_sampled = hashes <= max_hash
+    is_ambiguous = block == 4
+    if is_ambiguous.any():
+        ambiguous_before = np.concatenate(([0], np.cumsum(is_ambiguous)))
+        is_sampled &= ambiguous_before[kmer_length:] == \
+            ambiguous_before[:-kmer_length]
+    return np.flatnonzero(is_sampled), hashes[is_sampled]
+
+
+def _sequence_samples(seq, kmer_length, kmer_scale):
+    """
+    The start offsets and hashes of the sampled canonical k-mers of a
+    sequence without whitespace, in order, a block of KMER_BLOCK_BASES
+    k-mers at a time.
+    """
+    codes = _BASE_CODES[np.frombuffer(seq, dtype=np.uint8)]
+    max_hash = np.uint64((2**64 - 1) // kmer_scale)
+    offsets = [np.zeros(0, dtype=np.intp)]
+    hashes = [np.zeros(0, dtype=np.uint64)]
+    for block_start in range(0, len(codes) - kmer_length + 1,
+                             KMER_BLOCK_BASES):
+        block_offsets, block_hashes = _block_samples(
+            codes[block_start:block_start+KMER_BLOCK_BASES+kmer_length-1],
+            kmer_length, max_hash)
+        offsets.append(block_offsets + block_start)
+        hashes.append(block_hashes)
+    return np.concatenate(offsets), np.concatenate(hashes)
+
+
+def sampled_kmers(seq, kmer_length=DEFAULT_KMER_LENGTH,
+                  kmer_scale=DEFAULT_KMER_SCALE):
+    """
+    The hashes of the canonical k-mers of a sequence that fall in the lowest
+    1/kmer_scale of the hash range, sorted and without repeats, as uint64s.
+    Whether a k-mer is kept depends on the k-mer alone, so the hashes of a
+    sequence contained in another, or in its reverse complement, are among
+    the other's.  K-mers with bases other than A, C, G or T are skipped.
+    """
+    return np.unique(_sequence_samples(seq.translate(None, SEQ_WHITESPACE),
+                                       kmer_length, kmer_scale)[1])
+
+
+def _joined_sampled_kmers(seqs, kmer_length, kmer_scale):
+    """
+    The sampled_kmers() of sequences without whitespace, hashed together as
+    one sequence with an N between them, so that no k-mer spans two: the
+    count of each sequence's hashes, and the hashes, sequence after
+    sequence.  This saves the NumPy call overhead of each short contig.
+    """
+    offsets, hashes = _sequence_samples(b'N'.join(seqs), kmer_length,
+                                        kmer_scale)
+    seq_ends = np.cumsum([len(seq) + 1 for seq in seqs])
+    seq_ids = np.searchsorted(seq_ends, offsets, side='right')
+    order = np.lexsort((hashes, seq_ids))
+    hashes = hashes[order]
+    seq_ids = seq_ids[order]
+    is_new = np.ones(len(hashes), dtype=bool)
+    is_new[1:] = (hashes[1:] != hashes[:-1]) | (seq_ids[1:] != seq_ids[:-1])
+    return (np.bincount(seq_ids[is_new], minlength=len(seqs)).tolist(),
+            hashes[is_new])
+
+
+def _records(mm, start, end):
+    """
+    (header_start, seq_start, seq_end) of each record in [start, end).  The
+    sequence runs to the next record, newlines included.  Text before the
+    first header is a record with header_start None.
+    """
+    pos = start
+    while pos < end:
+        if mm[pos] == 62:  # '>'
+            header_start = pos
+            header_end = mm.find(b'\n', pos, end)
+            if header_end < 0:
+                return  # a header without a sequence at the end
+            seq_start = header_end + 1
+        else:
+            header_start = None
+            seq_start = pos
+        next_i = _next_record(mm, seq_start, end)
+        seq_end = end if next_i < 0 else next_i
+        yield header_start, seq_start, seq_end
+        pos = seq_end
+
+
+def chunk_lengths(fasta_path, start, end):
+    """The lengths of the non-empty contigs in the range, in file order."""
+    lens = []
+    if start >= end:
+        return lens
+    with open(fasta_path, 'rb') as fasta_handle, \
+            _open_mmap(fasta_handle) as mm:
+        for _, seq_start, seq_end in _records(mm, start, end):
+            seq_len = _seq_len(mm[seq_start:seq_end])
+            if seq_len:
+                lens.append(seq_len)
+    return lens
+
+
+def file_lengths(fasta_path):
+    """The lengths of the non-empty contigs of the file, in file order."""
+    return chunk_lengths(fasta_path, 0, os.path.getsize(fasta_path))
+
+
+def chunk_composition(fasta_path, start, end,
+                      min_gap_length=DEFAULT_MIN_GAP_LENGTH,
+                      hash_contigs=False):
+    """
+    The lengths, G+C counts, ambiguous base counts, gap counts and gap
+    lengths of the non-empty contigs in the range, as five lists in file
+    order, a sixth list of the lengths of the contigs between the gaps of
+    the contigs that have gaps, and a seventh of the canonical_digest() of
+    each contig if hash_contigs (else empty).  Gaps are runs of at least
+    min_gap_length Ns.
+    """
+    lens = []
+    gc_counts = []
+    ambiguous_counts = []
+    gap_counts = []
+    gap_lens = []
+    split_lens = []
+    digests = []
+    if start >= end:
+        return (lens, gc_counts, ambiguous_counts, gap_counts, gap_lens,
+                split_lens, digests)
+    min_gap_length = max(1, int(min_gap_length))
+    with open(fasta_path, 'rb') as fasta_handle, \
+            _open_mmap(fasta_handle) as mm:
+        for _, seq_start, seq_end in _records(mm, start, end):
+            seq = mm[seq_start:seq_end]
+            seq_len, gc_count, ambiguous_count, gap_count, gap_len, \
+                seq_split_lens = _seq_composition(seq, min_gap_length)
+            if seq_len:
+                lens.append(seq_len)
+                gc_counts.append(gc_count)
+                ambiguous_counts.append(ambiguous_count)
+                gap_counts.append(gap_count)
+                gap_lens.append(gap_len)
+                if seq_split_lens is not None:
+                    split_lens.extend(seq_split_lens)
+                if hash_contigs:
+                    digests.append(canonical_digest(seq))
+    return (lens, gc_counts, ambiguous_counts, gap_counts, gap_lens,
+            split_lens, digests)
+
+
+def file_composition(fasta_path, min_gap_length=DEFAULT_MIN_GAP_LENGTH,
+                     hash_contigs=False):
+    """chunk_composition() of the whole file."""
+    return chunk_composition(fasta_path, 0, os.path.getsize(fasta_path),
+                             min_gap_length, hash_contigs)
+
+
+def chunk_contig_keys(fasta_path, start, end):
+    """
+    The offsets, lengths and canonical_digest() of the non-empty contigs in
+    the range, as three lists in file order.  A contig's offset is that of
+    its header line (or of its sequence if it has none), for read_contig().
+    """
+    offsets = []
+    lens = []
+    digests = []
+    if start >= end:
+        return offsets, lens, digests
+    with open(fasta_path, 'rb') as fasta_handle, \
+            _open_mmap(fasta_handle) as mm:
+        for header_start, seq_start, seq_end in _records(mm, start, end):
+            seq = mm[seq_start:seq_end]
+            seq_len = _seq_len(seq)
+            if seq_len:
+                offsets.append(seq_start if header_start is None
+                               else header_start)
+                lens.append(seq_len)
+                digests.append(canonical_digest(seq))
+    return offsets, lens, digests
+
+
+def file_contig_keys(fasta_path):
+    """chunk_contig_keys() of the whole file."""
+    return chunk_contig_keys(fasta_path, 0, os.path.getsize(fasta_path))
+
+
+@contextmanager
+def mapped_file(fasta_path):
+    """The file memory mapped for read_contig(), inside the block."""
+    with open(fasta_path, 'rb') as fasta_handle, \
+            _open_mmap(fasta_handle) as mm:
+        yield mm
+
+
+def read_contig(mm, offset):
+    """
+    The header (without its '>', None if there is none) and the sequence
+    bytes of the record at an offset of a mapped file.
+    """
+    header_start, seq_start, seq_end = next(_records(mm, offset, len(mm)))
+    if header_start is None:
+        return None, mm[seq_start:seq_end]
+    return mm[header_start+1:seq_start-1].rstrip(b'\r'), mm[seq_start:seq_end]
+
+
+def contig_kmers(fasta_path, offsets, kmer_length=DEFAULT_KMER_LENGTH,
+                 kmer_scale=DEFAULT_KMER_SCALE):
+    """
+    The sampled_kmers() of the contigs at the offsets of the file: the count
+    of each contig's hashes, and their hashes, contig after contig.  Contigs
+    shorter than KMER_BLOCK_BASES are hashed in batches of about that many
+    bases.
+    """
+    counts = []
+    hashes = [np.zeros(0, dtype=np.uint64)]
+    batch = []
+    batch_bases = 0
+
+    def _flush():
+        nonlocal batch_bases
+        batch_counts, batch_hashes = _joined_sampled_kmers(
+            batch, kmer_length, kmer_scale)
+        counts.extend(batch_counts)
+        hashes.append(batch_hashes)
+        del batch[:]
+        batch_bases = 0
+
+    with mapped_file(fasta_path) as mm:
+        for offset in offsets:
+            seq = read_contig(mm, offset)[1].translate(None, SEQ_WHITESPACE)
+            if len(seq) >= KMER_BLOCK_BASES:
+                if batch:
+                    _flush()
+                contig_hashes = np.unique(_sequence_samples(
+                    seq, kmer_length, kmer_scale)[1])
+                counts.append(len(contig_hashes))
+                hashes.append(contig_hashes)
+                continue
+            batch.append(seq)
+            batch_bases += len(seq)
+            if batch_bases >= KMER_BLOCK_BASES:
+                _flush()
+        if batch:
+            _flush()
+    return counts, np.concatenate(hashes)
+
+
+def filter_file(fasta_path, filtered_path, min_contig_length):
+    """filter_chunk() of the whole file."""
+    return filter_chunk(fasta_path, 0, os.path.getsize(fasta_path),
+                        filtered_path, min_contig_length)
+
+
+def filter_chunk(fasta_path, start, end, filtered_path, min_contig_length):
+    """
+    Write the contigs of the range of at least min_contig_length bp to
+    filtered_path, each as its header line and the sequence on one line.
+    Returns the number of contigs read and written.
+    """
+    min_contig_length = int(min_contig_length)
+    original_contig_count = 0
+    filtered_contig_count = 0
+    with open(filtered_path, 'wb', WRITE_BUF_SIZE) as filt_handle:
+        if start >= end:
+            return original_contig_count, filtered_contig_count
+        with open(fasta_path, 'rb') as fasta_handle, \
+                _open_mmap(fasta_handle) as mm:
+            for header_start, seq_start, seq_end in _records(mm, start, end):
+                seq = mm[seq_start:seq_end]
+                seq_len = _seq_len(seq)
+                if not seq_len:
+                    continue
+                original_contig_count += 1
+                if seq_len < min_contig_length:
+                    continue
+                filtered_contig_count += 1
+                if header_start is not None:
+                    # text mode reading turned \r\n into \n
+                    filt_handle.write(
+                        mm[header_start:seq_start-1].rstrip(b'\r') + b'\n')
+                _write_seq(filt_handle, seq)
+    return original_contig_count, filtered_contig_count
+
+
+def _write_seq(out_handle, seq):
+    """Write a sequence on one line."""
+    if b'\r' in seq or b' ' in seq or b'\t' in seq:
+        out_handle.write(seq.translate(None, SEQ_WHITESPACE))
+    else:
+        out_handle.write(seq.replace(b'\n', b''))
+    out_handle.write(b'\n')
+
+
+def write_contigs(fasta_path, offsets, out_handle, name_prefix=b''):
+    """
+    Write the contigs at the offsets of the file to out_handle, as by
+    filter_chunk() but with name_prefix before each header (a contig without
+    a header is named name_prefix+b'contig').
+    """
+    if not len(offsets):
+        # an empty file can't be mapped
+        return
+    with mapped_file(fasta_path) as mm:
+        for offset in offsets:
+            header, seq = read_contig(mm, offset)
+            out_handle.write(b'>' + name_prefix +
+                             (b'contig' if header is None else header) +
+                             b'\n')
+            _write_seq(out_handle, seq)
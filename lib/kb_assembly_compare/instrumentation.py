@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight per-stage instrumentation for the app methods.
+
+A RunTimer is made at the start of a method run, and the method marks the
+stage it is in (resolve, fetch, scan, stats, render, upload, report).  Each
+stage records wall time, CPU time, the peak RSS of the process at the end of
+the stage and the number of bytes it processed.  CPU time is that of this
+process plus its waited-for children, so the scan worker pools count once
+they have joined; under thread serving it also includes the other threads
+and the pools of the calls they run.  A stage that is entered
+more than once (e.g. upload) accumulates.  format_table() gives the per-run
+timing table for the log and the report.
+
+Functions registered with add_stage_listener() are called with
+(method_name, stage_name, wall_s, cpu_s, nbytes) each time a stage closes,
+e.g. to export the stage durations as service metrics.
+"""
+import resource
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_stage_listeners = []
+
+
+def add_stage_listener(listener):
+    if listener not in _stage_listeners:
+        _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener):
+    if listener in _stage_listeners:
+        _stage_listeners.remove(listener)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process and its waited-for children."""
+    # ru_maxrss is in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * 1024
+
+
+def cpu_seconds():
+    """CPU time of this process and its waited-for children."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class StageStats(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = 0
+        self.nbytes = 0
+
+    def to_dict(self):
+        return {'stage': self.name,
+                'calls': self.calls,
+                'wall_s': self.wall,
+                'cpu_s': self.cpu,
+                'peak_rss_bytes': self.peak_rss,
+                'bytes': self.nbytes}
+
+
+class RunTimer(object):
+    """
+    Collects stage timings for one method run.
+
+        timer = RunTimer('run_contig_distribution_compare')
+        timer.stage('resolve')
+        ...
+        timer.stage('fetch')
+        timer.add_bytes(os.path.getsize(path))
+        ...
+        timer.stop()
+        print(timer.format_table())
+
+    stage() closes the open stage (if any) and opens the named one.  span()
+    is the context manager form for code that isn't organized in steps.
+    """
+
+    def __init__(self, method_name):
+        self.method_name = method_name
+        self.stages = OrderedDict()
+        self._current = None
+        self._wall_start = None
+        self._cpu_start = None
+        self._nbytes_start = 0
+        self._run_wall_start = time.time()
+        self._run_cpu_start = cpu_seconds()
+
+    def stage(self, name):
+        self.stop()
+        if name not in self.stages:
+            self.stages[name] = StageStats(name)
+        self._current = self.stages[name]
+        self._nbytes_start = self._current.nbytes
+        self._wall_start = time.time()
+        self._cpu_start = cpu_seconds()
+
+    def stop(self):
+        if self._current is None:
+            return
+        stats = self._current
+        wall = time.time() - self._wall_start
+        cpu = cpu_seconds() - self._cpu_start
+        stats.calls += 1
+        stats.wall += wall
+        stats.cpu += cpu
+        stats.peak_rss = max(stats.peak_rss, peak_rss_bytes())
+        self._current = None
+        for listener in list(_stage_listeners):
+            try:
+                listener(self.method_name, stats.name, wall, cpu,
+                         stats.nbytes - self._nbytes_start)
+            except Exception:
+                # metrics must never break a method run
+                pass
+
+    @contextmanager
+    def span(self, name, nbytes=0):
+        """Time the enclosed block as stage name, then resume the open stage."""
+        resume = self._current.name if self._current is not None else None
+        self.stage(name)
+        self.add_bytes(nbytes)
+        try:
+            yield self
+        finally:
+            self.stop()
+            if resume is not None:
+                self.stage(resume)
+
+    def add_bytes(self, nbytes):
+        """Count bytes processed by the open stage."""
+        if self._current is not None and nbytes:
+            self._current.nbytes += int(nbytes)
+
+    def total_wall(self):
+        return time.time() - self._run_wall_start
+
+    def total_cpu(self):
+        return cpu_seconds() - self._run_cpu_start
+
+    def to_dict(self):
+        return {'method': self.method_name,
+                'wall_s': self.total_wall(),
+                'cpu_s': self.total_cpu(),
+                'peak_rss_bytes': peak_rss_bytes(),
+                'stages': [s.to_dict() for s in self.stages.values()]}
+
+    def format_table(self):
+        """
+        The timing table of the stages.  The call of a stage still open
+        (e.g. the report stage, when the table goes into the report) is left
+        out of its row and noted; TOTAL is the run so far.
+        """
+        mb = 1024.0 * 1024.0
+        row = "{:<10}{:>7}{:>11}{:>11}{:>15}{:>12}"
+        lines = ["TIMING for " + self.method_name,
+                 row.format('STAGE', 'CALLS', 'WALL (s)', 'CPU (s)',
+                            'PEAK RSS (MB)', 'DATA (MB)')]
+        for s in self.stages.values():
+            if s is self._current and not s.calls:
+                continue
+            lines.append(row.format(s.name, s.calls,
+                                    "{:.3f}".format(s.wall),
+                                    "{:.3f}".format(s.cpu),
+                                    "{:.1f}".format(s.peak_rss / mb),
+                                    "{:.1f}".format(s.nbytes / mb)))
+        lines.append(row.format('TOTAL', '',
+                                "{:.3f}".format(self.total_wall()),
+                                "{:.3f}".format(self.total_cpu()),
+                                "{:.1f}".format(peak_rss_bytes() / mb),
+                                ''))
+        if self._current is not None:
+            lines.append("(" + self._current.name +
+                         " still running, its open call not included)")
+        return "\n".join(lines)
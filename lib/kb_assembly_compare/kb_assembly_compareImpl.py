@@ -1,21 +1,21 @@
 # -*- coding: utf-8 -*-
 #BEGIN_HEADER
-import math
 import os
 import re
 import sys
+import tempfile
 import uuid
 from datetime import datetime
 from pprint import pprint, pformat
 
-import matplotlib.pyplot as plt
-import numpy as np
-
 from installed_clients.AssemblyUtilClient import AssemblyUtil
 from installed_clients.DataFileUtilClient import DataFileUtil as DFUClient
 from installed_clients.KBaseReportClient import KBaseReport
 from installed_clients.SetAPIServiceClient import SetAPI
 from installed_clients.WorkspaceClient import Workspace as workspaceService
+from kb_assembly_compare import contig_combine, contig_compare, fasta_chunks, parallel_scan, stats_export
+from kb_assembly_compare.instrumentation import RunTimer
+from kb_assembly_compare.profiling import MethodProfiler
 
 [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I,
  SIZE_I, META_I] = list(range(11))  # object_info tuple
@@ -63,6 +63,58 @@ class kb_assembly_compare:
         print('['+timestamp+'] '+message)
         sys.stdout.flush()
 
+    # resolve input Assembly and AssemblySet refs to the unique assembly refs,
+    # in input order, and their object names (None when names aren't wanted)
+    def _resolve_assembly_refs(self, wsClient, setAPI_Client, input_refs, console, get_names=True):
+        set_obj_type = "KBaseSets.AssemblySet"
+        assembly_obj_types = ["KBaseGenomeAnnotations.Assembly", "KBaseGenomes.ContigSet"]
+        accepted_input_types = [set_obj_type] + assembly_obj_types
+        assembly_refs = []
+        assembly_names = [] if get_names else None
+        assembly_refs_seen = set()
+
+        for input_ref in input_refs:
+            # assembly obj info
+            try:
+                input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':input_ref}]})[0]
+                input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
+                input_obj_name = input_obj_info[NAME_I]
+                self.log (console, "GETTING ASSEMBLY: "+str(input_ref)+" "+str(input_obj_name))  # DEBUG
+            except Exception as e:
+                raise ValueError('Unable to get object from workspace: (' + input_ref +'): ' + str(e))
+            if input_obj_type not in accepted_input_types:
+                raise ValueError ("Input object of type '"+input_obj_type+"' not accepted.  Must be one of "+", ".join(accepted_input_types))
+
+            # add members to assembly_ref list
+            if input_obj_type in assembly_obj_types:
+                if input_ref in assembly_refs_seen:
+                    continue
+                assembly_refs_seen.add(input_ref)
+                assembly_refs.append(input_ref)
+                if get_names:
+                    assembly_names.append(input_obj_name)
+            else:  # add assembly set members
+                try:
+                    assemblySet_obj = setAPI_Client.get_assembly_set_v1 ({'ref':input_ref, 'include_item_info':1})
+                except Exception as e:
+                    raise ValueError('Unable to get object from workspace: (' + input_ref +')' + str(e))
+
+                for assembly_obj in assemblySet_obj['data']['items']:
+                    this_assembly_ref = assembly_obj['ref']
+                    if this_assembly_ref in assembly_refs_seen:
+                        continue
+                    assembly_refs_seen.add(this_assembly_ref)
+                    assembly_refs.append(this_assembly_ref)
+                    if not get_names:
+                        continue
+                    try:
+                        this_input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':this_assembly_ref}]})[0]
+                        assembly_names.append(this_input_obj_info[NAME_I])
+                    except Exception as e:
+                        raise ValueError('Unable to get object from workspace: (' + this_assembly_ref +')' + str(e))
+
+        return assembly_refs, assembly_names
+
     #END_CLASS_HEADER
 
     # config contains contents of config file in a hash or None if it couldn't
@@ -75,6 +127,9 @@ class kb_assembly_compare:
         self.serviceWizardURL = config['srv-wiz-url']
         self.callbackURL = os.environ['SDK_CALLBACK_URL']
         self.scratch = os.path.abspath(config['scratch'])
+        self.config = config
+        self.scan_workers = parallel_scan.scan_workers(config)
+        self.scan_chunk_bytes = parallel_scan.scan_chunk_bytes(config)
 
         pprint(config)
 
@@ -112,6 +167,9 @@ class kb_assembly_compare:
         console = []
         invalid_msgs = []
         report_text = ''
+        timer = RunTimer('run_filter_contigs_by_length')
+        profiler = MethodProfiler('run_filter_contigs_by_length', self.scratch, self.config)
+        profiler.start()
         self.log(console, 'Running run_filter_contigs_by_length(): ')
         self.log(console, "\n"+pformat(params))
 
@@ -164,11 +222,8 @@ class kb_assembly_compare:
         for input_ref in params['input_assembly_refs']:
             provenance[0]['input_ws_objects'].append(input_ref)
 
-        # set the output paths
-        timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds()*1000)
-        output_dir = os.path.join(self.scratch,'output.'+str(timestamp))
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        # set the output paths (unique, as calls may run concurrently)
+        output_dir = tempfile.mkdtemp(prefix='output.', dir=self.scratch)
         html_output_dir = os.path.join(output_dir,'html')
         if not os.path.exists(html_output_dir):
             os.makedirs(html_output_dir)
@@ -176,69 +231,14 @@ class kb_assembly_compare:
 
         #### STEP 1: get assembly refs
         ##
+        timer.stage('resolve')
         if len(invalid_msgs) == 0:
-            set_obj_type = "KBaseSets.AssemblySet"
-            assembly_obj_types = ["KBaseGenomeAnnotations.Assembly", "KBaseGenomes.ContigSet"]
-            accepted_input_types = [set_obj_type] + assembly_obj_types
-            assembly_refs = []
-            assembly_names = []
-            assembly_refs_seen = dict()
-
-            for i,input_ref in enumerate(params['input_assembly_refs']):
-
-                # assembly obj info
-                try:
-
-                    input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':input_ref}]})[0]
-                    #print ("INPUT_OBJ_INFO")
-                    #pprint(input_obj_info)  # DEBUG
-                    input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
-                    input_obj_name = input_obj_info[NAME_I]
-                    self.log (console, "Adding ASSEMBLY: "+str(input_ref)+" "+str(input_obj_name))  # DEBUG
-                except Exception as e:
-                    raise ValueError('Unable to get object from workspace: (' + input_ref +'): ' + str(e))
-
-                if input_obj_type not in accepted_input_types:
-                    raise ValueError ("Input object of type '"+input_obj_type+"' not accepted.  Must be one of "+", ".join(accepted_input_types))
-
-                # add members to assembly_ref list
-                if input_obj_type in assembly_obj_types:
-                    try:
-                        assembly_seen = assembly_refs_seen[input_ref]
-                        continue
-                    except:
-                        assembly_refs_seen[input_ref] = True
-                        assembly_refs.append(input_ref)
-                        assembly_names.append(input_obj_name)
-                elif input_obj_type != set_obj_type:
-                    raise ValueError ("bad obj type for input_ref: "+input_ref)
-                else:  # add assembly set members
-
-                    try:
-                        assemblySet_obj = setAPI_Client.get_assembly_set_v1 ({'ref':input_ref, 'include_item_info':1})
-                    except Exception as e:
-                        raise ValueError('Unable to get object from workspace: (' + input_ref +')' + str(e))
-
-                    for assembly_obj in assemblySet_obj['data']['items']:
-                        this_assembly_ref = assembly_obj['ref']
-                        try:
-                            assembly_seen = assembly_refs_seen[this_assembly_ref]
-                            continue
-                        except:
-                            assembly_refs_seen[this_assembly_ref] = True
-                            assembly_refs.append(this_assembly_ref)
-                            try:
-
-                                this_input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':this_assembly_ref}]})[0]
-                                this_input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
-                                this_input_obj_name = this_input_obj_info[NAME_I]
-                                assembly_names.append(this_input_obj_name)
-                            except Exception as e:
-                                raise ValueError('Unable to get object from workspace: (' + this_assembly_ref +')' + str(e))
+            assembly_refs, assembly_names = self._resolve_assembly_refs(wsClient, setAPI_Client, params['input_assembly_refs'], console)
 
 
         #### STEP 2: Get assemblies to score as fasta files
         ##
+        timer.stage('fetch')
         if len(invalid_msgs) == 0:
             self.log (console, "Retrieving Assemblies")  # DEBUG
 
@@ -252,6 +252,7 @@ class kb_assembly_compare:
                 contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
                 sys.stdout.flush()
                 contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                timer.add_bytes(os.path.getsize(contig_file_path))
                 score_assembly_file_paths.append(contig_file_path)
                 #clean_ass_ref = assembly_ref.replace('/','_')
                 #assembly_outfile_path = os.join(assembly_outdir, clean_assembly_ref+".fna")
@@ -260,58 +261,34 @@ class kb_assembly_compare:
 
         #### STEP 3: Get contig attributes and create filtered output files
         ##
+        timer.stage('scan')
         if len(invalid_msgs) == 0:
             filtered_contig_file_paths = []
             original_contig_count = []
             filtered_contig_count = []
 
-            # score fasta lens in contig files
-            read_buf_size  = 65536
-            write_buf_size = 65536
-
-            lens = []
             for ass_i,assembly_file_path in enumerate(score_assembly_file_paths):
                 ass_name = assembly_names[ass_i]
                 self.log (console, "Reading contig lengths in assembly: "+ass_name)  # DEBUG
 
-                original_contig_count.append(0)
-                filtered_contig_count.append(0)
                 filtered_file_path = assembly_file_path+".min_contig_length="+str(params['min_contig_length'])+"bp"
                 filtered_contig_file_paths.append(filtered_file_path)
-                with open (assembly_file_path, 'r', read_buf_size) as ass_handle, \
-                     open (filtered_file_path, 'w', write_buf_size) as filt_handle:
-                    seq_buf = ''
-                    last_header = ''
-                    for fasta_line in ass_handle:
-                        if fasta_line.startswith('>'):
-                            if seq_buf != '':
-                                original_contig_count[ass_i] += 1
-                                seq_len = len(seq_buf)
-                                if seq_len >= int(params['min_contig_length']):
-                                    filtered_contig_count[ass_i] += 1
-                                    filt_handle.write(last_header)  # last_header already has newline
-                                    filt_handle.write(seq_buf+"\n")
-                                seq_buf = ''
-                                last_header = fasta_line
-                        else:
-                            seq_buf += ''.join(fasta_line.split())
-                    if seq_buf != '':
-                        original_contig_count[ass_i] += 1
-                        seq_len = len(seq_buf)
-                        if seq_len >= int(params['min_contig_length']):
-                            filtered_contig_count[ass_i] += 1
-                            filt_handle.write(last_header)  # last_header already has newline
-                            filt_handle.write(seq_buf+"\n")
-                        seq_buf = ''
-
-                # DEBUG
-                #with open (filtered_file_path, 'r', read_buf_size) as ass_handle:
-                #    for fasta_line in ass_handle:
-                #        print ("FILTERED LINE: '"+fasta_line+"'")
+                timer.add_bytes(os.path.getsize(assembly_file_path))
+
+            # filter the assemblies in parallel
+            counts = parallel_scan.filter_assemblies(score_assembly_file_paths,
+                                                     filtered_contig_file_paths,
+                                                     params['min_contig_length'],
+                                                     self.scan_workers,
+                                                     self.scan_chunk_bytes)
+            for this_original_count, this_filtered_count in counts:
+                original_contig_count.append(this_original_count)
+                filtered_contig_count.append(this_filtered_count)
 
 
         #### STEP 4: save the filtered assemblies
         ##
+        timer.stage('upload')
         if len(invalid_msgs) == 0:
             non_zero_output_seen = False
             filtered_contig_refs  = []
@@ -328,6 +305,7 @@ class kb_assembly_compare:
                         output_obj_name = params['output_name']
                     else:
                         output_obj_name = assembly_names[ass_i]+".min_contig_length"+str(params['min_contig_length'])+"bp"
+                    timer.add_bytes(os.path.getsize(filtered_contig_file))
                     output_data_ref = auClient.save_assembly_from_fasta({
                         'file': {'path': filtered_contig_file},
                         'workspace_name': params['workspace_name'],
@@ -377,6 +355,7 @@ class kb_assembly_compare:
 
         #### STEP 5: generate and save the report
         ##
+        timer.stage('report')
         if len(invalid_msgs) > 0:
             report_text += "\n".join(invalid_msgs)
             objects_created = None
@@ -402,15 +381,21 @@ class kb_assembly_compare:
                     objects_created.append({'ref': filtered_contig_refs[ass_i], 'description': filtered_contig_names[ass_i]+" filtered min_contig_length >= "+str(params['min_contig_length'])+"bp"})
 
         # Save report
+        report_text += "\n" + timer.format_table() + "\n"
+        profiler.stop()
         print('Saving report')
         kbr = KBaseReport(self.callbackURL)
         report_info = kbr.create_extended_report(
             {'message': report_text,
              'objects_created': objects_created,
+             'file_links': profiler.upload(dfuClient),
              'report_object_name': 'kb_filter_contigs_by_length_report_' + str(uuid.uuid4()),
              'workspace_name': params['workspace_name']
              })
 
+        timer.stop()
+        self.log(console, timer.format_table())
+
         # STEP 6: contruct the output to send back
         returnVal = {'report_name': report_info['name'], 'report_ref': report_info['ref']}
 
@@ -435,7 +420,10 @@ class kb_assembly_compare:
            "id" is a numerical identifier of the workspace or object, and
            should just be used for workspace ** "name" is a string identifier
            of a workspace or object.  This is received from Narrative.),
-           parameter "input_assembly_refs" of type "data_obj_ref"
+           parameter "input_assembly_refs" of type "data_obj_ref", parameter
+           "stats_format" of String, parameter "dump_contig_lengths" of type
+           "bool", parameter "min_gap_length" of Long, parameter
+           "find_duplicate_contigs" of type "bool"
         :returns: instance of type "Contig_Distribution_Compare_Output" ->
            structure: parameter "report_name" of type "data_obj_name",
            parameter "report_ref" of type "data_obj_ref"
@@ -452,6 +440,9 @@ class kb_assembly_compare:
         console = []
         invalid_msgs = []
         report_text = ''
+        timer = RunTimer('run_contig_distribution_compare')
+        profiler = MethodProfiler('run_contig_distribution_compare', self.scratch, self.config)
+        profiler.start()
         self.log(console, 'Running run_contig_distribution_compare(): ')
         self.log(console, "\n"+pformat(params))
 
@@ -493,6 +484,14 @@ class kb_assembly_compare:
         for arg in required_params:
             if arg not in params or params[arg] == None or params[arg] == '':
                 raise ValueError ("Must define required param: '"+arg+"'")
+        stats_formats = stats_export.parse_stats_formats(params.get('stats_format'))
+        dump_contig_lengths = int(params.get('dump_contig_lengths') or 0) == 1
+        min_gap_length = fasta_chunks.DEFAULT_MIN_GAP_LENGTH
+        if params.get('min_gap_length') not in (None, ''):
+            min_gap_length = int(params['min_gap_length'])
+            if min_gap_length < 1:
+                raise ValueError ("min_gap_length must be at least 1")
+        find_duplicate_contigs = int(params.get('find_duplicate_contigs') or 0) == 1
 
         # load provenance
         provenance = [{}]
@@ -502,83 +501,23 @@ class kb_assembly_compare:
         for input_ref in params['input_assembly_refs']:
             provenance[0]['input_ws_objects'].append(input_ref)
 
-        # set the output paths
-        timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds()*1000)
-        output_dir = os.path.join(self.scratch,'output.'+str(timestamp))
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        # set the output paths (unique, as calls may run concurrently)
+        output_dir = tempfile.mkdtemp(prefix='output.', dir=self.scratch)
         html_output_dir = os.path.join(output_dir,'html')
         if not os.path.exists(html_output_dir):
             os.makedirs(html_output_dir)
-        hist_folder_name = 'histograms'
-        hist_output_dir = os.path.join(html_output_dir,hist_folder_name)
-        if not os.path.exists(hist_output_dir):
-            os.makedirs(hist_output_dir)
 
 
         #### STEP 1: get assembly refs
         ##
+        timer.stage('resolve')
         if len(invalid_msgs) == 0:
-            set_obj_type = "KBaseSets.AssemblySet"
-            assembly_obj_types = ["KBaseGenomeAnnotations.Assembly", "KBaseGenomes.ContigSet"]
-            accepted_input_types = [set_obj_type] + assembly_obj_types
-            assembly_refs = []
-            assembly_names = []
-            assembly_refs_seen = dict()
-
-            for i,input_ref in enumerate(params['input_assembly_refs']):
-                # assembly obj info
-                try:
-
-                    input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':input_ref}]})[0]
-                    input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
-                    input_obj_name = input_obj_info[NAME_I]
-
-                    self.log (console, "GETTING ASSEMBLY: "+str(input_ref)+" "+str(input_obj_name))  # DEBUG
-
-                except Exception as e:
-                    raise ValueError('Unable to get object from workspace: (' + input_ref +'): ' + str(e))
-                if input_obj_type not in accepted_input_types:
-                    raise ValueError ("Input object of type '"+input_obj_type+"' not accepted.  Must be one of "+", ".join(accepted_input_types))
-
-                # add members to assembly_ref list
-                if input_obj_type in assembly_obj_types:
-                    try:
-                        assembly_seen = assembly_refs_seen[input_ref]
-                        continue
-                    except:
-                        assembly_refs_seen[input_ref] = True
-                        assembly_refs.append(input_ref)
-                        assembly_names.append(input_obj_name)
-                elif input_obj_type != set_obj_type:
-                    raise ValueError ("bad obj type for input_ref: "+input_ref)
-                else:  # add assembly set members
-
-                    try:
-                        assemblySet_obj = setAPI_Client.get_assembly_set_v1 ({'ref':input_ref, 'include_item_info':1})
-                    except Exception as e:
-                        raise ValueError('Unable to get object from workspace: (' + input_ref +')' + str(e))
-
-                    for assembly_obj in assemblySet_obj['data']['items']:
-                        this_assembly_ref = assembly_obj['ref']
-                        try:
-                            assembly_seen = assembly_refs_seen[this_assembly_ref]
-                            continue
-                        except:
-                            assembly_refs_seen[this_assembly_ref] = True
-                            assembly_refs.append(this_assembly_ref)
-                            try:
-
-                                this_input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':this_assembly_ref}]})[0]
-                                this_input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
-                                this_input_obj_name = this_input_obj_info[NAME_I]
-                                assembly_names.append(this_input_obj_name)
-                            except Exception as e:
-                                raise ValueError('Unable to get object from workspace: (' + this_assembly_ref +')' + str(e))
+            assembly_refs, assembly_names = self._resolve_assembly_refs(wsClient, setAPI_Client, params['input_assembly_refs'], console)
 
 
         #### STEP 2: Get assemblies to score as fasta files
         ##
+        timer.stage('fetch')
         if len(invalid_msgs) == 0:
             self.log (console, "Retrieving Assemblies")  # DEBUG
 
@@ -592,6 +531,7 @@ class kb_assembly_compare:
                 contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
                 sys.stdout.flush()
                 contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                timer.add_bytes(os.path.getsize(contig_file_path))
                 score_assembly_file_paths.append(contig_file_path)
                 #clean_ass_ref = assembly_ref.replace('/','_')
                 #assembly_outfile_path = os.join(assembly_outdir, clean_assembly_ref+".fna")
@@ -600,809 +540,101 @@ class kb_assembly_compare:
 
         #### STEP 3: Get distributions of contig attributes
         ##
+        timer.stage('scan')
         if len(invalid_msgs) == 0:
 
-            # score fasta lens in contig files
-            read_buf_size  = 65536
-            #write_buf_size = 65536
-
-            lens = []
+            # score fasta lens, base composition and scaffold gaps in contig files, in parallel
             for ass_i,assembly_file_path in enumerate(score_assembly_file_paths):
                 ass_name = assembly_names[ass_i]
-                self.log (console, "Reading contig lengths in assembly: "+ass_name)  # DEBUG
-
-                lens.append([])
-                with open (assembly_file_path, 'r', read_buf_size) as ass_handle:
-                    seq_buf = ''
-                    for fasta_line in ass_handle:
-                        if fasta_line.startswith('>'):
-                            if seq_buf != '':
-                                seq_len = len(seq_buf)
-                                lens[ass_i].append(seq_len)
-                                seq_buf = ''
-                        else:
-                            seq_buf += ''.join(fasta_line.split())
-                    if seq_buf != '':
-                        seq_len = len(seq_buf)
-                        lens[ass_i].append(seq_len)
-                        seq_buf = ''
-
-            # sort lens (absolutely critical to subsequent steps)
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Sorting contig lens for "+ass_name)  # DEBUG
-                lens[ass_i].sort(key=int, reverse=True)  # sorting is critical.  this sort() is in place
-
-            # get min_max ranges
-            huge_val = 100000000000000000
-            len_buckets = [ 1000000, 100000, 10000, 1000, 500, 1 ]
-            percs = [50, 75, 90]
-            max_len = 0
-            max_lens = []
-            best_val = { 'len': 0,
-                         'N': {},
-                         'L': {},
-                         'summary_stats': {},
-                         'cumulative_len_stats': {}
-                         }
-            worst_val = { 'len': huge_val,
-                          'N': {},
-                          'L': {},
-                          'summary_stats': {},
-                          'cumulative_len_stats': {}
-                          }
-            for perc in percs:
-                best_val['N'][perc] = 0
-                best_val['L'][perc] = huge_val
-                worst_val['N'][perc] = huge_val
-                worst_val['L'][perc] = 0
-            for bucket in len_buckets:
-                best_val['summary_stats'][bucket] = 0
-                best_val['cumulative_len_stats'][bucket] = 0
-                worst_val['summary_stats'][bucket] = huge_val
-                worst_val['cumulative_len_stats'][bucket] = huge_val
-
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Getting max lens "+ass_name)  # DEBUG
-                this_max_len = lens[ass_i][0]
-                max_lens.append(this_max_len)
-                if this_max_len > max_len:
-                    max_len = this_max_len
-
-            # Sum cumulative plot data
-            max_total = 0
-            total_lens = []
-            cumulative_lens = []
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Summing cumulative lens for "+ass_name)  # DEBUG
-                total_lens.append(0)
-                cumulative_lens.append([])
-                for val in lens[ass_i]:
-                    cumulative_lens[ass_i].append(total_lens[ass_i]+val)
-                    total_lens[ass_i] += val
-            for ass_i,ass_name in enumerate(assembly_names):
-                if total_lens[ass_i] > max_total:
-                    max_total = total_lens[ass_i]
-
-            """
-            # DEBUG
-            self.log (console, "SORTED VALS\n================================")
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, ass_name)
-                self.log (console, "\t\t"+"TOTAL_LEN: "+str(total_lens[ass_i]))
-                for val_i,val in enumerate(lens[ass_i]):
-                    self.log (console, "\t\t\t"+"VAL: "+str(val))
-                for len_i,length in enumerate(cumulative_lens[ass_i]):
-                    self.log (console, "\t\t\t"+"LEN: "+str(length))
-            # END DEBUG
-            """
-
-            # get N50 and L50 (and 75s, and 90s)
-            N = dict()
-            L = dict()
-            for perc in percs:
-                N[perc] = []
-                L[perc] = []
-            for perc in percs:
-                frac = perc/100.0
-                for ass_i,ass_name in enumerate(assembly_names):
-                    self.log (console, "Getting N/L"+str(perc)+" for "+ass_name)  # DEBUG
-                    for val_i,val in enumerate(lens[ass_i]):
-                        if cumulative_lens[ass_i][val_i] >= frac * total_lens[ass_i]:
-                            N[perc].append(val)
-                            L[perc].append(val_i+1)
-                            break
-
-            """
-            # DEBUG
-            self.log (console, "N50, etc.\n================================")
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, ass_name)
-                for perc in percs:
-                    self.log (console, "\t"+"N"+str(perc)+": "+str(N[perc][ass_i]))
-                    self.log (console, "\t"+"L"+str(perc)+": "+str(L[perc][ass_i]))
-            # END DEBUG
-            """
-
-            # count buckets and make hist without lens < 10K
-
-            # count buckets and transform lens to log of length for hist
-            #hist_window_width = 10000  # make it log scale?
-            #N_hist_windows = int(max_len % hist_window_width)
-            #len_buckets = [ 1000000, 500000, 100000, 50000, 10000, 5000, 1000, 500, 0 ]
-            summary_stats = []
-            cumulative_len_stats = []
-            hist_vals = []
-            hist_cnt_by_bin = []  # just to get shared heights for separate hist graphs
-            top_hist_cnt = [0, 0, 0]
-            #hist_binwidth = [500, 5000, 20000]
-            long_contig_nbins = 70
-            hist_binwidth = [500, 5000, (max_len // long_contig_nbins)]
-            min_hist_val_accept = [0, 10000, 100000]
-            max_hist_val_accept = [10000, 100000, 100000000000000000000]
-            #log_lens = []
-            #max_log_len = 0
-            for ass_i,ass_name in enumerate(assembly_names):
-                self.log (console, "Building summary and histograms from assembly: "+ass_name)  # DEBUG
-                #lens[ass_i].sort(key=int, reverse=True)  # sorting is critical.  Already sorted
-
-                # hist
-                """
-                # get log lens
-                log_lens.append([])
-                for val in lens[ass_i]:
-                    log10_val = math.log10(val)
-                    if log10_val > max_log_len:
-                        max_log10_len = log10_val
-                    log_lens[ass_i].append(log10_val)
-                """
-                hist_vals.append([])
-                hist_cnt_by_bin.append([])
-                for hist_i,top_cnt in enumerate(top_hist_cnt):
-                    hist_vals[ass_i].append([])
-                    hist_cnt_by_bin[ass_i].append([])
-                    long_len = max_len
-                    if hist_i < len(top_hist_cnt)-1:
-                        long_len = max_hist_val_accept[hist_i]
-                    for bin_i in range((long_len // hist_binwidth[hist_i])+1):
-                        hist_cnt_by_bin[ass_i][hist_i].append(0)
-
-                for val in lens[ass_i]:
-                    this_hist_i = 0
-                    for hist_i,top_cnt in enumerate(top_hist_cnt):
-                        if val >= min_hist_val_accept[hist_i] and val < max_hist_val_accept[hist_i]:
-                            this_hist_i = hist_i
-                            break
-                    bin_i = val // hist_binwidth[this_hist_i]
-                    hist_cnt_by_bin[ass_i][this_hist_i][bin_i] += 1
-                    hist_vals[ass_i][this_hist_i].append(val)
-                    if hist_cnt_by_bin[ass_i][this_hist_i][bin_i] > top_hist_cnt[this_hist_i]:
-                        top_hist_cnt[this_hist_i] = hist_cnt_by_bin[ass_i][this_hist_i][bin_i]
-
-                # summary stats
-                summary_stats.append(dict())
-                cumulative_len_stats.append(dict())
-                for bucket in len_buckets:
-                    summary_stats[ass_i][bucket] = 0
-                    cumulative_len_stats[ass_i][bucket] = 0
-                curr_bucket_i = 0
-                for val in lens[ass_i]:
-                    for bucket_i in range(curr_bucket_i,len(len_buckets)):
-                        bucket = len_buckets[bucket_i]
-                        if val >= bucket:
-                            summary_stats[ass_i][bucket] += 1
-                            cumulative_len_stats[ass_i][bucket] += val
-                            #curr_bucket_i = bucket_i
-                            #break
-                        else:
-                            curr_bucket_i = bucket_i + 1
-
-            # adjust best and worst values
-            for ass_i,ass_name in enumerate(assembly_names):
-                if max_lens[ass_i] > best_val['len']:
-                    best_val['len'] = max_lens[ass_i]
-                if max_lens[ass_i] < worst_val['len']:
-                    worst_val['len'] = max_lens[ass_i]
-
-                for perc in percs:
-                    if N[perc][ass_i] > best_val['N'][perc]:
-                        best_val['N'][perc] = N[perc][ass_i]
-                    if N[perc][ass_i] < worst_val['N'][perc]:
-                        worst_val['N'][perc] = N[perc][ass_i]
-                    if L[perc][ass_i] < best_val['L'][perc]:
-                        best_val['L'][perc] = L[perc][ass_i]
-                    if L[perc][ass_i] > worst_val['L'][perc]:
-                        worst_val['L'][perc] = L[perc][ass_i]
-
-                for bucket in len_buckets:
-                    if summary_stats[ass_i][bucket] > best_val['summary_stats'][bucket]:
-                        best_val['summary_stats'][bucket] = summary_stats[ass_i][bucket]
-                    if summary_stats[ass_i][bucket] < worst_val['summary_stats'][bucket]:
-                        worst_val['summary_stats'][bucket] = summary_stats[ass_i][bucket]
-                    if cumulative_len_stats[ass_i][bucket] > best_val['cumulative_len_stats'][bucket]:
-                        best_val['cumulative_len_stats'][bucket] = cumulative_len_stats[ass_i][bucket]
-                    if cumulative_len_stats[ass_i][bucket] < worst_val['cumulative_len_stats'][bucket]:
-                        worst_val['cumulative_len_stats'][bucket] = cumulative_len_stats[ass_i][bucket]
+                self.log (console, "Reading contig lengths and composition in assembly: "+ass_name)  # DEBUG
+                timer.add_bytes(os.path.getsize(assembly_file_path))
+            scans = parallel_scan.scan_contig_composition(score_assembly_file_paths,
+                                                          self.scan_workers,
+                                                          self.scratch,
+                                                          self.scan_chunk_bytes,
+                                                          min_gap_length,
+                                                          find_duplicate_contigs)
+            lens = [scan['lens'] for scan in scans]
+
+            # sort lens and get N/L stats, bucket counts, histograms and GC
+            timer.stage('stats')
+            self.log (console, "Getting contig length stats")  # DEBUG
+            dist = contig_compare.compare_contig_distributions(lens, composition=scans)
 
 
         #### STEP 4: build text report
         ##
+        timer.stage('report')
         if len(invalid_msgs) == 0:
-            for ass_i,ass_name in enumerate(assembly_names):
-                report_text += "ASSEMBLY STATS for "+ass_name+"\n"
-
-                report_text += "\t"+"Len longest contig: "+str(max_lens[ass_i])+" bp"+"\n"
-                for perc in percs:
-                    report_text += "\t"+"N"+str(perc)+" (L"+str(perc)+"):\t"+str(N[perc][ass_i])+" ("+str(L[perc][ass_i])+")"+"\n"
-                for bucket in len_buckets:
-                    report_text += "\t"+"Num contigs >= "+str(bucket)+" bp:\t"+str(summary_stats[ass_i][bucket])+"\n"
-                report_text += "\n"
-
-                for bucket in len_buckets:
-                    report_text += "\t"+"Len contigs >= "+str(bucket)+" bp:\t"+str(cumulative_len_stats[ass_i][bucket])+" bp"+"\n"
-                report_text += "\n"
+            report_text += contig_compare.distribution_report_text(assembly_names, dist)
 
         self.log(console, report_text)  # DEBUG
 
 
-        #### STEP 5: Make figures with matplotlib
+        #### STEP 5: Make figures with matplotlib and the HTML report
         ##
+        timer.stage('render')
+        rendered = contig_compare.render_distribution_report(
+            assembly_names, dist, html_output_dir,
+            log=lambda message: self.log(console, message))
+        html_file = rendered['html_file']
+        hist_output_dir = rendered['hist_dir']
+
+        # machine-readable stats and contig lengths
+        stats_output_dir = os.path.join(output_dir, 'stats')
+        stats_files = stats_export.export_stats(assembly_names, dist,
+                                                stats_output_dir,
+                                                stats_formats,
+                                                dump_contig_lengths)
+
+        # upload PNGs and PDFs
+        timer.stage('upload')
         file_links = []
-        shared_img_in_height = 4.0
-        total_ass = len(assembly_names)
-
-        # Key
-        plot_name = "key_plot"
-        plot_name_desc = "KEY"
-        self.log (console, "GENERATING PLOT "+plot_name_desc)
-        img_dpi = 200
-        img_units = "in"
-        #spacing = 1.0 / float(total_ass+3)
-        spacing = 1.0
-        img_in_width  = 6.0
-        img_in_height = 0.5 * (total_ass)
-        x_text_margin = 0.01
-        y_text_margin = 0.01
-        title_fontsize = 12
-        #text_color = "#606060"
-        text_color = "#303030"
-        text_fontsize = 10
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            #ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            #ax.spines['bottom'].set_visible(False)  # bottom axis line
-            #ax.spines['left'].set_visible(False)    # left axis line
-            #ax.spines['right'].set_visible(False)   # right axis line
-        #ax.grid(True)
-        #ax.set_title (plot_name_desc)
-        #ax.set_xlabel ('sorted contig order (longest to shortest)')
-        #ax.set_ylabel ('sum of contig lengths (Mbp)')
-        #plt.tight_layout()
-
-        # build x and y coord lists
-        x0 = 1
-        x1 = 2
-        x_indent = 0.1
-        x_coords = [x0, x1]
-        ax.set_xlim(x0-x_indent, x1+x_indent)
-        #ax.set_ylim(-1*spacing, (total_ass+1)*spacing)
-        ax.set_ylim(0, (total_ass+1)*spacing)
-        for ass_i,ass_name in enumerate(assembly_names):
-            y_pos = (total_ass - ass_i) * spacing
-            y_coords = [y_pos, y_pos]
-            plt.plot(x_coords, y_coords, lw=2)
-            ax.text (x0+x_text_margin, y_pos+y_text_margin, ass_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=text_fontsize, zorder=1)
-        #ax.text (0.5*(x0+x1), -1*spacing+y_text_margin, plot_name_desc, verticalalignment="bottom", horizontalalignment="center", color=text_color, fontsize=title_fontsize, zorder=2)
-        ax.text (0.5*(x0+x1), 0+y_text_margin, plot_name_desc, verticalalignment="bottom", horizontalalignment="center", color=text_color, fontsize=title_fontsize, zorder=2)
-
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        key_png_file = png_file = plot_name+".png"
-        key_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
-
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-
-
-        # Cumulative len plot
-        plot_name = "cumulative_len_plot"
-        plot_name_desc = "Cumulative Length (in Mbp)"
-        self.log (console, "GENERATING PLOT "+plot_name_desc)
-        val_scale_shift = 1000000.0  # to make Mbp
-        img_dpi = 200
-        img_units = "in"
-        img_in_width  = 6.0
-        img_in_height = shared_img_in_height
-        x_margin = 0.01
-        y_margin = 0.01
-        title_fontsize = 12
-        text_color = "#606060"
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        """
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            ax.spines['bottom'].set_visible(False)  # bottom axis line
-            ax.spines['left'].set_visible(False)    # left axis line
-            ax.spines['right'].set_visible(False)   # right axis line
-        """
-        ax.grid(True)
-        ax.set_title (plot_name_desc)
-        ax.set_xlabel ('sorted contig order (longest to shortest)')
-        ax.set_ylabel ('sum of contig lengths (Mbp)')
-        plt.tight_layout()
-        #ax.text (x_margin, 1.0-(y_margin), plot_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=title_fontsize, zorder=1)
-
-        # build x and y coord lists
-        for ass_i,ass_name in enumerate(assembly_names):
-            x_coords = []
-            y_coords = []
-            for val_i,val in enumerate(cumulative_lens[ass_i]):
-                x_coords.append(val_i+1)
-                #y_coords.append(val)
-                y_coords.append(float(val) / val_scale_shift)
-            plt.plot(x_coords, y_coords, lw=2)
+        for png_file, pdf_file, plot_name_desc in rendered['figures']:
+            output_png_file_path = os.path.join (html_output_dir, png_file)
+            output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
+            timer.add_bytes(os.path.getsize(output_png_file_path) + os.path.getsize(output_pdf_file_path))
+            try:
+                upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
+                                                      'make_handle': 0})
+                file_links.append({'shock_id': upload_ret['shock_id'],
+                                   'name': png_file,
+                                   'label': plot_name_desc+' PNG'
+                                   }
+                                  )
+            except:
+                raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
+            try:
+                upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
+                                                      'make_handle': 0})
+                file_links.append({'shock_id': upload_ret['shock_id'],
+                                   'name': pdf_file,
+                                   'label': plot_name_desc+' PDF'
+                                   }
+                                  )
+            except:
+                raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
 
-        """
-        # capture data into pandas
-        cumulative_lens_by_ass_name = dict()
-        for ass_i,ass_name in enumerate(assembly_names):
-            cumulative_lens_by_ass_name[ass_name] = pd.Series(cumulative_lens[ass_i])
-        cumulative_lens_df = pd.DataFrame(cumulative_lens_by_ass_name)
-        cumulative_lens_plot = cumulative_lens_df \
-                                .plot(kind="line", figsize=(15,5), ylim=(0,max_total), fontsize=15, lw=5)
-        cumulative_lens_plot.xaxis.grid(True)
-        cumulative_lens_plot.yaxis.grid(True) 
-        fig = cumulative_lens_plot.get_figure()
-        """
+        # upload stats files
+        for stats_file, stats_file_desc in stats_files:
+            stats_file_path = os.path.join(stats_output_dir, stats_file)
+            timer.add_bytes(os.path.getsize(stats_file_path))
+            try:
+                upload_ret = dfuClient.file_to_shock({'file_path': stats_file_path,
+                                                      'make_handle': 0})
+                file_links.append({'shock_id': upload_ret['shock_id'],
+                                   'name': stats_file,
+                                   'label': stats_file_desc
+                                   }
+                                  )
+            except:
+                raise ValueError ('Logging exception loading stats file '+stats_file+' to shock')
 
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        cumulative_lens_png_file = png_file = plot_name+".png"
-        cumulative_lens_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
 
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-
-
-        # Sorted Contig len plot
-        plot_name = "sorted_contig_lengths"
-        plot_name_desc = "Sorted Contig Lengths (in Mbp)"
-        self.log (console, "GENERATING PLOT "+plot_name_desc)
-        val_scale_shift = 1000000.0  # to make Mbp
-        img_dpi = 200
-        img_units = "in"
-        img_in_width  = 6.0
-        img_in_height = shared_img_in_height
-        x_margin = 0.01
-        y_margin = 0.01
-        title_fontsize = 12
-        text_color = "#606060"
-        fig = plt.figure()
-        fig.set_size_inches(img_in_width, img_in_height)
-        ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-        #ax = fig.axes[0]
-        """
-        # Let's turn off visibility of all tic labels and boxes here
-        for ax in fig.axes:
-            ax.xaxis.set_visible(False)  # remove axis labels and tics
-            ax.yaxis.set_visible(False)
-            for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                t.set_visible(False)
-            ax.spines['top'].set_visible(False)     # Get rid of top axis line
-            ax.spines['bottom'].set_visible(False)  # bottom axis line
-            ax.spines['left'].set_visible(False)    # left axis line
-            ax.spines['right'].set_visible(False)   # right axis line
-        """
-        ax.grid(True)
-        ax.set_title (plot_name_desc)
-        ax.set_xlabel ('sum of sorted contig lengths (Mbp)')
-        ax.set_ylabel ('sorted contig lengths (Mbp)')
-        plt.tight_layout()
-        #ax.text (x_margin, 1.0-(y_margin), plot_name, verticalalignment="bottom", horizontalalignment="left", color=text_color, fontsize=title_fontsize, zorder=1)
-
-        # build x and y coord lists
-        mini_delta = .000001
-        for ass_i,ass_name in enumerate(assembly_names):
-            x_coords = []
-            y_coords = []
-            running_sum = 0
-            for val_i,val in enumerate(lens[ass_i]):
-                x_coords.append(float(running_sum + mini_delta) / val_scale_shift)
-                y_coords.append(float(val) / val_scale_shift)
-                running_sum += val
-                x_coords.append(float(running_sum) / val_scale_shift)
-                y_coords.append(float(val) / val_scale_shift)
-            plt.plot(x_coords, y_coords, lw=2)
-
-        # save plot
-        self.log (console, "SAVING PLOT "+plot_name_desc)
-        sorted_lens_png_file = png_file = plot_name+".png"
-        sorted_pens_pdf_file = pdf_file = plot_name+".pdf"
-        output_png_file_path = os.path.join (html_output_dir, png_file)
-        output_pdf_file_path = os.path.join (html_output_dir, pdf_file)
-        fig.savefig (output_png_file_path, dpi=img_dpi)
-        fig.savefig (output_pdf_file_path, format='pdf')
-
-        # upload PNG
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': png_file,
-                               'label': plot_name_desc+' PNG'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-        # upload PDF
-        try:
-            upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                  'make_handle': 0})
-            file_links.append({'shock_id': upload_ret['shock_id'],
-                               'name': pdf_file,
-                               'label': plot_name_desc+' PDF'
-                               }
-                              )
-        except:
-            raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-
-
-        # Hist plots for each assembly
-        hist_lens_png_files = []
-        hist_lens_pdf_files = []
-        units            = ['Kbp', 'Kbp', 'Mbp']
-        val_scale_adjust = [1000, 1000, 1000000]
-        img_in_width     = [3.0, 3.0, 7.0]
-        for ass_i,ass_name in enumerate(assembly_names):
-            hist_lens_png_files.append([])
-            hist_lens_pdf_files.append([])
-            for hist_i,top_cnt in enumerate(top_hist_cnt):
-                if len(hist_vals[ass_i][hist_i]) == 0:
-                    continue
-                long_len = max_len
-                if hist_i < len(top_hist_cnt)-1:
-                    long_len = max_hist_val_accept[hist_i]
-                plot_name = "hist_len_plot-"+ass_name+"_hist_window_"+str(min_hist_val_accept[hist_i])+"-"+str(long_len)
-                plot_name_desc = "Histogram of Contig Lengths "+str(min_hist_val_accept[hist_i])+"-"+str(long_len)+" (in bp)"
-                self.log (console, "GENERATING PLOT for "+ass_name+" "+plot_name_desc)
-                img_dpi = 200
-                img_units = "in"
-                #img_in_width  = 6.0
-                img_in_height = 3.0
-                x_margin = 0.01
-                y_margin = 0.01
-                title_fontsize = 12
-                text_color = "#606060"
-                hist_color = "slateblue"
-                fig = plt.figure()
-                fig.set_size_inches(img_in_width[hist_i], img_in_height)
-                ax = plt.subplot2grid ( (1,1), (0,0), rowspan=1, colspan=1)
-                #ax = fig.axes[0]
-                """
-                # Let's turn off visibility of all tic labels and boxes here
-                for ax in fig.axes:
-                    ax.xaxis.set_visible(False)  # remove axis labels and tics
-                    ax.yaxis.set_visible(False)
-                    for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
-                        t.set_visible(False)
-                    ax.spines['top'].set_visible(False)     # Get rid of top axis line
-                    ax.spines['bottom'].set_visible(False)  # bottom axis line
-                    ax.spines['left'].set_visible(False)    # left axis line
-                    ax.spines['right'].set_visible(False)   # right axis line
-                """
-                ax.grid(True)
-                min_hist_bin_beg = 0
-                max_hist_bin_end = float(long_len) / val_scale_adjust[hist_i]
-                binwidth = float (hist_binwidth[hist_i]) / val_scale_adjust[hist_i]
-                ax.set_xlim ([0, max_hist_bin_end + 2*binwidth])
-                ax.set_ylim ([0, top_hist_cnt[hist_i] + top_hist_cnt[hist_i] // 10])
-                ax.set_xlabel ('contig length bin ('+units[hist_i]+')')
-                ax.set_ylabel ('# contigs')
-                plt.tight_layout()
-                #ax.set_title (plot_name_desc)  # given in table column header
-
-                # plot hist
-                #min_log10_len = 0
-                ##max_log10_len  # set above
-                #log10_binwidth = 0.1
-
-                #plt.hist(hist_vals[ass_i][hist_i], log=False, bins=range(min_hist_bin_beg, max_hist_bin_end + binwidth, binwidth))
-                scaled_hist_vals = []
-                for val in hist_vals[ass_i][hist_i]:
-                    scaled_hist_vals.append(float(val) / val_scale_adjust[hist_i])
-                plt.hist(scaled_hist_vals, color=hist_color, log=False, bins=np.arange(min_hist_bin_beg, max_hist_bin_end + 3*binwidth, binwidth))
-
-                # save plot
-                self.log (console, "SAVING PLOT "+plot_name_desc)
-                png_file = plot_name+".png"
-                hist_lens_png_files[ass_i].append(hist_folder_name+'/'+png_file)
-                pdf_file = plot_name+".pdf"
-                hist_lens_pdf_files[ass_i].append(hist_folder_name+'/'+pdf_file)
-                output_png_file_path = os.path.join (hist_output_dir, png_file)
-                output_pdf_file_path = os.path.join (hist_output_dir, pdf_file)
-                fig.savefig (output_png_file_path, dpi=img_dpi)
-                fig.savefig (output_pdf_file_path, format='pdf')
-
-                """
-                # upload PNG
-                try:
-                    upload_ret = dfuClient.file_to_shock({'file_path': output_png_file_path,
-                                                          'make_handle': 0})
-                    file_links.append({'shock_id': upload_ret['shock_id'],
-                                       'name': png_file,
-                                       'label': plot_name_desc+' PNG'
-                                       }
-                                      )
-                except:
-                    raise ValueError ('Logging exception loading png_file '+png_file+' to shock')
-                # upload PDF
-                try:
-                    upload_ret = dfuClient.file_to_shock({'file_path': output_pdf_file_path,
-                                                          'make_handle': 0})
-                    file_links.append({'shock_id': upload_ret['shock_id'],
-                                       'name': pdf_file,
-                                       'label': plot_name_desc+' PDF'
-                                       }
-                                      )
-                except:
-                    raise ValueError ('Logging exception loading pdf_file '+pdf_file+' to shock')
-                """
-
-        #### STEP 6: Create and Upload HTML Report
+        #### STEP 6: Upload HTML Report
         ##
-        self.log (console, "CREATING HTML REPORT")
-        def get_cell_color (val, best, worst, low_good=False):
-            #self.log (console, "VAL: "+str(val)+" BEST: "+str(best)+" WORST: "+str(worst))  # DEBUG
-
-            if best == worst:
-                return '#ffffff'
-            val_color_map = { 0: '00',
-                              1: '11',
-                              2: '22',
-                              3: '33',
-                              4: '44',
-                              5: '55',
-                              6: '66',
-                              7: '77',
-                              8: '88',
-                              9: '99',
-                              10: 'aa',
-                              11: 'bb',
-                              12: 'cc',
-                              13: 'dd',
-                              14: 'ee',
-                              15: 'ff'
-                             }
-            base_intensity = 11
-            top = 15 - base_intensity
-            mid = 0.5 * (best + worst)
-            if val == mid:
-                return '#ffffff'
-            if low_good:
-                if val < mid:
-                    rescaled_val = int(0.5 + top * (val-best) / (mid-best))
-                    #self.log (console, "A, MID: "+str(mid)+" RESCALED_VAL: "+str(rescaled_val))  # DEBUG
-                    r = val_color_map[base_intensity + rescaled_val]
-                    g = val_color_map[base_intensity + rescaled_val]
-                    b = 'ff'
-                else:
-                    rescaled_val = int(0.5 + top * (val-worst) / (mid-worst))
-                    #self.log (console, "B, MID: "+str(mid)+" RESCALED_VAL: "+str(rescaled_val))  # DEBUG
-                    r = 'ff'
-                    g = val_color_map[base_intensity + rescaled_val]
-                    b = val_color_map[base_intensity + rescaled_val]
-            else:
-                if val > mid:
-                    rescaled_val = int(0.5 + top * (val-best) / (mid-best))
-                    #self.log (console, "C, MID: "+str(mid)+" RESCALED_VAL: "+str(rescaled_val))  # DEBUG
-                    r = val_color_map[base_intensity + rescaled_val]
-                    g = val_color_map[base_intensity + rescaled_val]
-                    b = 'ff'
-                else:
-                    rescaled_val = int(0.5 + top * (val-worst) / (mid-worst))
-                    #self.log (console, "D, MID: "+str(mid)+" RESCALED_VAL: "+str(rescaled_val))  # DEBUG
-                    r = 'ff'
-                    g = val_color_map[base_intensity + rescaled_val]
-                    b = val_color_map[base_intensity + rescaled_val]
-            #self.log (console, "RGB: "+r+g+b)  # DEBUG
-            return '#'+r+g+b
-
-        subtab_N_rows = 6
-        hist_colspan = 3 # in cells
-        non_hist_colspan = 7 # in cells
-        key_img_width = 475  # in pixels
-        big_img_height = 300  # in pixels
-        hist_img_height = 200  # in pixels
-        head_color = "#eeeeff"
-        border_head_color = "#ffccff"
-        text_fontsize = "2"
-        text_color = '#606060'
-        border_body_color = "#cccccc"
-        key_border_color = border_body_color
-        base_cell_color = "#eeeeee"
-        cellpadding = "3"
-        cellspacing = "2"
-        subtab_cellpadding = "1"
-        subtab_cellspacing = "2"
-        border = "0"
-        sp = '&nbsp;'
-
-        html_report_lines = []
-        html_report_lines += ['<html>']
-        html_report_lines += ['<head>']
-        html_report_lines += ['<title>KBase Assembled Contig Distributions</title>']
-#        html_report_lines += ['<style>']
-#        html_report_lines += [".vertical-text {\ndisplay: inline-block;\noverflow: hidden;\nwidth: 0.65em;\n}\n.vertical-text__inner {\ndisplay: inline-block;\nwhite-space: nowrap;\nline-height: 1.1;\ntransform: translate(0,100%) rotate(-90deg);\ntransform-origin: 0 0;\n}\n.vertical-text__inner:after {\ncontent: \"\";\ndisplay: block;\nmargin: 0.0em 0 100%;\n}"]
-#        html_report_lines += [".vertical-text_title {\ndisplay: inline-block;\noverflow: hidden;\nwidth: 1.0em;\n}\n.vertical-text__inner_title {\ndisplay: inline-block;\nwhite-space: nowrap;\nline-height: 1.0;\ntransform: translate(0,100%) rotate(-90deg);\ntransform-origin: 0 0;\n}\n.vertical-text__inner_title:after {\ncontent: \"\";\ndisplay: block;\nmargin: 0.0em 0 100%;\n}"]
-#        html_report_lines += ['</style>']
-        html_report_lines += ['</head>']
-        html_report_lines += ['<body bgcolor="white">']
-
-        #html_report_lines += ['<tr><td valign=top align=left rowspan=1><div class="vertical-text_title"><div class="vertical-text__inner_title"><font color="'+text_color+'">'+label+'</font></div></div></td>']
-
-        html_report_lines += ['<table cellpadding='+str(cellpadding)+' cellspacing='+str(cellspacing)+' border='+str(border)+'>']
-        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan+hist_colspan)+'><img src="'+key_png_file+'" width='+str(key_img_width)+'></td></tr>']
-        html_report_lines += ['<tr><td valign=top align=left rowspan=1 colspan='+str(non_hist_colspan-1)+'><img src="'+cumulative_lens_png_file+'" height='+str(big_img_height)+'></td>']
-        html_report_lines += ['<td valign=top align=left rowspan=1 colspan='+str(hist_colspan)+'><img src="'+sorted_lens_png_file+'" height='+str(big_img_height)+'></td></tr>']
-
-        # key
-        best = 10
-        worst = 1
-        html_report_lines += ['<tr><td>'+sp+'</td></tr>']
-        html_report_lines += ['<tr><td></td><td colspan='+str(non_hist_colspan+hist_colspan-1)+'><table cellpadding=5 cellspacing=0 border=1 bordercolor="'+key_border_color+'"><tr>']
-        html_report_lines += ['<td bgcolor="'+get_cell_color(best, best, worst)+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'BEST'+'</font></td>']
-        for i in [9,8,7,6,5,4,3,2]:
-            html_report_lines += ['<td bgcolor="'+get_cell_color(i, best, worst)+'"><font size='+text_fontsize+'>'+sp+'</font></td>']
-        html_report_lines += ['<td bgcolor="'+get_cell_color(worst, best, worst)+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'WORST'+'</font></td>']
-        html_report_lines += ['</tr></table></td></tr>']
-
-        # header
-        html_report_lines += ['<tr bgcolor="'+head_color+'">']
-        # name
-        html_report_lines += ['<td style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+' align="left">'+'ASSEMBLY'+'</font></td>']
-        # Longest Len
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'LONGEST<br>CONTIG<br>(bp)'+'</font></td>']
-        # N50,L50 etc.
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'" colspan=2><font color="'+text_color+'" size='+text_fontsize+'>'+'Nx (Lx)'+'</font></td>']
-        # Summary Stats
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'LENGTH<br>(bp)'+'</font></td>']
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'NUM<br>CONTIGS'+'</font></td>']
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'"><font color="'+text_color+'" size='+text_fontsize+'>'+'SUM<br>LENGTH<br>(bp)'+'</font></td>']
-        # hists
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'" colspan='+str(1)+'><font color="'+text_color+'" size='+text_fontsize+'>'+'Contig Length Histogram<br>(1bp <= len < 10Kbp)'+'</font></td>']
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'" colspan='+str(1)+'><font color="'+text_color+'" size='+text_fontsize+'>'+'Contig Length Histogram<br>(10Kbp <= len < 100Kbp)'+'</font></td>']
-        html_report_lines += ['<td align="center" style="border-right:solid 2px '+border_head_color+'; border-bottom:solid 2px '+border_head_color+'" colspan='+str(1)+'><font color="'+text_color+'" size='+text_fontsize+'>'+'Contig Length Histogram<br>(len >= 100Kbp)'+'</font></td>']
-        html_report_lines += ['</tr>']
-
-        # report stats
-        for ass_i,ass_name in enumerate(assembly_names):
-            html_report_lines += ['<tr>']
-            # name
-            html_report_lines += ['<td align="left" bgcolor="'+base_cell_color+'" rowspan='+str(subtab_N_rows)+'><font color="'+text_color+'" size='+text_fontsize+'>'+ass_name+'</font></td>']
-
-            # longest contig
-            cell_color = get_cell_color (max_lens[ass_i], best_val['len'], worst_val['len'])
-            html_report_lines += ['<td bgcolor="'+cell_color+'" align="center" valign="middle" rowspan='+str(subtab_N_rows)+'><font color="'+text_color+'" size='+text_fontsize+'>'+str(max_lens[ass_i])+'</font></td>']
-
-            # subtable
-            edges = ' style="border-right:solid 2px '+border_body_color+'"'
-            bottom_edge = ''
-            for sub_i in range(subtab_N_rows):
-                perc = percs[sub_i // 2]
-                bucket = len_buckets[sub_i]
-                if sub_i == subtab_N_rows-1:
-                    edges = ' style="border-right:solid 2px '+border_body_color+'; border-bottom:solid 2px '+border_body_color+'"'
-                    bottom_edge = ' style="border-bottom:solid 2px '+border_body_color+'"'
-
-                # N50, L50, etc.
-                if sub_i > 0:
-                    html_report_lines += ['<tr>']
-
-                if (sub_i % 2) == 0:
-                    cell_color = get_cell_color (N[perc][ass_i], best_val['N'][perc], worst_val['N'][perc])
-                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'N'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+str(N[perc][ass_i])+'</font></td>']
-                else:
-                    cell_color = get_cell_color (L[perc][ass_i], best_val['L'][perc], worst_val['L'][perc], low_good=True)
-                    html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+'L'+str(perc)+':</font></td><td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+sp+'('+str(L[perc][ass_i])+')'+'</font></td>']
-
-                # Summary Stats
-                html_report_lines += ['<td align="center"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>']
-                if bucket >= 1000:
-                    html_report_lines += ['<nobr>'+'&gt;= '+'10'+'<sup>'+str(int(math.log(bucket,10)+0.1))+'</sup>'+'</nobr>']
-                else:
-                    html_report_lines += ['<nobr>'+'&gt;= '+str(bucket)+'</nobr>']
-                html_report_lines += ['</font></td>']
-
-                cell_color = get_cell_color (summary_stats[ass_i][bucket], best_val['summary_stats'][bucket], worst_val['summary_stats'][bucket])
-                html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+bottom_edge+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(summary_stats[ass_i][bucket])+'</font></td>']
-
-                cell_color = get_cell_color (cumulative_len_stats[ass_i][bucket], best_val['cumulative_len_stats'][bucket], worst_val['cumulative_len_stats'][bucket])
-                html_report_lines += ['<td bgcolor="'+cell_color+'" align="right"'+edges+'>'+'<font color="'+text_color+'" size='+text_fontsize+'>'+str(cumulative_len_stats[ass_i][bucket])+'</font></td>']
-                if sub_i > 0:
-                    html_report_lines += ['</tr>']
-                else:
-                    # Hist
-                    hist_edge = ' style="border-bottom:solid 2px '+border_body_color+'"'
-                    for hist_i,hist_lens_png_file in enumerate(hist_lens_png_files[ass_i]):
-                        if hist_i == len(hist_lens_png_files[ass_i])-1:
-                            hist_edge = ' style="border-right:solid 2px '+border_body_color+'; border-bottom:solid 2px '+border_body_color+'"'
-                        html_report_lines += ['<td valign=top align=left rowspan='+str(subtab_N_rows)+' colspan=1'+hist_edge+'><img src="'+hist_lens_png_file+'" height='+str(hist_img_height)+'></td>']
-                    html_report_lines += ['</tr>']
-
-        html_report_lines += ['</table>']
-        html_report_lines += ['</body>']
-        html_report_lines += ['</html>']
-
-        # write html to file and upload
-        self.log (console, "SAVING AND UPLOADING HTML REPORT")
-        html_report_str = "\n".join(html_report_lines)
-        html_file = 'contig_distribution_report.html'
-        html_file_path = os.path.join (html_output_dir, html_file)
-        with open (html_file_path, 'w') as html_handle:
-            html_handle.write(html_report_str)
+        self.log (console, "UPLOADING HTML REPORT")
+        timer.add_bytes(sum(os.path.getsize(os.path.join(dir_path, f)) for dir_path, _, files in os.walk(html_output_dir) for f in files))
         try:
             html_upload_ret = dfuClient.file_to_shock({'file_path': html_output_dir,
                                                        'make_handle': 0,
@@ -1428,6 +660,7 @@ class kb_assembly_compare:
 
         #### STEP 8: Build report
         ##
+        timer.stage('report')
         reportName = 'run_contig_distribution_compare_report_'+str(uuid.uuid4())
         reportObj = {'objects_created': [],
                      #'text_message': '',  # or is it 'message'?
@@ -1443,6 +676,7 @@ class kb_assembly_compare:
         # message
         if len(invalid_msgs) > 0:
             report_text = "\n".join(invalid_msgs)
+        report_text += "\n" + timer.format_table() + "\n"
         reportObj['message'] = report_text
 
         if len(invalid_msgs) == 0:
@@ -1456,6 +690,10 @@ class kb_assembly_compare:
                                    ]
             reportObj['file_links'] = file_links
 
+        # profile of this run, if switched on
+        profiler.stop()
+        reportObj['file_links'].extend(profiler.upload(dfuClient))
+
 
         # save report object
         #
@@ -1463,6 +701,8 @@ class kb_assembly_compare:
         reportClient = KBaseReport(self.callbackURL, token=ctx['token'], service_ver=SERVICE_VER)
         #report_info = report.create({'report':reportObj, 'workspace_name':params['workspace_name']})
         report_info = reportClient.create_extended_report(reportObj)
+        timer.stop()
+        self.log(console, timer.format_table())
 
         returnVal = { 'report_name': report_info['name'], 'report_ref': report_info['ref'] }
         #END run_contig_distribution_compare
@@ -1474,6 +714,192 @@ class kb_assembly_compare:
         # return the results
         return [returnVal]
 
+    def run_combine_assemblies(self, ctx, params):
+        """
+        :param params: instance of type "Combine_Assemblies_Params"
+           (combine_assemblies() ** **  Merge Assemblies into one
+           non-redundant Assembly) -> structure: parameter "workspace_name"
+           of type "workspace_name" (** The workspace object refs are of
+           form: ** **    objects = ws.get_objects([{'ref':
+           params['workspace_id']+'/'+params['obj_name']}]) ** ** "ref" means
+           the entire name combining the workspace id and the object name **
+           "id" is a numerical identifier of the workspace or object, and
+           should just be used for workspace ** "name" is a string identifier
+           of a workspace or object.  This is received from Narrative.),
+           parameter "input_assembly_refs" of type "data_obj_ref", parameter
+           "remove_contained_contigs" of type "bool", parameter
+           "output_name" of type "data_obj_name"
+        :returns: instance of type "Combine_Assemblies_Output" -> structure:
+           parameter "report_name" of type "data_obj_name", parameter
+           "report_ref" of type "data_obj_ref"
+        """
+        # ctx is the context object
+        # return variables are: returnVal
+        #BEGIN run_combine_assemblies
+
+        #### STEP 0: basic init
+        ##
+        console = []
+        invalid_msgs = []
+        report_text = ''
+        timer = RunTimer('run_combine_assemblies')
+        profiler = MethodProfiler('run_combine_assemblies', self.scratch, self.config)
+        profiler.start()
+        self.log(console, 'Running run_combine_assemblies(): ')
+        self.log(console, "\n"+pformat(params))
+
+        # Auth
+        token = ctx['token']
+        headers = {'Authorization': 'OAuth '+token}
+        env = os.environ.copy()
+        env['KB_AUTH_TOKEN'] = token
+
+        # API Clients
+        #SERVICE_VER = 'dev'  # DEBUG
+        SERVICE_VER = 'release'
+        # wsClient
+        try:
+            wsClient = workspaceService(self.workspaceURL, token=token)
+        except Exception as e:
+            raise ValueError('Unable to instantiate wsClient with workspaceURL: '+ self.workspaceURL +' ERROR: ' + str(e))
+        # setAPI_Client
+        try:
+            #setAPI_Client = SetAPI (url=self.callbackURL, token=ctx['token'])  # for SDK local.  local doesn't work for SetAPI
+            setAPI_Client = SetAPI (url=self.serviceWizardURL, token=ctx['token'])  # for dynamic service
+        except Exception as e:
+            raise ValueError('Unable to instantiate setAPI_Client with serviceWizardURL: '+ self.serviceWizardURL +' ERROR: ' + str(e))
+        # auClient
+        try:
+            auClient = AssemblyUtil(self.callbackURL, token=ctx['token'], service_ver=SERVICE_VER)
+        except Exception as e:
+            raise ValueError('Unable to instantiate auClient with callbackURL: '+ self.callbackURL +' ERROR: ' + str(e))
+        # dfuClient
+        try:
+            dfuClient = DFUClient(self.callbackURL)
+        except Exception as e:
+            raise ValueError('Unable to instantiate dfu_Client with callbackURL: '+ self.callbackURL +' ERROR: ' + str(e))
+
+        # param checks
+        required_params = ['workspace_name',
+                           'input_assembly_refs',
+                           'output_name'
+                          ]
+        for arg in required_params:
+            if arg not in params or params[arg] == None or params[arg] == '':
+                raise ValueError ("Must define required param: '"+arg+"'")
+        remove_contained_contigs = True
+        if params.get('remove_contained_contigs') not in (None, ''):
+            remove_contained_contigs = int(params['remove_contained_contigs']) == 1
+
+        # load provenance
+        provenance = [{}]
+        if 'provenance' in ctx:
+            provenance = ctx['provenance']
+        provenance[0]['input_ws_objects']=[]
+        for input_ref in params['input_assembly_refs']:
+            provenance[0]['input_ws_objects'].append(input_ref)
+
+        # set the output paths (unique, as calls may run concurrently)
+        output_dir = tempfile.mkdtemp(prefix='output.', dir=self.scratch)
+
+
+        #### STEP 1: get assembly refs
+        ##
+        timer.stage('resolve')
+        if len(invalid_msgs) == 0:
+            assembly_refs, assembly_names = self._resolve_assembly_refs(wsClient, setAPI_Client, params['input_assembly_refs'], console)
+
+
+        #### STEP 2: Get assemblies to combine as fasta files
+        ##
+        timer.stage('fetch')
+        if len(invalid_msgs) == 0:
+            self.log (console, "Retrieving Assemblies")  # DEBUG
+            assembly_file_paths = []
+
+            for ass_i,input_ref in enumerate(assembly_refs):
+                self.log (console, "\tAssembly: "+assembly_names[ass_i]+" ("+assembly_refs[ass_i]+")")  # DEBUG
+                contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
+                sys.stdout.flush()
+                contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                timer.add_bytes(os.path.getsize(contig_file_path))
+                assembly_file_paths.append(contig_file_path)
+
+
+        #### STEP 3: Drop duplicate and contained contigs and write the combined file
+        ##
+        timer.stage('scan')
+        if len(invalid_msgs) == 0:
+            self.log (console, "Combining Assemblies")  # DEBUG
+            for assembly_file_path in assembly_file_paths:
+                timer.add_bytes(os.path.getsize(assembly_file_path))
+            combined_file_path = os.path.join(output_dir, params['output_name']+".fa")
+            combined = contig_combine.combine_assemblies(assembly_file_paths,
+                                                         assembly_names,
+                                                         combined_file_path,
+                                                         remove_contained_contigs,
+                                                         self.scan_workers,
+                                                         output_dir,
+                                                         self.scan_chunk_bytes)
+            if sum(combined['combined']) == 0:
+                invalid_msgs.append("No contigs found in the input Assemblies")
+
+
+        #### STEP 4: save the combined assembly
+        ##
+        timer.stage('upload')
+        if len(invalid_msgs) == 0:
+            timer.add_bytes(os.path.getsize(combined_file_path))
+            combined_assembly_ref = auClient.save_assembly_from_fasta({
+                'file': {'path': combined_file_path},
+                'workspace_name': params['workspace_name'],
+                'assembly_name': params['output_name']
+            })
+
+
+        #### STEP 5: generate and save the report
+        ##
+        timer.stage('report')
+        if len(invalid_msgs) > 0:
+            report_text += "\n".join(invalid_msgs)
+            objects_created = None
+        else:
+            report_text += 'Assembly saved to: ' + params['workspace_name'] + '/' + params['output_name'] + "\n\n"
+            report_text += contig_combine.combine_report_text(assembly_names, combined)
+            if remove_contained_contigs:
+                description = params['output_name']+" combined without duplicate or contained contigs"
+            else:
+                description = params['output_name']+" combined without duplicate contigs"
+            objects_created = [{'ref': combined_assembly_ref, 'description': description}]
+
+        # Save report
+        report_text += "\n" + timer.format_table() + "\n"
+        profiler.stop()
+        print('Saving report')
+        kbr = KBaseReport(self.callbackURL)
+        report_info = kbr.create_extended_report(
+            {'message': report_text,
+             'objects_created': objects_created,
+             'file_links': profiler.upload(dfuClient),
+             'report_object_name': 'kb_combine_assemblies_report_' + str(uuid.uuid4()),
+             'workspace_name': params['workspace_name']
+             })
+
+        timer.stop()
+        self.log(console, timer.format_table())
+
+        # STEP 6: contruct the output to send back
+        returnVal = {'report_name': report_info['name'], 'report_ref': report_info['ref']}
+
+        #END run_combine_assemblies
+
+        # At some point might do deeper type checking...
+        if not isinstance(returnVal, dict):
+            raise ValueError('Method run_combine_assemblies return value ' +
+                             'returnVal is not type dict as required.')
+        # return the results
+        return [returnVal]
+
     def run_benchmark_assemblies_against_genomes_with_MUMmer4(self, ctx, params):
         """
         :param params: instance of type
@@ -1504,6 +930,9 @@ class kb_assembly_compare:
         console = []
         invalid_msgs = []
         report_text = ''
+        timer = RunTimer('run_benchmark_assemblies_against_genomes_with_MUMmer4')
+        profiler = MethodProfiler('run_benchmark_assemblies_against_genomes_with_MUMmer4', self.scratch, self.config)
+        profiler.start()
         self.log(console, 'Running run_benchmark_assemblies_against_genomes_with_MUMmer4(): ')
         self.log(console, "\n"+pformat(params))
 
@@ -1558,11 +987,8 @@ class kb_assembly_compare:
         for input_ref in params['input_assembly_refs']:
             provenance[0]['input_ws_objects'].append(input_ref)
 
-        # set the output paths
-        timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds()*1000)
-        output_dir = os.path.join(self.scratch,'output.'+str(timestamp))
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        # set the output paths (unique, as calls may run concurrently)
+        output_dir = tempfile.mkdtemp(prefix='output.', dir=self.scratch)
         html_output_dir = os.path.join(output_dir,'html')
         if not os.path.exists(html_output_dir):
             os.makedirs(html_output_dir)
@@ -1570,6 +996,7 @@ class kb_assembly_compare:
 
         #### STEP 1: get benchmark genome refs
         ##
+        timer.stage('resolve')
         if len(invalid_msgs) == 0:
             set_obj_type = "KBaseSearch.GenomeSet"
             genome_obj_type = "KBaseGenomes.Genome"
@@ -1626,13 +1053,20 @@ class kb_assembly_compare:
             genome_sci_names = []
             genome_assembly_refs = []
 
+            # only fetch the fields we need, not the (possibly huge) feature lists
+            genome_included_fields = ['/assembly_ref', '/contigset_ref', '/scientific_name']
+            genome_objects = []
+            if len(genome_refs) > 0:
+                try:
+                    genome_objects = wsClient.get_objects2({'objects':[{'ref':input_ref, 'included':genome_included_fields} for input_ref in genome_refs]})['data']
+                except Exception as e:
+                    raise ValueError ("unable to fetch genomes: "+", ".join(genome_refs)+" "+str(e))
+
             for i,input_ref in enumerate(genome_refs):
                 # genome obj data
                 try:
-
-                    objects = wsClient.get_objects2({'objects':[{'ref':input_ref}]})['data']
-                    genome_obj = objects[0]['data']
-                    genome_obj_info = objects[0]['info']
+                    genome_obj = genome_objects[i]['data']
+                    genome_obj_info = genome_objects[i]['info']
                     genome_obj_names.append(genome_obj_info[NAME_I])
                     genome_sci_names.append(genome_obj['scientific_name'])
                 except:
@@ -1655,6 +1089,7 @@ class kb_assembly_compare:
                     genome_assembly_refs.append(genome_obj['contigset_ref'])
 
         # get fastas for scaffolds
+        timer.stage('fetch')
         if len(invalid_msgs) == 0:
             #genomes_outdir = os.path.join (output_dir, 'benchmark_genomes')
             #if not os.path.exists(genomes_outdir):
@@ -1667,6 +1102,7 @@ class kb_assembly_compare:
                 contig_file = auClient.get_assembly_as_fasta({'ref':genome_assembly_refs[genome_i]}).get('path')
                 sys.stdout.flush()
                 contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                timer.add_bytes(os.path.getsize(contig_file_path))
                 benchmark_assembly_file_paths.append(contig_file_path)
                 #clean_genome_ref = genome_ref.replace('/','_')
                 #genome_outfile_path = os.join(benchmark_outdir, clean_genome_ref+".fna")
@@ -1675,57 +1111,14 @@ class kb_assembly_compare:
 
         #### STEP 3: get assembly refs
         ##
+        timer.stage('resolve')
         if len(invalid_msgs) == 0:
-            set_obj_type = "KBaseSets.AssemblySet"
-            assembly_obj_types = ["KBaseGenomeAnnotations.Assembly", "KBaseGenomes.ContigSet"]
-            accepted_input_types = [set_obj_type] + assembly_obj_types
-            assembly_refs = []
-            assembly_refs_seen = dict()
-
-            for i,input_ref in enumerate(params['input_assembly_refs']):
-                # assembly obj info
-                try:
-                    input_obj_info = wsClient.get_object_info_new ({'objects':[{'ref':input_ref}]})[0]
-                    input_obj_type = re.sub ('-[0-9]+\.[0-9]+$', "", input_obj_info[TYPE_I])  # remove trailing version
-
-                    # DEBUG
-                    input_obj_name = input_obj_info[NAME_I]
-                    self.log (console, "GETTING ASSEMBLY: "+str(input_ref)+" "+str(input_obj_name))
-
-                except Exception as e:
-                    raise ValueError('Unable to get object from workspace: (' + input_ref +')' + str(e))
-                if input_obj_type not in accepted_input_types:
-                    raise ValueError ("Input object of type '"+input_obj_type+"' not accepted.  Must be one of "+", ".join(accepted_input_types))
-
-                # add members to assembly_ref list
-                if input_obj_type in assembly_obj_types:
-                    try:
-                        assembly_seen = assembly_refs_seen[input_ref]
-                        continue
-                    except:
-                        assembly_refs_seen[input_ref] = True
-                        assembly_refs.append(input_ref)
-                elif input_obj_type != set_obj_type:
-                    raise ValueError ("bad obj type for input_ref: "+input_ref)
-                else:  # add assembly set members
-
-                    try:
-                        assemblySet_obj = setAPI_Client.get_assembly_set_v1 ({'ref':input_ref, 'include_item_info':1})
-                    except Exception as e:
-                        raise ValueError('Unable to get object from workspace: (' + input_ref +')' + str(e))
-
-                    for assembly_obj in assemblySet_obj['data']['items']:
-                        this_assembly_ref = assembly_obj['ref']
-                        try:
-                            assembly_seen = assembly_refs_seen[this_assembly_ref]
-                            continue
-                        except:
-                            assembly_refs_seen[this_assembly_ref] = True
-                            assembly_refs.append(this_assembly_ref)
+            assembly_refs = self._resolve_assembly_refs(wsClient, setAPI_Client, params['input_assembly_refs'], console, get_names=False)[0]
 
 
         #### STEP 4: Get assemblies to score as fasta files
         ##
+        timer.stage('fetch')
         if len(invalid_msgs) == 0:
             #assembly_outdir = os.path.join (output_dir, 'score_assembly')
             #if not os.path.exists(assembly_outdir):
@@ -1738,6 +1131,7 @@ class kb_assembly_compare:
                 contig_file = auClient.get_assembly_as_fasta({'ref':assembly_refs[ass_i]}).get('path')
                 sys.stdout.flush()
                 contig_file_path = dfuClient.unpack_file({'file_path': contig_file})['file_path']
+                timer.add_bytes(os.path.getsize(contig_file_path))
                 score_assembly_file_paths.append(contig_file_path)
                 #clean_ass_ref = assembly_ref.replace('/','_')
                 #assembly_outfile_path = os.join(assembly_outdir, clean_assembly_ref+".fna")
@@ -1789,6 +1183,7 @@ class kb_assembly_compare:
 
         #### STEP 5: Build report
         ##
+        timer.stage('report')
         reportName = 'run_benchmark_assemblies_against_genomes_with_MUMmer4_report_'+str(uuid.uuid4())
         reportObj = {'objects_created': [],
                      #'text_message': '',  # or is it 'message'?
@@ -1804,6 +1199,7 @@ class kb_assembly_compare:
         # message
         if len(invalid_msgs) > 0:
             report_text = "\n".join(invalid_msgs)
+        report_text += "\n" + timer.format_table() + "\n"
         reportObj['message'] = report_text
 
         if len(invalid_msgs) == 0:
@@ -1824,6 +1220,10 @@ class kb_assembly_compare:
                                    ]
             """
 
+        # profile of this run, if switched on
+        profiler.stop()
+        reportObj['file_links'].extend(profiler.upload(dfuClient))
+
 
         # save report object
         #
@@ -1831,6 +1231,8 @@ class kb_assembly_compare:
         reportClient = KBaseReport(self.callbackURL, token=ctx['token'], service_ver=SERVICE_VER)
         #report_info = report.create({'report':reportObj, 'workspace_name':params['workspace_name']})
         report_info = reportClient.create_extended_report(reportObj)
+        timer.stop()
+        self.log(console, timer.format_table())
 
         returnVal = { 'report_name': report_info['name'], 'report_ref': report_info['ref'] }
         #END run_benchmark_assemblies_against_genomes_with_MUMmer4
@@ -1,15 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import copy
 import datetime
 import json
+import multiprocessing
 import os
 import random as _random
+import socket
 import sys
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from getopt import getopt, GetoptError
 from multiprocessing import Process
 from os import environ
-from wsgiref.simple_server import make_server
+from wsgiref.simple_server import make_server, WSGIServer
+from wsgiref.simple_server import WSGIRequestHandler as _WSGIRequestHandler
 
 import requests as _requests
 from jsonrpcbase import JSONRPCService, InvalidParamsError, KeywordError, \
@@ -17,7 +24,10 @@ from jsonrpcbase import JSONRPCService, InvalidParamsError, KeywordError, \
 from jsonrpcbase import ServerError as JSONServerError
 
 from biokbase import log
+from installed_clients import jsoncodec as _jsoncodec
 from kb_assembly_compare.authclient import KBaseAuth as _KBaseAuth
+from kb_assembly_compare import metrics as _metrics
+from kb_assembly_compare.instrumentation import add_stage_listener
 
 try:
     from ConfigParser import ConfigParser
@@ -27,6 +37,17 @@ except ImportError:
 DEPLOY = 'KB_DEPLOYMENT_CONFIG'
 SERVICE = 'KB_SERVICE_NAME'
 AUTH = 'auth-service-url'
+# serving mode settings, see start_server()
+WORKERS = 'server-workers'
+WORKER_TYPE = 'server-worker-type'
+MAX_QUEUE = 'server-max-queue'
+HEAVY_METHODS = 'server-heavy-methods'
+HEAVY_WORKERS = 'server-heavy-workers'
+BATCH_WORKERS = 'server-batch-workers'
+WORKER_THREAD = 'thread'
+WORKER_PROCESS = 'process'
+SERVER_BUSY_STATUS = '503 Service Unavailable'
+METRICS_PATH = '/metrics'
 
 # Note that the error fields do not match the 2.0 JSONRPC spec
 
@@ -51,6 +72,12 @@ def get_config():
 
 config = get_config()
 
+
+def get_config_int(key, default=None):
+    if config is None or config.get(key) in (None, ''):
+        return default
+    return int(config[key])
+
 from kb_assembly_compare.kb_assembly_compareImpl import kb_assembly_compare  # noqa @IgnorePep8
 impl_kb_assembly_compare = kb_assembly_compare(config)
 
@@ -69,6 +96,21 @@ class JSONObjectEncoder(json.JSONEncoder):
 
 class JSONRPCServiceCustom(JSONRPCService):
 
+    def __init__(self, batch_workers=1, metrics=None, method_limiter=None):
+        '''
+        batch_workers - the number of requests of a batch run concurrently.
+        metrics - a metrics.ServiceMetrics recording each method call.
+        method_limiter - a MethodLimiter each heavy request of a batch takes
+            a slot from, so a batch can't run more heavy calls at once than
+            single requests can.
+        '''
+        super(JSONRPCServiceCustom, self).__init__()
+        if batch_workers < 1:
+            raise ValueError('batch_workers must be at least 1')
+        self.batch_workers = batch_workers
+        self.metrics = metrics
+        self.method_limiter = method_limiter
+
     def call(self, ctx, jsondata):
         """
         Calls jsonrpc service's method and returns its return value in a JSON
@@ -79,7 +121,7 @@ class JSONRPCServiceCustom(JSONRPCService):
         """
         result = self.call_py(ctx, jsondata)
         if result is not None:
-            return json.dumps(result, cls=JSONObjectEncoder)
+            return _jsoncodec.dumps(result)
 
         return None
 
@@ -155,20 +197,31 @@ class JSONRPCServiceCustom(JSONRPCService):
         elif isinstance(rdata, list) and rdata:
             # It's a batch.
             requests = []
-            responds = []
 
             for rdata_ in rdata:
                 # set some default values for error handling
                 request_ = self._get_default_vals()
-                self._fill_request(request_, rdata_)
+                try:
+                    self._fill_request(request_, rdata_)
+                except JSONRPCError as jre:
+                    request_['invalid'] = jre
                 requests.append(request_)
 
-            for request_ in requests:
-                respond = self._handle_request(ctx, request_)
-                # Don't respond to notifications
-                if respond is not None:
-                    responds.append(respond)
+            # run the requests on a bounded pool, keeping the responses in
+            # request order.  A failing request gets an error response and
+            # doesn't affect the others.
+            workers = min(self.batch_workers, len(requests))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    responds = list(pool.map(
+                        lambda request_: self._handle_batch_request(
+                            ctx, request_), requests))
+            else:
+                responds = [self._handle_batch_request(ctx, request_)
+                            for request_ in requests]
 
+            # Don't respond to notifications
+            responds = [respond for respond in responds if respond is not None]
             if responds:
                 return responds
 
@@ -178,12 +231,90 @@ class JSONRPCServiceCustom(JSONRPCService):
             # empty dict, list or wrong type
             raise InvalidRequestError
 
+    def _batch_context(self, ctx, request):
+        # each request of a batch gets its own context, so methods running
+        # concurrently don't share (and modify) one provenance list
+        batch_ctx = copy.copy(ctx)
+        if '.' in str(request.get('method')):
+            batch_ctx['module'], batch_ctx['method'] = \
+                request['method'].split('.', 1)
+        batch_ctx['call_id'] = request['id']
+        batch_ctx['provenance'] = [{'service': batch_ctx['module'],
+                                    'method': batch_ctx['method'],
+                                    'method_params': request.get('params')}]
+        return batch_ctx
+
+    def _handle_batch_request(self, ctx, request):
+        """
+        Handles one request of a batch and returns its response, which is an
+        error response if the request failed or all the slots for its heavy
+        method are taken.
+        """
+        if 'invalid' in request:
+            # requests that couldn't be parsed get a response even without
+            # an id
+            jre = request['invalid']
+            return self._error_respond(request, jre.code, jre.message,
+                                       jre.data, None)
+        method_name = request['method']
+        limiter = self.method_limiter
+        if limiter is not None and not limiter.acquire(method_name):
+            if self.metrics is not None:
+                self.metrics.request_rejected(method_name.split('.')[-1])
+            respond = self._error_respond(
+                request, -32000, 'Server busy',
+                limiter.busy_message(method_name), None)
+        else:
+            try:
+                return self._handle_request(
+                    self._batch_context(ctx, request), request)
+            except JSONRPCError as jre:
+                trace = jre.trace if hasattr(jre, 'trace') else None
+                respond = self._error_respond(request, jre.code, jre.message,
+                                              jre.data, trace)
+            except Exception:
+                respond = self._error_respond(
+                    request, 0, 'Unexpected Server Error',
+                    'An unexpected server error occurred',
+                    traceback.format_exc())
+            finally:
+                if limiter is not None:
+                    limiter.release(method_name)
+        # Do not respond to notifications.
+        if request['id'] is None:
+            return None
+        return respond
+
+    def _error_respond(self, request, code, name, message, trace):
+        respond = {}
+        self._fill_ver(request['jsonrpc'], respond)
+        error = {'code': code, 'name': name, 'message': message}
+        if request['jsonrpc'] == 20:
+            error['data'] = trace
+        else:
+            error['error'] = trace
+        respond['error'] = error
+        respond['id'] = request['id']
+        return respond
+
     def _handle_request(self, ctx, request):
         """Handles given request and returns its response."""
         if 'types' in self.method_data[request['method']]:
             self._validate_params_types(request['method'], request['params'])
 
-        result = self._call_method(ctx, request)
+        if self.metrics is None:
+            result = self._call_method(ctx, request)
+        else:
+            method = request['method'].split('.')[-1]
+            self.metrics.request_started(method)
+            start = time.time()
+            failed = True
+            try:
+                result = self._call_method(ctx, request)
+                failed = False
+            finally:
+                self.metrics.request_finished(method, time.time() - start,
+                                              failed)
 
         # Do not respond to notifications.
         if request['id'] is None:
@@ -313,6 +444,52 @@ def getIPAddress(environ):
     return environ.get('REMOTE_ADDR')
 
 
+class ServerBusyError(Exception):
+    '''Raised when a method can't be run because all its slots are taken.'''
+    pass
+
+
+class MethodLimiter(object):
+    '''
+    Caps how many calls of the CPU heavy methods run at once, so they can
+    never occupy every worker and lightweight methods such as status stay
+    responsive.  Calls beyond the cap are rejected rather than queued.
+    heavy_workers of None means no cap.  The cap is per process unless
+    share_between_processes() is called before forking.
+    '''
+
+    def __init__(self, heavy_methods, heavy_workers=None):
+        self.heavy_methods = frozenset(heavy_methods)
+        self.heavy_workers = heavy_workers
+        self._slots = None
+        if heavy_workers is not None:
+            if heavy_workers < 1:
+                raise ValueError('heavy_workers must be at least 1')
+            self._slots = threading.BoundedSemaphore(heavy_workers)
+
+    def share_between_processes(self):
+        '''
+        Count the slots across the processes forked after this call, rather
+        than giving each its own heavy_workers slots.
+        '''
+        if self.heavy_workers is not None:
+            self._slots = multiprocessing.BoundedSemaphore(self.heavy_workers)
+
+    def acquire(self, method_name):
+        if self._slots is None or method_name not in self.heavy_methods:
+            return True
+        return self._slots.acquire(False)
+
+    def release(self, method_name):
+        if self._slots is None or method_name not in self.heavy_methods:
+            return
+        self._slots.release()
+
+    def busy_message(self, method_name):
+        return ('All ' + str(self.heavy_workers) + ' worker slots for ' +
+                method_name + ' are busy, try again later')
+
+
 class Application(object):
     # Wrap the wsgi handler in a class definition so that we can
     # do some initialization and avoid regenerating stuff over
@@ -336,7 +513,11 @@ class Application(object):
             submod, ip_address=True, authuser=True, module=True, method=True,
             call_id=True, logfile=self.userlog.get_log_file())
         self.serverlog.set_log_level(6)
-        self.rpc_service = JSONRPCServiceCustom()
+        self.metrics = _metrics.ServiceMetrics()
+        add_stage_listener(self.metrics.observe_stage)
+        self.rpc_service = JSONRPCServiceCustom(
+            batch_workers=get_config_int(BATCH_WORKERS, 1),
+            metrics=self.metrics)
         self.method_authentication = dict()
         self.rpc_service.add(impl_kb_assembly_compare.run_filter_contigs_by_length,
                              name='kb_assembly_compare.run_filter_contigs_by_length',
@@ -346,6 +527,10 @@ class Application(object):
                              name='kb_assembly_compare.run_contig_distribution_compare',
                              types=[dict])
         self.method_authentication['kb_assembly_compare.run_contig_distribution_compare'] = 'required'  # noqa
+        self.rpc_service.add(impl_kb_assembly_compare.run_combine_assemblies,
+                             name='kb_assembly_compare.run_combine_assemblies',
+                             types=[dict])
+        self.method_authentication['kb_assembly_compare.run_combine_assemblies'] = 'required'  # noqa
         self.rpc_service.add(impl_kb_assembly_compare.run_benchmark_assemblies_against_genomes_with_MUMmer4,
                              name='kb_assembly_compare.run_benchmark_assemblies_against_genomes_with_MUMmer4',
                              types=[dict])
@@ -355,8 +540,26 @@ class Application(object):
                              types=[dict])
         authurl = config.get(AUTH) if config else None
         self.auth_client = _KBaseAuth(authurl)
+        heavy_methods = [m for m in self.rpc_service.method_data
+                         if m.split('.')[-1].startswith('run_')]
+        if config is not None and config.get(HEAVY_METHODS):
+            heavy_methods = [m.strip() for m in
+                             config[HEAVY_METHODS].split(',') if m.strip()]
+        self.method_limiter = MethodLimiter(
+            heavy_methods, get_config_int(HEAVY_WORKERS))
+        self.rpc_service.method_limiter = self.method_limiter
+
+    def serve_metrics(self, start_response):
+        response_body = self.metrics.render().encode('utf8')
+        start_response('200 OK', [
+            ('content-type', _metrics.CONTENT_TYPE),
+            ('content-length', str(len(response_body)))])
+        return [response_body]
 
     def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] == 'GET' and \
+                environ.get('PATH_INFO', '').rstrip('/') == METRICS_PATH:
+            return self.serve_metrics(start_response)
         # Context object, equivalent to the perl impl CallContext
         ctx = MethodContext(self.userlog)
         ctx['client_ip'] = getIPAddress(environ)
@@ -373,8 +576,11 @@ class Application(object):
         else:
             request_body = environ['wsgi.input'].read(body_size)
             try:
-                req = json.loads(request_body)
-            except ValueError as ve:
+                if environ.get('HTTP_CONTENT_ENCODING', '').strip().lower() \
+                        == _jsoncodec.GZIP:
+                    request_body = _jsoncodec.gzip_decompress(request_body)
+                req = _jsoncodec.loads(request_body)
+            except (ValueError, OSError, EOFError) as ve:
                 err = {'error': {'code': -32700,
                                  'name': "Parse error",
                                  'message': str(ve),
@@ -382,25 +588,42 @@ class Application(object):
                        }
                 rpc_result = self.process_error(err, ctx, {'version': '1.1'})
             else:
-                ctx['module'], ctx['method'] = req['method'].split('.')
-                ctx['call_id'] = req['id']
+                if isinstance(req, list):
+                    # a batch: the context describes its first request, and
+                    # each request gets its own context in call_py()
+                    batch_reqs = [r for r in req if isinstance(r, dict) and
+                                  isinstance(r.get('method'), str)]
+                    first_req = batch_reqs[0] if batch_reqs else \
+                        {'method': '.', 'params': []}
+                else:
+                    batch_reqs = [req]
+                    first_req = req
+                ctx['module'], ctx['method'] = first_req['method'].split('.')
+                ctx['call_id'] = first_req.get('id')
                 ctx['rpc_context'] = {
                     'call_stack': [{'time': self.now_in_utc(),
-                                    'method': req['method']}
+                                    'method': first_req['method']}
                                    ]
                 }
                 prov_action = {'service': ctx['module'],
                                'method': ctx['method'],
-                               'method_params': req['params']
+                               'method_params': first_req.get('params')
                                }
                 ctx['provenance'] = [prov_action]
                 try:
                     token = environ.get('HTTP_AUTHORIZATION')
                     # parse out the method being requested and check if it
-                    # has an authentication requirement
-                    method_name = req['method']
-                    auth_req = self.method_authentication.get(
-                        method_name, 'none')
+                    # has an authentication requirement (the strictest one
+                    # for a batch)
+                    method_name = first_req['method']
+                    method_names = [r['method'] for r in batch_reqs]
+                    auth_reqs = [self.method_authentication.get(m, 'none')
+                                 for m in method_names]
+                    auth_req = 'none'
+                    for level in ('required', 'optional'):
+                        if level in auth_reqs:
+                            auth_req = level
+                            break
                     if auth_req != 'none':
                         if token is None and auth_req == 'required':
                             err = JSONServerError()
@@ -426,10 +649,29 @@ class Application(object):
                     if (environ.get('HTTP_X_FORWARDED_FOR')):
                         self.log(log.INFO, ctx, 'X-Forwarded-For: ' +
                                  environ.get('HTTP_X_FORWARDED_FOR'))
-                    self.log(log.INFO, ctx, 'start method')
-                    rpc_result = self.rpc_service.call(ctx, req)
-                    self.log(log.INFO, ctx, 'end method')
+                    # each heavy request of a batch takes its own slot in
+                    # call_py()
+                    limited_method = None if isinstance(req, list) \
+                        else method_name
+                    if not self.method_limiter.acquire(limited_method):
+                        raise ServerBusyError(
+                            self.method_limiter.busy_message(method_name))
+                    try:
+                        self.log(log.INFO, ctx, 'start method')
+                        rpc_result = self.rpc_service.call(ctx, req)
+                        self.log(log.INFO, ctx, 'end method')
+                    finally:
+                        self.method_limiter.release(limited_method)
                     status = '200 OK'
+                except ServerBusyError as sbe:
+                    err = {'error': {'code': -32000,
+                                     'name': 'Server busy',
+                                     'message': str(sbe),
+                                     }
+                           }
+                    rpc_result = self.process_error(err, ctx, first_req)
+                    status = SERVER_BUSY_STATUS
+                    self.metrics.request_rejected(method_name.split('.')[-1])
                 except JSONRPCError as jre:
                     err = {'error': {'code': jre.code,
                                      'name': jre.message,
@@ -437,7 +679,7 @@ class Application(object):
                                      }
                            }
                     trace = jre.trace if hasattr(jre, 'trace') else None
-                    rpc_result = self.process_error(err, ctx, req, trace)
+                    rpc_result = self.process_error(err, ctx, first_req, trace)
                 except Exception:
                     err = {'error': {'code': 0,
                                      'name': 'Unexpected Server Error',
@@ -445,7 +687,7 @@ class Application(object):
                                                 'occurred',
                                      }
                            }
-                    rpc_result = self.process_error(err, ctx, req,
+                    rpc_result = self.process_error(err, ctx, first_req,
                                                     traceback.format_exc())
 
         # print('Request method was %s\n' % environ['REQUEST_METHOD'])
@@ -455,18 +697,23 @@ class Application(object):
         #    pprint.pformat(rpc_result))
 
         if rpc_result:
-            response_body = rpc_result
+            response_body = rpc_result.encode('utf8')
         else:
-            response_body = ''
+            response_body = b''
 
         response_headers = [
             ('Access-Control-Allow-Origin', '*'),
             ('Access-Control-Allow-Headers', environ.get(
                 'HTTP_ACCESS_CONTROL_REQUEST_HEADERS', 'authorization')),
-            ('content-type', 'application/json'),
-            ('content-length', str(len(response_body)))]
+            ('content-type', 'application/json')]
+        if (len(response_body) >= _jsoncodec.COMPRESS_MIN_BYTES and
+                _jsoncodec.accepts_gzip(environ.get('HTTP_ACCEPT_ENCODING'))):
+            response_body = _jsoncodec.gzip_compress(response_body)
+            response_headers.append(('content-encoding', _jsoncodec.GZIP))
+            response_headers.append(('vary', 'Accept-Encoding'))
+        response_headers.append(('content-length', str(len(response_body))))
         start_response(status, response_headers)
-        return [response_body.encode('utf8')]
+        return [response_body]
 
     def process_error(self, error, context, request, trace=None):
         if trace:
@@ -526,42 +773,167 @@ except ImportError:
     # Not available outside of wsgi, ignore
     pass
 
-_proc = None
+class PooledWSGIServer(WSGIServer):
+    '''
+    A WSGI server that handles requests on a pool of worker threads.  At most
+    max_queue accepted requests wait for a free worker; any further request
+    is answered with 503 Service Unavailable straight away rather than left
+    to stall.
+    '''
+
+    def __init__(self, server_address, handler_class, workers=4,
+                 max_queue=16, bind_and_activate=True):
+        WSGIServer.__init__(self, server_address, handler_class,
+                            bind_and_activate)
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max(max_queue, 0))
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._reject(request)
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._process_request_worker, request,
+                          client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def _reject(self, request):
+        body = json.dumps({'version': '1.1',
+                           'error': {'code': -32000,
+                                     'name': 'Server busy',
+                                     'message': 'Too many queued requests, ' +
+                                                'try again later',
+                                     'error': None}}).encode('utf8')
+        head = ('HTTP/1.0 ' + SERVER_BUSY_STATUS + '\r\n' +
+                'Content-Type: application/json\r\n' +
+                'Content-Length: ' + str(len(body)) + '\r\n' +
+                'Retry-After: 1\r\n' +
+                'Connection: close\r\n\r\n').encode('latin-1')
+        try:
+            # read what has already arrived of the request so closing the
+            # socket doesn't reset the connection before the client reads
+            # the response
+            request.settimeout(0.05)
+            try:
+                request.recv(65536)
+            except (socket.timeout, OSError):
+                pass
+            request.sendall(head + body)
+        except OSError:
+            pass
+
+    def server_close(self):
+        WSGIServer.server_close(self)
+        self._pool.shutdown(wait=False)
+
+
+_procs = []
 
 
-def start_server(host='localhost', port=0, newprocess=False):
+def _make_server(host, port, workers, max_queue):
+    if workers:
+        httpd = PooledWSGIServer((host, port), _WSGIRequestHandler,
+                                 workers=workers, max_queue=max_queue)
+        httpd.set_app(application)
+        return httpd
+    return make_server(host, port, application)
+
+
+def start_server(host='localhost', port=0, newprocess=False, workers=None,
+                 worker_type=None, max_queue=None):
     '''
     By default, will start the server on localhost on a system assigned port
     in the main thread. Excecution of the main thread will stay in the server
     main loop until interrupted. To run the server in a separate process, and
     thus allow the stop_server method to be called, set newprocess = True. This
-    will also allow returning of the port number.'''
-
-    global _proc
-    if _proc:
+    will also allow returning of the port number.
+
+    By default requests are served one at a time. For production serving set
+    workers (or server-workers in the deploy config):
+    worker_type = 'thread' (server-worker-type) - serve requests on a pool of
+        worker threads in one process.
+    worker_type = 'process' - pre-fork worker processes sharing the
+        listening socket, each serving one request at a time.
+    max_queue (server-max-queue) - the number of accepted requests allowed
+        to wait for a free worker thread; beyond that requests get a 503
+        response. Default 2 * workers.  Worker processes have no such queue:
+        waiting connections stay in the socket's listen backlog.
+    CPU heavy methods (every run_* method, or server-heavy-methods) can be
+    limited to server-heavy-workers concurrent calls, across all the worker
+    threads or processes, with further calls rejected with a 503, so they
+    can't starve status and other lightweight calls.'''
+
+    if _procs:
         raise RuntimeError('server is already running')
-    httpd = make_server(host, port, application)
+    if workers is None:
+        workers = get_config_int(WORKERS)
+    if worker_type is None:
+        worker_type = (config.get(WORKER_TYPE) if config else None) or \
+            WORKER_THREAD
+    if worker_type not in (WORKER_THREAD, WORKER_PROCESS):
+        raise ValueError('Unknown worker type: ' + str(worker_type))
+    if max_queue is None:
+        max_queue = get_config_int(MAX_QUEUE, 2 * (workers or 0))
+
+    if workers and worker_type == WORKER_PROCESS:
+        # one heavy method cap for all the workers, not one each
+        application.method_limiter.share_between_processes()
+        httpd = make_server(host, port, application)
+        port = httpd.server_address[1]
+        print("Listening on port %s with %s worker processes" %
+              (port, workers))
+        for _ in range(workers):
+            proc = Process(target=httpd.serve_forever)
+            proc.daemon = True
+            proc.start()
+            _procs.append(proc)
+        # the workers hold the listening socket now
+        httpd.socket.close()
+        if not newprocess:
+            try:
+                for proc in _procs:
+                    proc.join()
+            finally:
+                stop_server()
+        return port
+
+    httpd = _make_server(host, port, workers, max_queue)
     port = httpd.server_address[1]
-    print("Listening on port %s" % port)
+    if workers:
+        print("Listening on port %s with %s worker threads" % (port, workers))
+    else:
+        print("Listening on port %s" % port)
     if newprocess:
-        _proc = Process(target=httpd.serve_forever)
-        _proc.daemon = True
-        _proc.start()
+        proc = Process(target=httpd.serve_forever)
+        proc.daemon = True
+        proc.start()
+        _procs.append(proc)
     else:
         httpd.serve_forever()
     return port
 
 
 def stop_server():
-    global _proc
-    _proc.terminate()
-    _proc = None
+    for proc in _procs:
+        proc.terminate()
+    del _procs[:]
 
 
 def process_async_cli(input_file_path, output_file_path, token):
     exit_code = 0
-    with open(input_file_path) as data_file:
-        req = json.load(data_file)
+    with open(input_file_path, 'rb') as data_file:
+        req = _jsoncodec.loads(
+            _jsoncodec.maybe_gzip_decompress(data_file.read()))
     if 'version' not in req:
         req['version'] = '1.1'
     if 'id' not in req:
@@ -602,8 +974,8 @@ def process_async_cli(input_file_path, output_file_path, token):
                 }
     if 'error' in resp:
         exit_code = 500
-    with open(output_file_path, "w") as f:
-        f.write(json.dumps(resp, cls=JSONObjectEncoder))
+    with open(output_file_path, "wb") as f:
+        f.write(_jsoncodec.dumpb(resp))
     return exit_code
 
 if __name__ == "__main__":
@@ -618,23 +990,34 @@ if __name__ == "__main__":
                 token = sys.argv[3]
         sys.exit(process_async_cli(sys.argv[1], sys.argv[2], token))
     try:
-        opts, args = getopt(sys.argv[1:], "", ["port=", "host="])
+        opts, args = getopt(sys.argv[1:], "", ["port=", "host=", "workers=",
+                                               "worker-type=", "max-queue="])
     except GetoptError as err:
         # print help information and exit:
         print(str(err))  # will print something like "option -a not recognized"
         sys.exit(2)
     port = 9999
     host = 'localhost'
+    workers = None
+    worker_type = None
+    max_queue = None
     for o, a in opts:
         if o == '--port':
             port = int(a)
         elif o == '--host':
             host = a
             print("Host set to %s" % host)
+        elif o == '--workers':
+            workers = int(a)
+        elif o == '--worker-type':
+            worker_type = a
+        elif o == '--max-queue':
+            max_queue = int(a)
         else:
             assert False, "unhandled option"
 
-    start_server(host=host, port=port)
+    start_server(host=host, port=port, workers=workers,
+                 worker_type=worker_type, max_queue=max_queue)
 #    print("Listening on port %s" % port)
 #    httpd = make_server( host, port, application)
 #
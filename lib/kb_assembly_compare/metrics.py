@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Service metrics in the Prometheus text exposition format.
+
+The server serves ServiceMetrics.render() at /metrics.  It exposes, per
+method, the number of requests, errors and 503 rejections, a latency
+histogram and the number of requests in flight, and, per method and stage,
+a histogram of the stage durations and the bytes processed as recorded by
+instrumentation.RunTimer.
+
+Metrics are kept in memory per process.  When the server runs pre-forked
+worker processes a scrape sees the counts of the process that served it.
+"""
+import os
+import threading
+import time
+
+from kb_assembly_compare.instrumentation import peak_rss_bytes
+
+PREFIX = 'kb_assembly_compare_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# app methods run from milliseconds (status) to hours (large assembly sets)
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600,
+                   1800, 3600, 7200)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+                     .replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v))
+                          for k, v in pairs) + '}'
+
+
+class _Metric(object):
+    kind = None
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = PREFIX + name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.doc),
+                 '# TYPE {} {}'.format(self.name, self.kind)]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return ['{}{} {}'.format(self.name,
+                                 _format_labels(self.labelnames, key),
+                                 _format_value(value))]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append('{}_bucket{} {}'.format(
+                self.name,
+                _format_labels(self.labelnames, key,
+                               [('le', _format_value(bound))]),
+                cumulative))
+        labels = _format_labels(self.labelnames, key)
+        lines.append('{}_sum{} {}'.format(self.name, labels,
+                                          _format_value(total)))
+        lines.append('{}_count{} {}'.format(self.name, labels, cumulative))
+        return lines
+
+
+class ServiceMetrics(object):
+    """The metrics of one server process."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.requests = Counter(
+            'requests_total', 'JSON-RPC method calls handled.', ['method'])
+        self.errors = Counter(
+            'request_errors_total', 'JSON-RPC method calls that failed.',
+            ['method'])
+        self.rejected = Counter(
+            'requests_rejected_total',
+            'JSON-RPC method calls rejected because the server was busy.',
+            ['method'])
+        self.latency = Histogram(
+            'request_duration_seconds', 'JSON-RPC method call latency.',
+            ['method'])
+        self.in_flight = Gauge(
+            'requests_in_flight', 'JSON-RPC method calls running now.',
+            ['method'])
+        self.stage_duration = Histogram(
+            'stage_duration_seconds',
+            'Wall time of the stages of the app methods.', ['method', 'stage'])
+        self.stage_cpu = Counter(
+            'stage_cpu_seconds_total',
+            'CPU time of the stages of the app methods, with their worker '
+            'processes.', ['method', 'stage'])
+        self.stage_bytes = Counter(
+            'stage_bytes_total',
+            'Bytes processed by the stages of the app methods.',
+            ['method', 'stage'])
+        self.peak_rss = Gauge(
+            'process_peak_rss_bytes', 'Peak resident set size of the process.')
+        self.uptime = Gauge(
+            'process_uptime_seconds', 'Seconds since the process started.')
+        self._metrics = [self.requests, self.errors, self.rejected,
+                         self.latency, self.in_flight, self.stage_duration,
+                         self.stage_cpu, self.stage_bytes, self.peak_rss,
+                         self.uptime]
+
+    def request_started(self, method):
+        self.in_flight.inc(method=method)
+
+    def request_finished(self, method, duration, failed=False):
+        self.in_flight.dec(method=method)
+        self.requests.inc(method=method)
+        if failed:
+            self.errors.inc(method=method)
+        self.latency.observe(duration, method=method)
+
+    def request_rejected(self, method):
+        self.rejected.inc(method=method)
+
+    def observe_stage(self, method, stage, wall, cpu, nbytes):
+        """A stage listener for instrumentation.add_stage_listener()."""
+        self.stage_duration.observe(wall, method=method, stage=stage)
+        self.stage_cpu.inc(cpu, method=method, stage=stage)
+        if nbytes:
+            self.stage_bytes.inc(nbytes, method=method, stage=stage)
+
+    def render(self):
+        self.peak_rss.set(peak_rss_bytes())
+        self.uptime.set(time.time() - self.start_time)
+        lines = ['# pid {}'.format(os.getpid())]
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
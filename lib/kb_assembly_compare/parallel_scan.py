@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel scanning of assembly files.
+
+The FASTA files are split into record aligned chunks (see fasta_chunks.py),
+one per file unless a file is larger than the chunk size, and each chunk is
+scanned by a worker of a process pool.  Workers hand back their contig
+lengths as a file of int64s in a scratch directory rather than a pickled
+list, and results always come back in the order of the input files.
+scan_contig_composition() hands back the base composition of each contig
+with its length, from the same single read of the files, and
+scan_contig_keys() the record offset and digest of each contig, whose
+sampled k-mers sample_contig_kmers() then hashes on the same chunks.  The
+number of workers and the chunk size come from scan-workers and
+scan-chunk-mb in deploy.cfg or the KB_SCAN_WORKERS and KB_SCAN_CHUNK_MB
+environment variables (which take precedence).  By default there is a worker
+per core and chunks are 64 MB.  Daemonic processes (such as the pre-forked
+workers of the standalone server) cannot start a pool, so they scan in
+process.
+"""
+import bisect
+import multiprocessing
+import os
+import shutil
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from kb_assembly_compare import contig_stats, fasta_chunks
+
+SCAN_WORKERS = 'scan-workers'
+SCAN_WORKERS_ENV = 'KB_SCAN_WORKERS'
+SCAN_CHUNK_MB = 'scan-chunk-mb'
+SCAN_CHUNK_MB_ENV = 'KB_SCAN_CHUNK_MB'
+# int64 contig lengths
+LENS_TYPECODE = 'q'
+# the lists of scan_contig_composition(): all but 'split_lens' hold a value
+# per contig ('digests' only when hashing)
+COMPOSITION_FIELDS = ('lens', 'gc', 'ambiguous', 'gaps', 'gap_bp',
+                      'split_lens', 'digests')
+# the lists of scan_contig_keys(), a value per contig
+KEY_FIELDS = ('offsets', 'lens', 'digests')
+
+
+def _setting(config, key, env):
+    value = os.environ.get(env)
+    if value is None and config:
+        value = config.get(key)
+    if value is None or value.strip() == '':
+        return None
+    return value.strip()
+
+
+def scan_workers(config=None):
+    """The configured number of scan workers."""
+    value = _setting(config, SCAN_WORKERS, SCAN_WORKERS_ENV)
+    if value is None:
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def scan_chunk_bytes(config=None):
+    """The configured size of the chunks large files are split into."""
+    value = _setting(config, SCAN_CHUNK_MB, SCAN_CHUNK_MB_ENV)
+    if value is None:
+        return fasta_chunks.DEFAULT_CHUNK_BYTES
+    return max(1, int(float(value) * 1024 * 1024))
+
+
+def map_in_order(function, items, workers):
+    """
+    function over items on a pool of up to workers processes, in input
+    order.  Runs in this process for one worker or item, or when this is a
+    daemonic process.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1 or \
+            multiprocessing.current_process().daemon:
+        return [function(item) for item in items]
+    workers = min(workers, len(items))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            function, items, chunksize=max(1, len(items) // (4 * workers))))
+
+
+def write_lens(lens, lens_path):
+    with open(lens_path, 'wb') as lens_handle:
+        array(LENS_TYPECODE, lens).tofile(lens_handle)
+
+
+def read_lens(lens_path, n_contigs, as_array=False):
+    lens = array(LENS_TYPECODE)
+    with open(lens_path, 'rb') as lens_handle:
+        lens.fromfile(lens_handle, n_contigs)
+    if as_array:
+        return lens
+    return lens.tolist()
+
+
+def _serial(workers):
+    return workers <= 1 or multiprocessing.current_process().daemon
+
+
+def _plan(fasta_paths, chunk_bytes):
+    """(file index, path, start, end) of each chunk of each file."""
+    chunks = []
+    for file_i, path in enumerate(fasta_paths):
+        for start, end in fasta_chunks.plan_chunks(path, chunk_bytes):
+            chunks.append((file_i, path, start, end))
+    return chunks
+
+
+def _scan_chunk_to_file(args):
+    fasta_path, start, end, lens_path = args
+    lens = fasta_chunks.chunk_lengths(fasta_path, start, end)
+    write_lens(lens, lens_path)
+    return [len(lens)]
+
+
+def _scan_composition_to_file(args):
+    fasta_path, start, end, lens_path, min_gap_length, hash_contigs = args
+    fields = fasta_chunks.chunk_composition(fasta_path, start, end,
+                                            min_gap_length, hash_contigs)
+    write_lens([val for field in fields for val in field], lens_path)
+    return [len(field) for field in fields]
+
+
+def _scan_keys_to_file(args):
+    fasta_path, start, end, lens_path = args
+    fields = fasta_chunks.chunk_contig_keys(fasta_path, start, end)
+    write_lens([val for field in fields for val in field], lens_path)
+    return [len(field) for field in fields]
+
+
+def _scan_chunks(chunks, n_files, scan_chunk, n_fields, workers, tmp_dir,
+                 extra_args=(), as_arrays=False):
+    """
+    scan_chunk() of each chunk on the pool, with extra_args after the chunk
+    and its file.  Each job writes its n_fields lists of ints to its file as
+    int64s, one list after the other, and returns their lengths.  Returns
+    the n_fields lists of each file, joined over its chunks, or with
+    as_arrays int64 arrays (8 bytes a value rather than a Python int).
+    """
+    lens_dir = tempfile.mkdtemp(prefix='contig_lens_', dir=tmp_dir)
+    try:
+        jobs = [(path, start, end, os.path.join(lens_dir, str(i)+'.lens')) +
+                tuple(extra_args)
+                for i, (_, path, start, end) in enumerate(chunks)]
+        field_lens = map_in_order(scan_chunk, jobs, workers)
+        fields = [[array(LENS_TYPECODE) if as_arrays else []
+                   for _ in range(n_fields)] for _ in range(n_files)]
+        for (file_i, _, _, _), job, job_field_lens in zip(chunks, jobs,
+                                                          field_lens):
+            values = read_lens(job[3], sum(job_field_lens), as_arrays)
+            field_start = 0
+            for field, field_len in zip(fields[file_i], job_field_lens):
+                field.extend(values[field_start:field_start+field_len])
+                field_start += field_len
+        return fields
+    finally:
+        shutil.rmtree(lens_dir, ignore_errors=True)
+
+
+def scan_contig_lengths(fasta_paths, workers=1, tmp_dir=None,
+                        chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES):
+    """
+    The contig lengths of each FASTA file, in input order.  Files larger
+    than chunk_bytes are split into record aligned chunks scanned by
+    separate workers.
+    """
+    if _serial(workers):
+        return [contig_stats.read_contig_lengths(path) for path in fasta_paths]
+    chunks = _plan(fasta_paths, chunk_bytes)
+    if len(chunks) <= 1:
+        return [contig_stats.read_contig_lengths(path) for path in fasta_paths]
+    return [file_fields[0] for file_fields in _scan_chunks(
+        chunks, len(fasta_paths), _scan_chunk_to_file, 1, workers, tmp_dir)]
+
+
+def scan_contig_composition(fasta_paths, workers=1, tmp_dir=None,
+                            chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES,
+                            min_gap_length=fasta_chunks.DEFAULT_MIN_GAP_LENGTH,
+                            hash_contigs=False):
+    """
+    The contigs of each FASTA file in input order, as a dict of lists in
+    file order: their 'lens', 'gc' (G+C counts), 'ambiguous' (ambiguous
+    base counts), 'gaps' (runs of at least min_gap_length Ns) and 'gap_bp',
+    the 'split_lens' of the contigs between the gaps of those with gaps,
+    and with hash_contigs their 'digests' (see
+    fasta_chunks.chunk_composition()).  The dict also records the
+    'min_gap_length'.  Scanned in chunks as by scan_contig_lengths().
+    """
+    chunks = None if _serial(workers) else _plan(fasta_paths, chunk_bytes)
+    if chunks is None or len(chunks) <= 1:
+        all_fields = [fasta_chunks.file_composition(path, min_gap_length,
+                                                    hash_contigs)
+                      for path in fasta_paths]
+    else:
+        all_fields = _scan_chunks(chunks, len(fasta_paths),
+                                  _scan_composition_to_file,
+                                  len(COMPOSITION_FIELDS), workers, tmp_dir,
+                                  (min_gap_length, hash_contigs))
+    return [dict(zip(COMPOSITION_FIELDS, fields),
+                 min_gap_length=min_gap_length) for fields in all_fields]
+
+
+def scan_contig_keys(fasta_paths, workers=1, tmp_dir=None,
+                     chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES):
+    """
+    The contigs of each FASTA file in input order, as a dict of int64
+    arrays in file order: their record 'offsets', 'lens' and 'digests' (see
+    fasta_chunks.chunk_contig_keys()).  Scanned in chunks as by
+    scan_contig_lengths().
+    """
+    chunks = None if _serial(workers) else _plan(fasta_paths, chunk_bytes)
+    if chunks is None or len(chunks) <= 1:
+        all_fields = [[array(LENS_TYPECODE, field) for field in
+                       fasta_chunks.file_contig_keys(path)]
+                      for path in fasta_paths]
+    else:
+        all_fields = _scan_chunks(chunks, len(fasta_paths),
+                                  _scan_keys_to_file, len(KEY_FIELDS),
+                                  workers, tmp_dir, as_arrays=True)
+    return [dict(zip(KEY_FIELDS, fields)) for fields in all_fields]
+
+
+def _contig_kmers(args):
+    return fasta_chunks.contig_kmers(*args)
+
+
+def sample_contig_kmers(fasta_paths, offsets, workers=1,
+                        chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES,
+                        kmer_length=fasta_chunks.DEFAULT_KMER_LENGTH,
+                        kmer_scale=fasta_chunks.DEFAULT_KMER_SCALE):
+    """
+    fasta_chunks.contig_kmers() of the contigs at the sorted record offsets
+    of each file, on the chunk plan of scan_contig_lengths(), so that a
+    large file is also sampled by several workers.  Returns, per file in
+    input order, the list of the count of each contig's hashes and a list
+    of arrays of the hashes, contig after contig.
+    """
+    jobs = []
+    job_files = []
+    for file_i, path, start, end in _plan(fasta_paths, chunk_bytes):
+        file_offsets = offsets[file_i]
+        chunk_offsets = file_offsets[
+            bisect.bisect_left(file_offsets, start):
+            bisect.bisect_left(file_offsets, end)]
+        if len(chunk_offsets):
+            jobs.append((path, chunk_offsets, kmer_length, kmer_scale))
+            job_files.append(file_i)
+    samples = [([], []) for _ in fasta_paths]
+    for file_i, (counts, hashes) in zip(
+            job_files, map_in_order(_contig_kmers, jobs, workers)):
+        samples[file_i][0].extend(counts)
+        samples[file_i][1].append(hashes)
+    return samples
+
+
+def _filter_chunk(args):
+    return fasta_chunks.filter_chunk(*args)
+
+
+def _concatenate(part_paths, filtered_path):
+    os.rename(part_paths[0], filtered_path)
+    with open(filtered_path, 'ab') as filt_handle:
+        for part_path in part_paths[1:]:
+            with open(part_path, 'rb') as part_handle:
+                shutil.copyfileobj(part_handle, filt_handle,
+                                   fasta_chunks.WRITE_BUF_SIZE)
+            os.remove(part_path)
+
+
+def filter_assemblies(fasta_paths, filtered_paths, min_contig_length,
+                      workers=1, chunk_bytes=fasta_chunks.DEFAULT_CHUNK_BYTES):
+    """
+    contig_stats.filter_fasta() of each file, in parallel, on the same
+    chunk plan as scan_contig_lengths(): each chunk is filtered to a part
+    file, and the parts are joined in order.  Returns the (original,
+    filtered) contig counts of each file in input order.
+    """
+    if _serial(workers):
+        return [contig_stats.filter_fasta(path, filtered_path,
+                                          min_contig_length)
+                for path, filtered_path in zip(fasta_paths, filtered_paths)]
+    chunks = _plan(fasta_paths, chunk_bytes)
+    chunks_per_file = [0] * len(fasta_paths)
+    for file_i, _, _, _ in chunks:
+        chunks_per_file[file_i] += 1
+    part_paths = [[] for _ in fasta_paths]
+    jobs = []
+    for file_i, path, start, end in chunks:
+        part_path = filtered_paths[file_i]
+        if chunks_per_file[file_i] > 1:
+            part_path += '.part'+str(len(part_paths[file_i]))
+        part_paths[file_i].append(part_path)
+        jobs.append((path, start, end, part_path, min_contig_length))
+    chunk_counts = map_in_order(_filter_chunk, jobs, workers)
+
+    counts = [[0, 0] for _ in fasta_paths]
+    for (file_i, _, _, _), (original_count, filtered_count) in \
+            zip(chunks, chunk_counts):
+        counts[file_i][0] += original_count
+        counts[file_i][1] += filtered_count
+    for file_i, filtered_path in enumerate(filtered_paths):
+        if not part_paths[file_i]:
+            open(filtered_path, 'w').close()  # an empty input file
+        elif len(part_paths[file_i]) > 1:
+            _concatenate(part_paths[file_i], filtered_path)
+    return [tuple(file_counts) for file_counts in counts]
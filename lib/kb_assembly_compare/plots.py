@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Figures of the contig distribution report.
+
+Each plot_* function draws one figure with matplotlib and saves it as a PNG
+and a PDF.  Figures are drawn with the object oriented API on a Figure that
+pyplot does not know about, so nothing keeps a figure alive after it is
+saved.  Pass a FigureRenderer to draw a series of plots on one reused
+Figure: the memory of a report then stays flat however many figures it has.
+The comparison plots draw the curves of all the assemblies as NumPy arrays
+in one LineCollection, with the axis limits worked out from the arrays, so
+their cost does not grow with the number of artists.
+
+    with FigureRenderer() as renderer:
+        for ...:
+            plot_length_histogram(..., renderer=renderer)
+"""
+import matplotlib as mpl
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+from matplotlib.transforms import Affine2D
+
+IMG_DPI = 200
+SHARED_IMG_IN_HEIGHT = 4.0
+# lengths are plotted in Mbp
+VAL_SCALE_SHIFT = 1000000.0
+# histogram x axis units and scale
+HIST_UNITS = ['Kbp', 'Kbp', 'Mbp']
+HIST_VAL_SCALE_ADJUST = [1000, 1000, 1000000]
+HIST_IMG_IN_WIDTH = [3.0, 3.0, 7.0]
+HIST_IMG_IN_HEIGHT = 3.0
+HIST_COLOR = "slateblue"
+COMPARISON_LINE_WIDTH = 2
+
+
+class FigureRenderer(object):
+    """
+    One Figure reused for a series of plots: cleared, resized and drawn
+    again for each, and released by close().
+    """
+
+    def __init__(self):
+        self.fig = None
+        self.figures_drawn = 0
+
+    def new_figure(self, img_in_width=None, img_in_height=None):
+        if self.fig is None:
+            self.fig = Figure()
+        else:
+            self.fig.clear()
+        if img_in_width is not None:
+            self.fig.set_size_inches(img_in_width, img_in_height)
+        self.figures_drawn += 1
+        return self.fig
+
+    def close(self):
+        if self.fig is not None:
+            self.fig.clear()
+            self.fig = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _new_figure(renderer, img_in_width, img_in_height):
+    if renderer is None:
+        renderer = FigureRenderer()
+    return renderer.new_figure(img_in_width, img_in_height)
+
+
+def _line_colors(n_lines):
+    """The colors of the first n_lines lines of ax.plot(), as in the key."""
+    cycle = mpl.rcParams['axes.prop_cycle'].by_key()['color']
+    return [cycle[line_i % len(cycle)] for line_i in range(n_lines)]
+
+
+def _data_limits(axis, lo, hi, margin):
+    """The view limits axis autoscaling gives data in [lo, hi]."""
+    lo, hi = axis.get_major_locator().nonsingular(lo, hi)
+    delta = (hi - lo) * margin
+    return lo - delta, hi + delta
+
+
+def _simplified(xy, transform):
+    """
+    The vertices of the line through xy that matplotlib would draw: lines
+    are simplified to within a fraction of a pixel, which collections do
+    not do when drawn.
+    """
+    if not mpl.rcParams['path.simplify']:
+        return xy
+    path = Path(transform.transform(xy)).cleaned(simplify=True)
+    return transform.inverted().transform(
+        path.vertices[path.codes != Path.STOP])
+
+
+def _plot_lines(ax, curves):
+    """
+    Draw curves, a list of (x, y) arrays, as one LineCollection in the colors
+    ax.plot() would give them, and set the limits ax.plot() would.  Call it
+    after the layout is final: the curves are simplified at the pixels of
+    the saved PNG.
+    """
+    curves = [(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+              for x, y in curves]
+    curves = [(x, y) for x, y in curves if len(x)]
+    if not curves:
+        return None
+    ax.set_xlim(_data_limits(ax.xaxis, min(x.min() for x, _ in curves),
+                             max(x.max() for x, _ in curves),
+                             mpl.rcParams['axes.xmargin']))
+    ax.set_ylim(_data_limits(ax.yaxis, min(y.min() for _, y in curves),
+                             max(y.max() for _, y in curves),
+                             mpl.rcParams['axes.ymargin']))
+    to_png_pixels = ax.transData + \
+        Affine2D().scale(float(IMG_DPI) / ax.figure.dpi)
+    lines = LineCollection(
+        [_simplified(np.column_stack((x, y)), to_png_pixels)
+         for x, y in curves],
+        colors=_line_colors(len(curves)), linewidths=COMPARISON_LINE_WIDTH,
+        joinstyle=mpl.rcParams['lines.solid_joinstyle'],
+        capstyle=mpl.rcParams['lines.solid_capstyle'])
+    ax.add_collection(lines, autolim=False)
+    return lines
+
+
+def _save(fig, png_path, pdf_path):
+    fig.savefig(png_path, dpi=IMG_DPI)
+    fig.savefig(pdf_path, format='pdf')
+
+
+def plot_key(assembly_names, png_path, pdf_path, plot_name_desc="KEY",
+             renderer=None):
+    """A line in each assembly's color, labeled with its name."""
+    total_ass = len(assembly_names)
+    spacing = 1.0
+    img_in_width = 6.0
+    img_in_height = 0.5 * (total_ass)
+    x_text_margin = 0.01
+    y_text_margin = 0.01
+    title_fontsize = 12
+    text_color = "#303030"
+    text_fontsize = 10
+    fig = _new_figure(renderer, img_in_width, img_in_height)
+    ax = fig.add_subplot(1, 1, 1)
+    # Let's turn off visibility of all tic labels and boxes here
+    for ax in fig.axes:
+        ax.xaxis.set_visible(False)  # remove axis labels and tics
+        ax.yaxis.set_visible(False)
+        for t in ax.get_xticklabels()+ax.get_yticklabels():  # remove tics
+            t.set_visible(False)
+
+    # build x and y coord lists
+    x0 = 1
+    x1 = 2
+    x_indent = 0.1
+    x_coords = [x0, x1]
+    ax.set_xlim(x0-x_indent, x1+x_indent)
+    ax.set_ylim(0, (total_ass+1)*spacing)
+    for ass_i, ass_name in enumerate(assembly_names):
+        y_pos = (total_ass - ass_i) * spacing
+        y_coords = [y_pos, y_pos]
+        ax.plot(x_coords, y_coords, lw=2)
+        ax.text(x0+x_text_margin, y_pos+y_text_margin, ass_name,
+                verticalalignment="bottom", horizontalalignment="left",
+                color=text_color, fontsize=text_fontsize, zorder=1)
+    ax.text(0.5*(x0+x1), 0+y_text_margin, plot_name_desc,
+            verticalalignment="bottom", horizontalalignment="center",
+            color=text_color, fontsize=title_fontsize, zorder=2)
+
+    _save(fig, png_path, pdf_path)
+    return fig
+
+
+def plot_cumulative_lengths(cumulative_lens, png_path, pdf_path,
+                            plot_name_desc="Cumulative Length (in Mbp)",
+                            renderer=None):
+    """The running sum of the sorted contig lengths of each assembly."""
+    img_in_width = 6.0
+    img_in_height = SHARED_IMG_IN_HEIGHT
+    fig = _new_figure(renderer, img_in_width, img_in_height)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.grid(True)
+    ax.set_title(plot_name_desc)
+    ax.set_xlabel('sorted contig order (longest to shortest)')
+    ax.set_ylabel('sum of contig lengths (Mbp)')
+    fig.tight_layout()
+
+    curves = []
+    for ass_cumulative_lens in cumulative_lens:
+        y_coords = np.asarray(ass_cumulative_lens, dtype=float) / \
+            VAL_SCALE_SHIFT
+        curves.append((np.arange(1, len(y_coords)+1), y_coords))
+    _plot_lines(ax, curves)
+
+    _save(fig, png_path, pdf_path)
+    return fig
+
+
+def plot_sorted_lengths(lens, png_path, pdf_path,
+                        plot_name_desc="Sorted Contig Lengths (in Mbp)",
+                        renderer=None):
+    """
+    Each assembly's sorted contig lengths as a step line against the summed
+    length so far.
+    """
+    img_in_width = 6.0
+    img_in_height = SHARED_IMG_IN_HEIGHT
+    fig = _new_figure(renderer, img_in_width, img_in_height)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.grid(True)
+    ax.set_title(plot_name_desc)
+    ax.set_xlabel('sum of sorted contig lengths (Mbp)')
+    ax.set_ylabel('sorted contig lengths (Mbp)')
+    fig.tight_layout()
+
+    # a step from the summed length before each contig to the sum after it
+    mini_delta = .000001
+    curves = []
+    for ass_lens in lens:
+        vals = np.asarray(ass_lens, dtype=float)
+        running_sums = np.cumsum(vals)
+        x_coords = np.empty(2 * len(vals))
+        x_coords[0::2] = (running_sums - vals + mini_delta) / VAL_SCALE_SHIFT
+        x_coords[1::2] = running_sums / VAL_SCALE_SHIFT
+        curves.append((x_coords, np.repeat(vals / VAL_SCALE_SHIFT, 2)))
+    _plot_lines(ax, curves)
+
+    _save(fig, png_path, pdf_path)
+    return fig
+
+
+def plot_length_histogram(hist_cnt_by_bin, hist_i, long_len, hist_binwidth,
+                          top_hist_cnt, png_path, pdf_path, renderer=None):
+    """
+    The histogram hist_i of one assembly, drawn as one bar per bin from its
+    bin counts (see contig_stats.length_histograms()), so the figure shows
+    the counts of the statistics and costs the same however many contigs
+    there are.  top_hist_cnt is the highest bin count over all assemblies, so
+    that the histograms of the assemblies share a y axis.
+    """
+    val_scale_adjust = HIST_VAL_SCALE_ADJUST[hist_i]
+    fig = _new_figure(renderer, HIST_IMG_IN_WIDTH[hist_i], HIST_IMG_IN_HEIGHT)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.grid(True)
+    min_hist_bin_beg = 0
+    max_hist_bin_end = float(long_len) / val_scale_adjust
+    binwidth = float(hist_binwidth) / val_scale_adjust
+    ax.set_xlim([0, max_hist_bin_end + 2*binwidth])
+    ax.set_ylim([0, top_hist_cnt + top_hist_cnt // 10])
+    ax.set_xlabel('contig length bin ('+HIST_UNITS[hist_i]+')')
+    ax.set_ylabel('# contigs')
+    fig.tight_layout()
+
+    # plot hist: bin bin_i holds the lengths in [bin_i, bin_i+1) * binwidth
+    bin_edges = np.arange(min_hist_bin_beg, max_hist_bin_end + 3*binwidth,
+                          binwidth)
+    counts = np.zeros(len(bin_edges) - 1)
+    n_bins = min(len(counts), len(hist_cnt_by_bin))
+    counts[:n_bins] = hist_cnt_by_bin[:n_bins]
+    bin_widths = np.diff(bin_edges)
+    ax.bar(bin_edges[:-1] + 0.5 * bin_widths, counts, bin_widths,
+           align='center', color=HIST_COLOR)
+
+    _save(fig, png_path, pdf_path)
+    return fig
+
+
+def plot_gc_content(gc_hists, png_path, pdf_path,
+                    plot_name_desc="GC Content (in Mbp per 1% GC)",
+                    renderer=None):
+    """
+    The summed length of each assembly's contigs in each 1% G+C bin (see
+    contig_stats.composition_stats()), as a line over the bin centers.
+    """
+    img_in_width = 6.0
+    img_in_height = SHARED_IMG_IN_HEIGHT
+    fig = _new_figure(renderer, img_in_width, img_in_height)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.grid(True)
+    ax.set_title(plot_name_desc)
+    ax.set_xlabel('contig GC content (%)')
+    ax.set_ylabel('sum of contig lengths (Mbp)')
+    fig.tight_layout()
+
+    curves = []
+    for gc_hist in gc_hists:
+        vals = np.asarray(gc_hist, dtype=float)
+        bin_width = 100.0 / len(vals)
+        curves.append(((np.arange(len(vals)) + 0.5) * bin_width,
+                       vals / VAL_SCALE_SHIFT))
+    _plot_lines(ax, curves)
+
+    _save(fig, png_path, pdf_path)
+    return fig
+
+
+def plot_length_vs_gc(assembly_lens_and_gc, png_path, pdf_path,
+                      plot_name_desc="Contig Length vs GC Content",
+                      renderer=None):
+    """
+    A point per contig at its G+C content and length, in its assembly's
+    color, from the (lengths, G+C fractions) of each assembly.  The points
+    of all the assemblies are one rasterized collection, so the PDF does not
+    hold a vector path per contig.  Contigs without a G+C fraction (NaN) are
+    left out.
+    """
+    img_in_width = 6.0
+    img_in_height = SHARED_IMG_IN_HEIGHT
+    fig = _new_figure(renderer, img_in_width, img_in_height)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.grid(True)
+    ax.set_title(plot_name_desc)
+    ax.set_xlabel('contig GC content (%)')
+    ax.set_ylabel('contig length (bp)')
+    ax.set_yscale('log')
+
+    x_coords = []
+    y_coords = []
+    n_points = []
+    for ass_lens, contig_gc in assembly_lens_and_gc:
+        contig_gc = np.asarray(contig_gc, dtype=float)
+        has_gc = ~np.isnan(contig_gc)
+        x_coords.append(100.0 * contig_gc[has_gc])
+        y_coords.append(np.asarray(ass_lens, dtype=float)[has_gc])
+        n_points.append(len(x_coords[-1]))
+    if sum(n_points):
+        point_colors = np.repeat(to_rgba_array(
+            _line_colors(len(n_points))), n_points, axis=0)
+        ax.scatter(np.concatenate(x_coords), np.concatenate(y_coords),
+                   s=4, c=point_colors, linewidths=0, alpha=0.5,
+                   rasterized=True)
+    ax.set_xlim(0, 100)
+    fig.tight_layout()
+
+    _save(fig, png_path, pdf_path)
+    return fig
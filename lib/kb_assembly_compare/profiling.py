@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+On-demand profiling of the app methods.
+
+Profiling is off unless switched on for a method, either in deploy.cfg
+
+    profile-methods = run_contig_distribution_compare
+    profile-tracemalloc = true
+    profile-top-n = 40
+
+or with the KB_PROFILE, KB_PROFILE_TRACEMALLOC and KB_PROFILE_TOP_N
+environment variables, which take precedence.  profile-methods is a comma
+separated list of method names, or "all".
+
+A MethodProfiler runs cProfile from start() to stop().  With tracemalloc on,
+it also takes a tracemalloc snapshot each time a RunTimer stage of the method
+closes.  stop() writes the pstats dump, the snapshots and a text summary with
+the top N functions and the allocation growth per stage to a directory in
+scratch, and upload() saves them to shock as report file_links.
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+from kb_assembly_compare.instrumentation import add_stage_listener, \
+    remove_stage_listener
+
+PROFILE_METHODS = 'profile-methods'
+PROFILE_TRACEMALLOC = 'profile-tracemalloc'
+PROFILE_TOP_N = 'profile-top-n'
+PROFILE_METHODS_ENV = 'KB_PROFILE'
+PROFILE_TRACEMALLOC_ENV = 'KB_PROFILE_TRACEMALLOC'
+PROFILE_TOP_N_ENV = 'KB_PROFILE_TOP_N'
+DEFAULT_TOP_N = 30
+# frames kept per traced allocation
+TRACEMALLOC_FRAMES = 10
+
+# the running profiler of each thread, so one left running by a method that
+# raised can be stopped when the next one starts
+_active = {}
+
+
+def _setting(config, key, env):
+    value = os.environ.get(env)
+    if value is None and config:
+        value = config.get(key)
+    if value is None:
+        return None
+    return value.strip()
+
+
+def _reset_peak():
+    # tracemalloc.reset_peak() is new in python 3.9
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+def _is_true(value):
+    return value is not None and value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class MethodProfiler(object):
+
+    def __init__(self, method_name, scratch, config=None):
+        self.method_name = method_name
+        methods = _setting(config, PROFILE_METHODS, PROFILE_METHODS_ENV)
+        methods = [m.strip() for m in (methods or '').split(',') if m.strip()]
+        self.enabled = 'all' in methods or method_name in methods or \
+            (len(methods) == 1 and _is_true(methods[0]))
+        self.trace_malloc = self.enabled and _is_true(
+            _setting(config, PROFILE_TRACEMALLOC, PROFILE_TRACEMALLOC_ENV))
+        top_n = _setting(config, PROFILE_TOP_N, PROFILE_TOP_N_ENV)
+        self.top_n = int(top_n) if top_n else DEFAULT_TOP_N
+        self.output_dir = os.path.join(
+            scratch, 'profile_' + method_name + '_' + str(uuid.uuid4()))
+        self.summary_path = None
+        self._profile = None
+        self._started_tracemalloc = False
+        self._snapshots = []
+        self._last_snapshot = None
+        self._start_time = None
+        self._wall = 0.0
+        self._thread = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._thread = threading.get_ident()
+        leftover = _active.get(self._thread)
+        if leftover is not None:
+            leftover.stop()
+        if self.trace_malloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            _reset_peak()
+            self._last_snapshot = tracemalloc.take_snapshot()
+            add_stage_listener(self.on_stage)
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # another profiler is already running in this thread
+            self._profile = None
+        self._start_time = time.time()
+        _active[self._thread] = self
+
+    def on_stage(self, method_name, stage, wall, cpu, nbytes):
+        """Stage listener: snapshot the traced memory at a stage boundary."""
+        if method_name != self.method_name or \
+                threading.get_ident() != self._thread or \
+                not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        growth = snapshot.compare_to(self._last_snapshot, 'lineno')[:10]
+        self._snapshots.append((stage, current, peak, snapshot, growth))
+        self._last_snapshot = snapshot
+        _reset_peak()
+
+    def stop(self):
+        """Stop profiling and write the results.  Returns the summary path."""
+        if not self.enabled or self._start_time is None:
+            return None
+        if self._profile is not None:
+            self._profile.disable()
+        self._wall = time.time() - self._start_time
+        self._start_time = None
+        if self.trace_malloc:
+            remove_stage_listener(self.on_stage)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        if _active.get(self._thread) is self:
+            del _active[self._thread]
+        self.write()
+        return self.summary_path
+
+    def write(self):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        lines = ['PROFILE for ' + self.method_name,
+                 'wall time: {:.3f} s'.format(self._wall), '']
+        if self._profile is not None:
+            self._profile.dump_stats(
+                os.path.join(self.output_dir, self.method_name + '.prof'))
+            for sort_key in ('cumulative', 'tottime'):
+                stream = io.StringIO()
+                stats = pstats.Stats(self._profile, stream=stream)
+                stats.sort_stats(sort_key).print_stats(self.top_n)
+                lines.append('== top {} functions by {} time =='.format(
+                    self.top_n, sort_key))
+                lines.append(stream.getvalue())
+        else:
+            lines.append('cProfile was not available (another profiler was '
+                         'running)')
+        if self._snapshots:
+            mb = 1024.0 * 1024.0
+            row = '{:<10}{:>15}{:>15}'
+            lines.append('== traced memory at stage boundaries ==')
+            lines.append(row.format('STAGE', 'CURRENT (MB)', 'PEAK (MB)'))
+            for stage, current, peak, _, _ in self._snapshots:
+                lines.append(row.format(stage, '{:.1f}'.format(current / mb),
+                                        '{:.1f}'.format(peak / mb)))
+            for stage, _, _, snapshot, growth in self._snapshots:
+                # the last snapshot of each stage is kept
+                snapshot.dump(os.path.join(
+                    self.output_dir, 'tracemalloc_' + stage + '.snapshot'))
+                lines.append('')
+                lines.append('== top allocation growth during ' + stage +
+                             ' ==')
+                lines.extend(str(stat) for stat in growth)
+        self.summary_path = os.path.join(
+            self.output_dir, self.method_name + '.profile.txt')
+        with open(self.summary_path, 'w') as summary_handle:
+            summary_handle.write("\n".join(lines) + "\n")
+
+    def upload(self, dfuClient):
+        """Save the profile to shock and return the report file_links."""
+        if self.summary_path is None:
+            return []
+        file_links = []
+        try:
+            summary_upload_ret = dfuClient.file_to_shock(
+                {'file_path': self.summary_path, 'make_handle': 0})
+            file_links.append({'shock_id': summary_upload_ret['shock_id'],
+                               'name': os.path.basename(self.summary_path),
+                               'label': 'Profile summary'})
+            profile_upload_ret = dfuClient.file_to_shock(
+                {'file_path': self.output_dir, 'make_handle': 0,
+                 'pack': 'zip'})
+            file_links.append({'shock_id': profile_upload_ret['shock_id'],
+                               'name': self.method_name + '_profile.zip',
+                               'label': 'Profile dumps'})
+        except Exception:
+            raise ValueError('error uploading profile to shock')
+        return file_links
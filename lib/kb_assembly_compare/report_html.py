@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+HTML report of the contig distribution comparison.
+
+The report is streamed to a file one assembly at a time through the
+templates below, compiled once at import.  Cells are styled by shared CSS
+classes (one per cell color) instead of inline styles, and every assembly is
+a <tbody> of the stats table that a small script pages through and sorts in
+the browser, so the page stays small and quick to show with hundreds of
+assemblies.  Without the script, all the assemblies are shown in input order.
+
+    with open(path, 'w') as html_handle:
+        write_contig_distribution_html(html_handle, names, ...)
+"""
+import html
+import math
+
+import numpy as np
+
+from kb_assembly_compare import scoring
+
+
+# assemblies per page of the stats table (0 shows them all)
+DEFAULT_PAGE_SIZE = 25
+PAGE_SIZES = [10, 25, 50, 100, 0]
+
+
+def cell_class(color):
+    """The CSS class of the cells of a color."""
+    return 'c'+color.lstrip('#')
+
+
+# the CSS class of each color bin (see scoring.py)
+CELL_CLASS_LUT = np.array([cell_class(color) for color in scoring.COLOR_LUT])
+
+_STYLE = """\
+body { background: white; color: #606060; font-family: sans-serif;
+       font-size: 10pt; }
+img.key { width: 475px; }
+img.big { height: 300px; }
+img.hist { height: 200px; }
+table.legend { border-collapse: collapse; margin: 1em 0 1em 2em; }
+table.legend td { border: 1px solid #cccccc; padding: 5px; }
+table.stats { border-spacing: 2px; }
+table.stats td, table.stats th { padding: 3px; }
+table.stats th { background: #eeeeff; font-weight: normal;
+                 border-right: solid 2px #ffccff;
+                 border-bottom: solid 2px #ffccff; }
+td.name { background: #eeeeee; text-align: left; }
+td.longest { text-align: center; vertical-align: middle; }
+td.label { text-align: center; }
+td.num { text-align: right; }
+td.hist { vertical-align: top; text-align: left;
+          border-bottom: solid 2px #cccccc; }
+td.edge { border-right: solid 2px #cccccc; }
+tr.last td.label, tr.last td.num { border-bottom: solid 2px #cccccc; }
+#controls { margin: 0.5em 0; }
+"""
+
+_HEAD_TEMPLATE = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>KBase Assembled Contig Distributions</title>
+<style>
+{style}{color_style}</style>
+</head>
+<body>
+<div><img class="key" src="{key_png}"></div>
+<div><img class="big" src="{cumulative_png}">
+<img class="big" src="{sorted_png}"></div>
+{composition_div}<table class="legend"><tr>{legend}</tr></table>
+<div id="controls" style="display: none">
+sort by <select id="sort-key">{sort_options}</select>
+<select id="sort-dir"><option value="asc">ascending</option>
+<option value="desc">descending</option></select>
+&nbsp; assemblies per page <select id="page-size">{page_size_options}</select>
+<button id="prev-page">&lt;</button> <span id="page-info"></span>
+<button id="next-page">&gt;</button>
+</div>
+<table class="stats" id="stats">
+<thead><tr>
+<th>ASSEMBLY</th>
+<th>LONGEST<br>CONTIG<br>(bp)</th>
+<th colspan=2>Nx (Lx)</th>
+<th>LENGTH<br>(bp)</th>
+<th>NUM<br>CONTIGS</th>
+<th>SUM<br>LENGTH<br>(bp)</th>
+<th>Contig Length Histogram<br>(1bp &lt;= len &lt; 10Kbp)</th>
+<th>Contig Length Histogram<br>(10Kbp &lt;= len &lt; 100Kbp)</th>
+<th>Contig Length Histogram<br>(len &gt;= 100Kbp)</th>
+</tr></thead>
+"""
+
+_ASSEMBLY_TEMPLATE = """\
+<tbody {sort_attrs}>
+<tr><td class="name" rowspan={rows}>{name}</td>
+<td class="longest {longest_class}" rowspan={rows}>{longest}</td>
+{first_row}{hists}</tr>
+{rows_html}</tbody>
+"""
+
+_SUB_ROW_TEMPLATE = ('<td class="label">{stat_label}:</td>'
+                     '<td class="num edge {stat_class}">&nbsp;{stat}</td>'
+                     '<td class="label"><nobr>&gt;= {bucket_label}</nobr></td>'
+                     '<td class="num {contigs_class}">{contigs}</td>'
+                     '<td class="num edge {length_class}">{length}</td>')
+
+_HIST_TEMPLATE = ('<td class="hist{edge}" rowspan={rows}>'
+                  '<img class="hist" src="{png}" loading="lazy"></td>')
+
+_TAIL_TEMPLATE = """\
+</table>
+<script>
+(function () {{
+  var table = document.getElementById('stats');
+  var groups = Array.prototype.slice.call(table.tBodies);
+  var sortKey = document.getElementById('sort-key');
+  var sortDir = document.getElementById('sort-dir');
+  var pageSize = document.getElementById('page-size');
+  var page = 0;
+  function pages() {{
+    var size = parseInt(pageSize.value, 10);
+    return size > 0 ? Math.max(1, Math.ceil(groups.length / size)) : 1;
+  }}
+  function show() {{
+    var size = parseInt(pageSize.value, 10);
+    page = Math.max(0, Math.min(page, pages() - 1));
+    groups.forEach(function (group, i) {{
+      group.style.display =
+        size <= 0 || Math.floor(i / size) === page ? '' : 'none';
+    }});
+    document.getElementById('page-info').textContent = 'page ' +
+      (page + 1) + ' of ' + pages() + ' (' + groups.length + ' assemblies)';
+  }}
+  function sort() {{
+    var key = sortKey.value;
+    var dir = sortDir.value === 'desc' ? -1 : 1;
+    groups.sort(function (a, b) {{
+      var x = a.getAttribute('data-' + key);
+      var y = b.getAttribute('data-' + key);
+      if (key !== 'name') {{
+        x = Number(x);
+        y = Number(y);
+      }}
+      return (x < y ? -1 : x > y ? 1 : 0) * dir;
+    }});
+    groups.forEach(function (group) {{ table.appendChild(group); }});
+    page = 0;
+    show();
+  }}
+  sortKey.onchange = sort;
+  sortDir.onchange = sort;
+  pageSize.onchange = function () {{ page = 0; show(); }};
+  document.getElementById('prev-page').onclick = function () {{
+    page -= 1;
+    show();
+  }};
+  document.getElementById('next-page').onclick = function () {{
+    page += 1;
+    show();
+  }};
+  document.getElementById('controls').style.display = '';
+  pageSize.value = '{page_size}';
+  show();
+}})();
+</script>
+</body>
+</html>
+"""
+
+_HEAD = _HEAD_TEMPLATE.format
+_ASSEMBLY = _ASSEMBLY_TEMPLATE.format
+_SUB_ROW = _SUB_ROW_TEMPLATE.format
+_HIST = _HIST_TEMPLATE.format
+_TAIL = _TAIL_TEMPLATE.format
+
+
+def _bucket_label(bucket):
+    if bucket >= 1000:
+        return '10<sup>'+str(int(math.log(bucket, 10)+0.1))+'</sup>'
+    return str(bucket)
+
+
+def _sort_keys(percs):
+    """(attribute, label) of the columns the table can be sorted by."""
+    keys = [('order', 'input order'), ('name', 'assembly'),
+            ('longest', 'longest contig')]
+    keys += [('n'+str(perc), 'N'+str(perc)) for perc in percs]
+    keys += [('l'+str(perc), 'L'+str(perc)) for perc in percs]
+    keys += [('contigs', 'num contigs'), ('length', 'sum length')]
+    return keys
+
+
+def _options(values_and_labels):
+    return ''.join('<option value="'+str(value)+'">'+label+'</option>'
+                   for value, label in values_and_labels)
+
+
+def write_contig_distribution_html(html_handle, assembly_names, max_lens, N,
+                                   L, summary_stats, cumulative_len_stats,
+                                   scores, percs, len_buckets, key_png_file,
+                                   cumulative_lens_png_file,
+                                   sorted_lens_png_file, hist_lens_png_files,
+                                   page_size=DEFAULT_PAGE_SIZE,
+                                   composition_png_files=()):
+    """
+    Write the HTML report to html_handle: the key and the length plots (and
+    the base composition plots, if any), then a table with a row group per
+    assembly of its statistics, colored by their scores (see
+    scoring.score_assemblies()), and its length histograms, shown page_size
+    assemblies at a time.
+    """
+    subtab_N_rows = 6
+    sp = '&nbsp;'
+    all_bucket = min(len_buckets)
+
+    cell_classes = CELL_CLASS_LUT[scores['bins']]
+    metric_i = {key: i for i, key in enumerate(scores['keys'])}
+
+    # key
+    best = 10
+    worst = 1
+    key_vals = list(range(best, worst-1, -1))
+    key_classes = CELL_CLASS_LUT[scoring.color_bins(
+        [key_vals], [best], [worst], [False])[0]]
+    legend = ''.join('<td class="'+key_class+'">'+label+'</td>'
+                     for key_class, label in zip(
+                         key_classes,
+                         ['BEST'] + [sp]*(len(key_vals)-2) + ['WORST']))
+    html_handle.write(_HEAD(
+        style=_STYLE,
+        color_style=''.join('td.'+cell_class(color)+' { background: ' +
+                            color+'; }\n'
+                            for color in dict.fromkeys(scoring.COLOR_LUT)),
+        key_png=html.escape(key_png_file),
+        cumulative_png=html.escape(cumulative_lens_png_file),
+        sorted_png=html.escape(sorted_lens_png_file),
+        composition_div=('<div>'+' '.join(
+            '<img class="big" src="'+html.escape(png)+'">'
+            for png in composition_png_files)+'</div>\n'
+            if composition_png_files else ''),
+        legend=legend,
+        sort_options=_options(_sort_keys(percs)),
+        page_size_options=_options(
+            (size, str(size) if size else 'all') for size in PAGE_SIZES)))
+
+    for ass_i, ass_name in enumerate(assembly_names):
+        sort_attrs = {'order': ass_i, 'name': ass_name,
+                      'longest': max_lens[ass_i],
+                      'contigs': summary_stats[ass_i][all_bucket],
+                      'length': cumulative_len_stats[ass_i][all_bucket]}
+        for perc in percs:
+            sort_attrs['n'+str(perc)] = N[perc][ass_i]
+            sort_attrs['l'+str(perc)] = L[perc][ass_i]
+
+        sub_rows = []
+        for sub_i in range(subtab_N_rows):
+            perc = percs[sub_i // 2]
+            bucket = len_buckets[sub_i]
+            if (sub_i % 2) == 0:
+                stat_label = 'N'+str(perc)
+                stat = str(N[perc][ass_i])
+                stat_class = cell_classes[metric_i['N', perc], ass_i]
+            else:
+                stat_label = 'L'+str(perc)
+                stat = '('+str(L[perc][ass_i])+')'
+                stat_class = cell_classes[metric_i['L', perc], ass_i]
+            contigs = summary_stats[ass_i][bucket]
+            length = cumulative_len_stats[ass_i][bucket]
+            sub_rows.append(_SUB_ROW(
+                stat_label=stat_label, stat=stat,
+                stat_class=stat_class,
+                bucket_label=_bucket_label(bucket),
+                contigs=contigs,
+                contigs_class=cell_classes[
+                    metric_i['summary_stats', bucket], ass_i],
+                length=length,
+                length_class=cell_classes[
+                    metric_i['cumulative_len_stats', bucket], ass_i]))
+
+        hist_files = hist_lens_png_files[ass_i]
+        hists = ''.join(
+            _HIST(edge=' edge' if hist_i == len(hist_files)-1 else '',
+                  rows=subtab_N_rows, png=html.escape(png))
+            for hist_i, png in enumerate(hist_files))
+        rows_html = ''
+        for sub_i in range(1, subtab_N_rows):
+            tr = '<tr class="last">' if sub_i == subtab_N_rows-1 else '<tr>'
+            rows_html += tr+sub_rows[sub_i]+'</tr>\n'
+        html_handle.write(_ASSEMBLY(
+            sort_attrs=' '.join('data-'+key+'="'+html.escape(str(val))+'"'
+                                for key, val in sort_attrs.items()),
+            rows=subtab_N_rows,
+            name=html.escape(ass_name),
+            longest_class=cell_classes[metric_i['len', None], ass_i],
+            longest=max_lens[ass_i],
+            first_row=sub_rows[0],
+            hists=hists,
+            rows_html=rows_html))
+
+    html_handle.write(_TAIL(page_size=page_size))
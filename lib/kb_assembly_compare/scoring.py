@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Best/worst scoring and cell colors of the assembly comparison table.
+
+The colored statistics (metrics) of all the assemblies are held in one
+(metric, assembly) array, and the best and worst value of every metric and
+the color bin of every cell are found with NumPy array operations over it.
+A color bin indexes COLOR_LUT: bin WHITE is the midpoint between best and
+worst, then come the shades of the best side from the strongest, then those
+of the worst side.  The HTML report and the stats tables share the scores.
+
+    scores = score_assemblies(max_lens, N, L, summary_stats,
+                              cumulative_len_stats, percs, len_buckets)
+    colors = cell_colors(scores)  # one per metric and assembly
+"""
+import numpy as np
+
+# the hex digits of the color intensities 0-15
+INTENSITY_DIGITS = ['00', '11', '22', '33', '44', '55', '66', '77',
+                    '88', '99', 'aa', 'bb', 'cc', 'dd', 'ee', 'ff']
+BASE_INTENSITY = 11
+TOP = 15 - BASE_INTENSITY
+N_SHADES = TOP + 1
+WHITE = 0
+BEST_SIDE = 1
+WORST_SIDE = BEST_SIDE + N_SHADES
+COLOR_LUT = np.array(
+    ['#ffffff'] +
+    ['#'+digits+digits+'ff'
+     for digits in INTENSITY_DIGITS[BASE_INTENSITY:]] +
+    ['#ff'+digits+digits
+     for digits in INTENSITY_DIGITS[BASE_INTENSITY:]])
+
+
+def metric_names(percs, len_buckets):
+    """The names of the scored metrics, as in the stats table columns."""
+    names = ['max_len']
+    names += ['N'+str(perc) for perc in percs]
+    names += ['L'+str(perc) for perc in percs]
+    names += ['num_contigs_ge_'+str(bucket) for bucket in len_buckets]
+    names += ['len_contigs_ge_'+str(bucket) for bucket in len_buckets]
+    return names
+
+
+def metric_keys(percs, len_buckets):
+    """
+    The (statistic, percentage or bucket) of each metric, in the order of
+    metric_names().  The statistic of the longest contig is 'len', with None.
+    """
+    keys = [('len', None)]
+    keys += [('N', perc) for perc in percs]
+    keys += [('L', perc) for perc in percs]
+    keys += [('summary_stats', bucket) for bucket in len_buckets]
+    keys += [('cumulative_len_stats', bucket) for bucket in len_buckets]
+    return keys
+
+
+def metric_values(max_lens, N, L, summary_stats, cumulative_len_stats, percs,
+                  len_buckets):
+    """
+    The (metric, assembly) array of the statistics, and which metrics are
+    better low (Lx, where fewer contigs is better).
+    """
+    rows = [max_lens]
+    rows += [N[perc] for perc in percs]
+    rows += [L[perc] for perc in percs]
+    rows += [[stats[bucket] for stats in summary_stats]
+             for bucket in len_buckets]
+    rows += [[stats[bucket] for stats in cumulative_len_stats]
+             for bucket in len_buckets]
+    low_good = np.zeros(len(rows), dtype=bool)
+    low_good[1+len(percs):1+2*len(percs)] = True
+    return np.array(rows, dtype=np.int64).reshape(len(rows), -1), low_good
+
+
+def best_and_worst(values, low_good):
+    """The best and worst value of each metric (row) of values."""
+    highest = values.max(axis=1)
+    lowest = values.min(axis=1)
+    return (np.where(low_good, lowest, highest),
+            np.where(low_good, highest, lowest))
+
+
+def color_bins(values, best, worst, low_good):
+    """
+    The COLOR_LUT index of each value of the (metric, assembly) array: the
+    values on the best side of the midpoint between the metric's best and
+    worst get the shades of blue, strongest at the best, and those on the
+    worst side the shades of red.  The midpoint, and metrics whose best and
+    worst are equal, are white.
+    """
+    values = np.asarray(values, dtype=float)
+    best = np.asarray(best, dtype=float).reshape(-1, 1)
+    worst = np.asarray(worst, dtype=float).reshape(-1, 1)
+    low_good = np.asarray(low_good, dtype=bool).reshape(-1, 1)
+    mid = 0.5 * (best + worst)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        best_shade = np.floor(0.5 + TOP * (values-best) / (mid-best))
+        worst_shade = np.floor(0.5 + TOP * (values-worst) / (mid-worst))
+    bins = np.where(np.where(low_good, values < mid, values > mid),
+                    BEST_SIDE + np.clip(best_shade, 0, TOP),
+                    WORST_SIDE + np.clip(worst_shade, 0, TOP))
+    bins[(values == mid) | (best == worst)] = WHITE
+    return bins.astype(np.int8)
+
+
+def cell_color(val, best, worst, low_good=False):
+    """The color of one value (see color_bins())."""
+    return str(COLOR_LUT[color_bins([[val]], [best], [worst],
+                                    [low_good])[0, 0]])
+
+
+def score_assemblies(max_lens, N, L, summary_stats, cumulative_len_stats,
+                     percs, len_buckets):
+    """
+    The scores of the comparison table: the 'metrics' names and 'keys', and
+    the (metric, assembly) arrays of 'values' and color 'bins', with the
+    'best' and 'worst' value and 'low_good' of each metric.  N and L hold a
+    per-assembly list for each percentage, summary_stats and
+    cumulative_len_stats the per-assembly contig_stats.bucket_counts()
+    dicts.
+    """
+    values, low_good = metric_values(max_lens, N, L, summary_stats,
+                                     cumulative_len_stats, percs, len_buckets)
+    best, worst = best_and_worst(values, low_good)
+    return {'metrics': metric_names(percs, len_buckets),
+            'keys': metric_keys(percs, len_buckets),
+            'values': values,
+            'low_good': low_good,
+            'best': best,
+            'worst': worst,
+            'bins': color_bins(values, best, worst, low_good)}
+
+
+def cell_colors(scores):
+    """The (metric, assembly) array of the cell colors of the scores."""
+    return COLOR_LUT[scores['bins']]
+
+
+def best_and_worst_vals(scores):
+    """
+    The best and worst values of the scores as nested dicts:
+    best_val['len'], best_val['N'][perc], best_val['summary_stats'][bucket]
+    and so on.
+    """
+    best_val = {'N': {}, 'L': {}, 'summary_stats': {},
+                'cumulative_len_stats': {}}
+    worst_val = {'N': {}, 'L': {}, 'summary_stats': {},
+                 'cumulative_len_stats': {}}
+    for (stat, sub_key), best, worst in zip(scores['keys'], scores['best'],
+                                            scores['worst']):
+        if sub_key is None:
+            best_val[stat] = int(best)
+            worst_val[stat] = int(worst)
+        else:
+            best_val[stat][sub_key] = int(best)
+            worst_val[stat][sub_key] = int(worst)
+    return best_val, worst_val
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Machine-readable export of the contig length statistics.
+
+The statistics of a comparison are written as a table with one row per
+assembly and one column per metric, as TSV and/or columnar JSON, so that
+pipelines can load them in bulk instead of parsing the report.  Comparisons
+with the base composition add its columns, and those of the scaffold gaps
+when the scan looked for them (composition_columns()), and comparisons that
+looked for duplicate contigs the DUPLICATE_COLUMNS.  The sorted
+contig lengths of all the assemblies can also be dumped to one binary file
+of little endian int64s, assembly after assembly, longest first; the
+'contigs' column gives the number of lengths of each assembly.
+
+    export_stats(names, dist, 'stats', formats=['tsv', 'json'],
+                 dump_lens=True)
+
+The JSON file holds the column names, the values of each column, the
+report table colors of the scored metrics (see scoring.py), and the layout
+of the lengths file:
+
+    {"columns": ["assembly", "contigs", ...],
+     "data": {"assembly": ["a", "b"], "contigs": [1200, 35], ...},
+     "colors": {"max_len": ["#bbbbff", "#ffbbbb"], ...},
+     "contig_lengths": {"file": "contig_lengths.int64", "dtype": "<i8",
+                        "order": "longest first", "counts": "contigs"}}
+"""
+import json
+import os
+import sys
+from array import array
+
+from kb_assembly_compare import contig_stats, parallel_scan, scoring
+
+STATS_FORMATS = ['tsv', 'json']
+DEFAULT_STATS_FORMATS = ['tsv']
+STATS_FILE_PREFIX = 'contig_length_stats'
+LENS_FILE = 'contig_lengths.int64'
+LENS_DTYPE = '<i8'
+# the columns added when the comparison has the base composition, and the
+# scaffold gaps
+COMPOSITION_COLUMNS = ['gc_percent', 'ambiguous_bases']
+GAP_COLUMNS = ['gaps', 'gap_bp', 'split_contigs']
+# the columns added when the comparison looked for duplicate contigs
+DUPLICATE_COLUMNS = ['duplicate_contigs', 'duplicate_bp', 'shared_contigs',
+                     'shared_bp']
+
+
+def parse_stats_formats(value):
+    """
+    The stats file formats of a parameter: a format, a list of them or a
+    comma separated string, 'both', or 'none'.  None or '' is the default.
+    """
+    if value is None or value == '' or value == []:
+        return list(DEFAULT_STATS_FORMATS)
+    if isinstance(value, str):
+        value = value.split(',')
+    formats = []
+    for stats_format in value:
+        stats_format = stats_format.strip().lower()
+        if stats_format == 'both':
+            formats += STATS_FORMATS
+        elif stats_format in STATS_FORMATS:
+            formats.append(stats_format)
+        elif stats_format != 'none':
+            raise ValueError("Unknown stats format '"+stats_format +
+                             "'.  Must be one of " +
+                             ", ".join(STATS_FORMATS+['both', 'none']))
+    return [stats_format for stats_format in STATS_FORMATS
+            if stats_format in formats]
+
+
+def stats_columns(percs=contig_stats.PERCS,
+                  len_buckets=contig_stats.LEN_BUCKETS):
+    """The column names of the stats table."""
+    return ['assembly', 'contigs', 'total_len'] + \
+        scoring.metric_names(percs, len_buckets)
+
+
+def stats_row(name, stats, percs=contig_stats.PERCS,
+              len_buckets=contig_stats.LEN_BUCKETS):
+    """One assembly's row of the stats table (see stats_columns())."""
+    row = [name, stats['contigs'], stats['total_len'], stats['max_len']]
+    row += [stats['N'].get(perc, 0) for perc in percs]
+    row += [stats['L'].get(perc, 0) for perc in percs]
+    row += [stats['summary_stats'][bucket] for bucket in len_buckets]
+    row += [stats['cumulative_len_stats'][bucket] for bucket in len_buckets]
+    return row
+
+
+def composition_columns(composition, percs=contig_stats.PERCS):
+    """
+    The column names of the contig_stats.composition_stats() of an
+    assembly, with its gap_stats() if it has them.
+    """
+    columns = list(COMPOSITION_COLUMNS)
+    if 'gaps' in composition:
+        columns += GAP_COLUMNS
+        columns += ['contig_N'+str(perc) for perc in percs]
+        columns += ['contig_L'+str(perc) for perc in percs]
+    return columns
+
+
+def composition_row(composition, percs=contig_stats.PERCS):
+    """The composition_columns() values of one assembly."""
+    row = [round(100 * composition['gc_fraction'], 2),
+           composition['ambiguous']]
+    if 'gaps' in composition:
+        row += [composition['gaps'], composition['gap_bp'],
+                composition['contigs']]
+        row += [composition['contig_N'][perc] for perc in percs]
+        row += [composition['contig_L'][perc] for perc in percs]
+    return row
+
+
+def dist_stats(dist):
+    """
+    The contig_compare.assembly_stats() of each assembly of a
+    contig_compare.compare_contig_distributions() result.
+    """
+    all_stats = []
+    for ass_i, ass_lens in enumerate(dist['lens']):
+        all_stats.append({
+            'contigs': len(ass_lens),
+            'total_len': dist['total_lens'][ass_i],
+            'max_len': dist['max_lens'][ass_i],
+            'N': {perc: dist['N'][perc][ass_i] for perc in dist['percs']},
+            'L': {perc: dist['L'][perc][ass_i] for perc in dist['percs']},
+            'summary_stats': dist['summary_stats'][ass_i],
+            'cumulative_len_stats': dist['cumulative_len_stats'][ass_i]})
+    return all_stats
+
+
+def write_stats_tsv(tsv_path, columns, rows):
+    with open(tsv_path, 'w') as tsv_handle:
+        tsv_handle.write("\t".join(columns)+"\n")
+        for row in rows:
+            tsv_handle.write("\t".join(str(val) for val in row)+"\n")
+
+
+def write_stats_json(json_path, columns, rows, colors=None, lens_file=None):
+    """The table as columnar JSON (see the module docstring)."""
+    table = {'columns': columns,
+             'data': {column: [row[col_i] for row in rows]
+                      for col_i, column in enumerate(columns)}}
+    if colors is not None:
+        table['colors'] = colors
+    if lens_file is not None:
+        table['contig_lengths'] = {'file': lens_file,
+                                   'dtype': LENS_DTYPE,
+                                   'order': 'longest first',
+                                   'counts': 'contigs'}
+    with open(json_path, 'w') as json_handle:
+        json.dump(table, json_handle)
+        json_handle.write("\n")
+
+
+def write_lens_dump(lens_path, lens):
+    """The contig lengths of each assembly, one after the other, as int64s."""
+    with open(lens_path, 'wb') as lens_handle:
+        for ass_lens in lens:
+            ass_array = array(parallel_scan.LENS_TYPECODE, ass_lens)
+            if sys.byteorder != 'little':
+                ass_array.byteswap()
+            ass_array.tofile(lens_handle)
+
+
+def export_stats(assembly_names, dist, stats_output_dir,
+                 formats=DEFAULT_STATS_FORMATS, dump_lens=False):
+    """
+    Write the stats files of a compare_contig_distributions() result into
+    stats_output_dir.  Returns the (file name, description) of each file
+    written.
+    """
+    if not os.path.exists(stats_output_dir):
+        os.makedirs(stats_output_dir)
+    columns = stats_columns(dist['percs'], dist['len_buckets'])
+    rows = [stats_row(name, stats, dist['percs'], dist['len_buckets'])
+            for name, stats in zip(assembly_names, dist_stats(dist))]
+    if 'composition' in dist:
+        columns += composition_columns(dist['composition'][0], dist['percs'])
+        for row, composition in zip(rows, dist['composition']):
+            row += composition_row(composition, dist['percs'])
+    if 'duplicates' in dist:
+        columns += DUPLICATE_COLUMNS
+        duplicates = dist['duplicates']
+        for ass_i, row in enumerate(rows):
+            row += [duplicates['within'][ass_i],
+                    duplicates['within_bp'][ass_i],
+                    duplicates['shared'][ass_i],
+                    duplicates['shared_bp'][ass_i]]
+
+    files = []
+    lens_file = None
+    if dump_lens:
+        lens_file = LENS_FILE
+        write_lens_dump(os.path.join(stats_output_dir, lens_file),
+                        dist['lens'])
+    if 'tsv' in formats:
+        tsv_file = STATS_FILE_PREFIX+'.tsv'
+        write_stats_tsv(os.path.join(stats_output_dir, tsv_file), columns,
+                        rows)
+        files.append((tsv_file, 'Contig Length Stats TSV'))
+    if 'json' in formats:
+        json_file = STATS_FILE_PREFIX+'.json'
+        colors = None
+        if 'scores' in dist:
+            colors = dict(zip(dist['scores']['metrics'],
+                              scoring.cell_colors(dist['scores']).tolist()))
+        write_stats_json(os.path.join(stats_output_dir, json_file), columns,
+                         rows, colors, lens_file)
+        files.append((json_file, 'Contig Length Stats JSON'))
+    if lens_file is not None:
+        files.append((lens_file, 'Sorted Contig Lengths (int64)'))
+    return files
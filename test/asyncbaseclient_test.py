@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from installed_clients import jsoncodec
+from installed_clients.AssemblyUtilClient import AssemblyUtil
+from installed_clients.asyncbaseclient import AsyncBaseClient, \
+    close_async, use_async
+from installed_clients.baseclient import ServerError
+
+
+class _FakeService(object):
+    # a JSON-RPC 1.1 service.  Svc.echo returns its params, Svc.sleep sleeps
+    # for its argument, Svc.fail and Svc.crash fail, and submitted jobs
+    # finish on their second check with their args as the result.
+
+    def __init__(self):
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+        self.jobs = {}
+
+    async def handle(self, request):
+        # aiohttp decompresses gzip encoded request bodies itself
+        call = jsoncodec.loads(await request.read())
+        self.requests.append((request.headers.copy(), call))
+        method = call['method']
+        if method == 'Svc.fail':
+            # with a charset in the content type
+            return web.json_response(
+                {'version': '1.1', 'id': call['id'],
+                 'error': {'name': 'JSONRPCError', 'code': -32500,
+                           'message': 'it failed', 'error': 'trace'}},
+                status=500)
+        if method == 'Svc.crash':
+            return web.Response(status=500, text='crashed')
+        if method == 'Svc.sleep':
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(call['params'][0])
+            self.running -= 1
+            result = [call['params'][0]]
+        elif method.endswith('_submit'):
+            job_id = str(len(self.jobs))
+            self.jobs[job_id] = [0, call['params']]
+            result = [job_id]
+        elif method.endswith('._check_job'):
+            job = self.jobs[call['params'][0]]
+            job[0] += 1
+            finished = job[0] >= 2
+            result = [{'finished': int(finished),
+                       'result': job[1] if finished else None}]
+        else:
+            result = call['params']
+        response_body = jsoncodec.dumpb({'version': '1.1', 'id': call['id'],
+                                         'result': result})
+        response = web.Response(body=response_body,
+                                content_type='application/json')
+        if len(response_body) >= jsoncodec.COMPRESS_MIN_BYTES:
+            response.body = jsoncodec.gzip_compress(response_body)
+            response.headers['Content-Encoding'] = jsoncodec.GZIP
+        return response
+
+
+class AsyncBaseClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.service = _FakeService()
+        app = web.Application()
+        app.router.add_post('/', self.service.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url('/'))
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    def _client(self, **kwargs):
+        kwargs.setdefault('async_job_check_time_ms', 10)
+        return AsyncBaseClient(self.url, token='fake', **kwargs)
+
+    async def test_call(self):
+        async with self._client() as client:
+            self.assertEqual(await client.call_method(
+                'Svc.echo', [{'a': 1}], 'dev'), {'a': 1})
+            self.assertEqual(await client.call_method('Svc.echo', [1, 2]),
+                             [1, 2])
+            self.assertIsNone(await client.call_method('Svc.echo', []))
+        headers, call = self.service.requests[0]
+        self.assertEqual(headers['AUTHORIZATION'], 'fake')
+        self.assertEqual(call['context'], {'service_ver': 'dev'})
+        self.assertEqual(call['version'], '1.1')
+        self.assertIsNone(client._session)
+
+    async def test_errors(self):
+        async with self._client() as client:
+            with self.assertRaises(ServerError) as cm:
+                await client.call_method('Svc.fail', [])
+            self.assertEqual(cm.exception.name, 'JSONRPCError')
+            self.assertEqual(cm.exception.code, -32500)
+            self.assertEqual(cm.exception.message, 'it failed')
+            self.assertEqual(cm.exception.data, 'trace')
+            with self.assertRaises(ServerError) as cm:
+                await client.call_method('Svc.crash', [])
+            self.assertEqual(cm.exception.name, 'Unknown')
+            self.assertEqual(cm.exception.message, 'crashed')
+            with self.assertRaises(ValueError):
+                await client.call_method('Svc.echo', [], context='ctx')
+
+    async def test_gzip_and_codecs(self):
+        big = {'seq': 'ACGT' * 10000, 'n': 2 ** 70, 'u': 'café'}
+        for name in ('orjson', 'ujson', 'json'):
+            try:
+                jsoncodec.get_codec(name)
+            except ImportError:
+                continue
+            async with self._client(compress_requests=True,
+                                    json_codec=name) as client:
+                self.assertEqual(await client.call_method('Svc.echo', [big]),
+                                 big, name)
+                self.assertEqual(await client.call_method('Svc.echo', [1]),
+                                 1, name)
+            big_headers = self.service.requests[-2][0]
+            small_headers = self.service.requests[-1][0]
+            self.assertEqual(big_headers.get('Content-Encoding'),
+                             jsoncodec.GZIP)
+            self.assertNotIn('Content-Encoding', small_headers)
+
+    async def test_concurrency_limit(self):
+        # a larger connection pool, so only the semaphore limits the calls
+        async with self._client(max_concurrency=3,
+                                max_connections=10) as client:
+            results = await asyncio.gather(*[
+                client.call_method('Svc.sleep', [0.05]) for _ in range(10)])
+        self.assertEqual(results, [0.05] * 10)
+        self.assertEqual(self.service.max_running, 3)
+        with self.assertRaises(ValueError):
+            self._client(max_concurrency=0)
+
+    async def test_run_jobs(self):
+        async with self._client() as client:
+            self.assertEqual(await client.run_job('Svc.meth', ['x']), 'x')
+            results = [result async for result in client.run_jobs(
+                [('Svc.meth', [i]) for i in range(5)])]
+        self.assertEqual(sorted(results), [(i, i) for i in range(5)])
+        methods = [call['method'] for _, call in self.service.requests]
+        self.assertEqual(methods.count('Svc._meth_submit'), 6)
+        self.assertEqual(methods.count('Svc._check_job'), 12)
+
+    async def test_use_async(self):
+        au = use_async(AssemblyUtil(self.url, token='fake',
+                                    async_job_check_time_ms=10),
+                       max_concurrency=2)
+        try:
+            results = await asyncio.gather(*[
+                au.get_assembly_as_fasta({'ref': '1/2/' + str(i)})
+                for i in range(4)])
+        finally:
+            await close_async(au)
+        self.assertEqual(results, [{'ref': '1/2/' + str(i)}
+                                   for i in range(4)])
+        submits = [call for _, call in self.service.requests
+                   if call['method'] == 'AssemblyUtil._get_assembly_as_fasta'
+                   '_submit']
+        self.assertEqual(len(submits), 4)
+        self.assertEqual(submits[0]['context'], {'service_ver': 'release'})
+        self.assertIsNone(au._client._session)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from installed_clients.baseclient import BaseClient, _JobCheckSchedule
+
+
+class _FakeJobClient(BaseClient):
+    # jobs finish after the number of seconds given as their only argument
+
+    def _submit_job(self, service_method, args, service_ver=None,
+                    context=None):
+        job_id = str(len(self.jobs))
+        self.jobs[job_id] = (time.time(), args[0])
+        return job_id
+
+    def _check_job(self, service, job_id):
+        self.checks += 1
+        start, runtime = self.jobs[job_id]
+        finished = time.time() - start >= runtime
+        return {'finished': int(finished),
+                'result': [runtime] if finished else None}
+
+
+class BaseClientJobTest(unittest.TestCase):
+
+    def make_client(self, **kwargs):
+        client = _FakeJobClient('http://localhost', token='fake', **kwargs)
+        client.jobs = {}
+        client.checks = 0
+        return client
+
+    def test_exponential_schedule(self):
+        client = self.make_client(async_job_check_time_ms=100,
+                                  async_job_check_max_time_ms=300)
+        schedule = _JobCheckSchedule(client)
+        waits = [schedule.next_wait() for _ in range(5)]
+        self.assertEqual(waits, [0.1, 0.15, 0.225, 0.3, 0.3])
+
+    def test_adaptive_schedule(self):
+        client = self.make_client(async_job_check_strategy='adaptive',
+                                  async_job_check_time_ms=100,
+                                  async_job_max_latency_ms=20000)
+        schedule = _JobCheckSchedule(client)
+        # nothing known yet: the minimum wait
+        self.assertEqual(schedule.next_wait(), 0.1)
+        schedule.start -= 1000
+        # a percentage of the runtime so far, capped by the max latency
+        self.assertEqual(schedule.next_wait({'finished': 0}), 20)
+        schedule.start += 900
+        self.assertAlmostEqual(schedule.next_wait({'finished': 0}), 10, 1)
+        # half the remaining time, from progress
+        self.assertAlmostEqual(
+            schedule.next_wait({'finished': 0, 'progress': 0.9}), 10, 1)
+        self.assertAlmostEqual(
+            schedule.next_wait({'finished': 0, 'progress': 80}), 12.5, 1)
+        self.assertAlmostEqual(
+            schedule.next_wait({'finished': 0, 'estimated_remaining': 30}),
+            15, 1)
+
+    def test_adaptive_expected_runtime(self):
+        client = self.make_client(async_job_check_strategy='adaptive')
+        schedule = _JobCheckSchedule(client, expected_runtime=8)
+        self.assertAlmostEqual(schedule.next_wait(), 4, 1)
+
+    def test_bad_strategy(self):
+        with self.assertRaises(ValueError):
+            self.make_client(async_job_check_strategy='sometimes')
+
+    def test_run_job(self):
+        client = self.make_client(async_job_check_strategy='adaptive',
+                                  async_job_check_time_ms=10)
+        self.assertEqual(client.run_job('mod.meth', [0.2],
+                                        expected_runtime=0.2), 0.2)
+        self.assertLessEqual(client.checks, 6)
+
+    def test_run_jobs_in_completion_order(self):
+        client = self.make_client(async_job_check_time_ms=10,
+                                  async_job_check_max_time_ms=20)
+        jobs = [('mod.meth', [0.3]), ('mod.meth', [0.0]),
+                ('mod.meth', [0.15])]
+        results = list(client.run_jobs(jobs))
+        self.assertEqual(results, [(1, 0.0), (2, 0.15), (0, 0.3)])
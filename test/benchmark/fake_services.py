@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-ins for the KBase services the app methods call.
+
+A FakeKBase holds workspace objects whose data is served from local files.
+patch_impl() swaps the AssemblyUtil, DataFileUtil, Workspace, SetAPI and
+KBaseReport client classes of kb_assembly_compareImpl for fakes bound to the
+store, so the Impl methods run unchanged without a workspace, callback
+server or auth token:
+
+    kbase = FakeKBase(scratch)
+    ref_1 = kbase.add_assembly('assembly_1', 'assembly_1.fa')
+    ref_2 = kbase.add_assembly('assembly_2', 'assembly_2.fa')
+    with patch_impl(kbase):
+        impl.run_contig_distribution_compare(ctx, {
+            'workspace_name': kbase.workspace_name,
+            'input_assembly_refs': [ref_1, ref_2]})
+    print(kbase.reports[-1])
+"""
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+ASSEMBLY_TYPE = 'KBaseGenomeAnnotations.Assembly-6.0'
+ASSEMBLY_SET_TYPE = 'KBaseSets.AssemblySet-2.1'
+GENOME_TYPE = 'KBaseGenomes.Genome-17.0'
+GENOME_SET_TYPE = 'KBaseSearch.GenomeSet-2.1'
+REPORT_TYPE = 'KBaseReport.Report-3.0'
+# client classes of kb_assembly_compareImpl replaced by patch_impl()
+CLIENT_NAMES = ('workspaceService', 'SetAPI', 'AssemblyUtil', 'DFUClient',
+                'KBaseReport')
+
+
+class FakeKBase(object):
+
+    def __init__(self, scratch, workspace_name='benchmark_ws', wsid=1):
+        self.scratch = scratch
+        self.workspace_name = workspace_name
+        self.wsid = wsid
+        self.objects = {}
+        self.names = {}
+        self.shock = {}
+        self.reports = []
+        # calls made to each fake method, e.g. calls['get_assembly_as_fasta']
+        self.calls = {}
+        if not os.path.exists(scratch):
+            os.makedirs(scratch)
+
+    def _count(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def save_object(self, name, obj_type, data, path=None):
+        if name in self.names:
+            ref = self.names[name]
+            objid, version = [int(x) for x in ref.split('/')[1:]]
+            version += 1
+        else:
+            objid, version = len(self.names) + 1, 1
+        ref = '{}/{}/{}'.format(self.wsid, objid, version)
+        size = os.path.getsize(path) if path else len(str(data))
+        info = [objid, name, obj_type,
+                datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S+0000'),
+                version, 'benchmark', self.wsid, self.workspace_name,
+                uuid.uuid4().hex, size, {}]
+        self.objects[ref] = {'info': info, 'data': data, 'path': path}
+        self.names[name] = ref
+        return ref
+
+    def get_object(self, ref):
+        if ref in self.names:
+            ref = self.names[ref]
+        parts = ref.split('/')
+        if len(parts) == 2:
+            # no version: the latest
+            for name, full_ref in self.names.items():
+                if full_ref.split('/')[:2] == parts:
+                    ref = full_ref
+        if ref not in self.objects:
+            raise ValueError('No object with reference ' + ref)
+        return self.objects[ref]
+
+    def add_assembly(self, name, fasta_path):
+        return self.save_object(name, ASSEMBLY_TYPE,
+                                {'assembly_id': name}, path=fasta_path)
+
+    def add_assembly_set(self, name, assembly_refs):
+        items = [{'ref': ref, 'label': self.get_object(ref)['info'][1]}
+                 for ref in assembly_refs]
+        return self.save_object(name, ASSEMBLY_SET_TYPE,
+                                {'description': name, 'items': items})
+
+    def add_genome(self, name, assembly_ref, scientific_name='Unknown'):
+        return self.save_object(name, GENOME_TYPE,
+                                {'id': name, 'assembly_ref': assembly_ref,
+                                 'scientific_name': scientific_name,
+                                 'features': []})
+
+    def add_genome_set(self, name, genome_refs):
+        elements = {str(i): {'ref': ref} for i, ref in enumerate(genome_refs)}
+        return self.save_object(name, GENOME_SET_TYPE,
+                                {'description': name, 'elements': elements})
+
+    def client_classes(self):
+        """Fake client classes bound to this store, by Impl import name."""
+        kbase = self
+
+        class _FakeClient(object):
+            def __init__(self, url=None, *args, **kwargs):
+                self.kbase = kbase
+
+        class FakeWorkspace(_FakeClient):
+
+            def get_object_info_new(self, params):
+                kbase._count('get_object_info_new')
+                return [kbase.get_object(o['ref'])['info']
+                        for o in params['objects']]
+
+            def get_objects2(self, params):
+                kbase._count('get_objects2')
+                data = []
+                for o in params['objects']:
+                    obj = kbase.get_object(o['ref'])
+                    obj_data = obj['data']
+                    if o.get('included'):
+                        keys = [path.strip('/').split('/')[0]
+                                for path in o['included']]
+                        obj_data = {k: v for k, v in obj_data.items()
+                                    if k in keys}
+                    data.append({'data': obj_data, 'info': obj['info']})
+                return {'data': data}
+
+        class FakeSetAPI(_FakeClient):
+
+            def get_assembly_set_v1(self, params):
+                kbase._count('get_assembly_set_v1')
+                obj = kbase.get_object(params['ref'])
+                data = dict(obj['data'])
+                if params.get('include_item_info'):
+                    data['items'] = [dict(item, info=kbase.get_object(
+                        item['ref'])['info']) for item in data['items']]
+                return {'data': data, 'info': obj['info']}
+
+            def save_assembly_set_v1(self, params):
+                kbase._count('save_assembly_set_v1')
+                ref = kbase.save_object(params['output_object_name'],
+                                        ASSEMBLY_SET_TYPE, params['data'])
+                return {'set_ref': ref,
+                        'set_info': kbase.get_object(ref)['info']}
+
+        class FakeAssemblyUtil(_FakeClient):
+
+            def get_assembly_as_fasta(self, params):
+                # a "download": a link (or copy) of the file in scratch
+                kbase._count('get_assembly_as_fasta')
+                obj = kbase.get_object(params['ref'])
+                path = os.path.join(kbase.scratch, 'download_' +
+                                    uuid.uuid4().hex + '.fa')
+                try:
+                    os.link(obj['path'], path)
+                except OSError:
+                    shutil.copyfile(obj['path'], path)
+                return {'path': path, 'assembly_name': obj['info'][1]}
+
+            def save_assembly_from_fasta(self, params):
+                kbase._count('save_assembly_from_fasta')
+                return kbase.add_assembly(params['assembly_name'],
+                                          params['file']['path'])
+
+        class FakeDataFileUtil(_FakeClient):
+
+            def unpack_file(self, params):
+                kbase._count('unpack_file')
+                return {'file_path': params['file_path']}
+
+            def file_to_shock(self, params):
+                kbase._count('file_to_shock')
+                path = params['file_path']
+                if os.path.isdir(path):
+                    size = sum(os.path.getsize(os.path.join(dir_path, f))
+                               for dir_path, _, files in os.walk(path)
+                               for f in files)
+                else:
+                    size = os.path.getsize(path)
+                shock_id = uuid.uuid4().hex
+                kbase.shock[shock_id] = {'path': path, 'size': size}
+                return {'shock_id': shock_id, 'size': size,
+                        'node_file_name': os.path.basename(path),
+                        'handle': {'hid': 'KBH_' + shock_id}}
+
+        class FakeKBaseReport(_FakeClient):
+
+            def create_extended_report(self, params):
+                kbase._count('create_extended_report')
+                kbase.reports.append(params)
+                name = params.get('report_object_name') or \
+                    'report_' + uuid.uuid4().hex
+                ref = kbase.save_object(name, REPORT_TYPE, params)
+                return {'name': name, 'ref': ref}
+
+        return {'workspaceService': FakeWorkspace,
+                'SetAPI': FakeSetAPI,
+                'AssemblyUtil': FakeAssemblyUtil,
+                'DFUClient': FakeDataFileUtil,
+                'KBaseReport': FakeKBaseReport}
+
+
+@contextmanager
+def patch_impl(kbase):
+    """Run the Impl methods against kbase inside the block."""
+    from kb_assembly_compare import kb_assembly_compareImpl as impl_module
+    saved = {name: getattr(impl_module, name) for name in CLIENT_NAMES}
+    for name, fake in kbase.client_classes().items():
+        setattr(impl_module, name, fake)
+    try:
+        yield kbase
+    finally:
+        for name, client in saved.items():
+            setattr(impl_module, name, client)
+
+
+def fake_config(scratch):
+    """An Impl config for running against the fakes."""
+    return {'workspace-url': 'http://localhost/fake/ws',
+            'shock-url': 'http://localhost/fake/shock',
+            'handle-service-url': 'http://localhost/fake/handle',
+            'srv-wiz-url': 'http://localhost/fake/srv_wiz',
+            'scratch': scratch}
+
+
+def fake_context():
+    return {'token': 'fake_token',
+            'user_id': 'benchmark',
+            'authenticated': 1,
+            'provenance': [{'service': 'kb_assembly_compare',
+                            'method': 'benchmark',
+                            'method_params': []}]}
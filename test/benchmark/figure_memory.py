@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Memory regression benchmark of the distribution report figures.
+
+Renders the full report (contig_compare.render_distribution_report()) for
+increasing numbers of assemblies, each in a fresh process, and records the
+tracemalloc peak while rendering, the memory still held afterwards, the
+growth of the peak RSS, and the figures left alive.  Rendering memory
+should stay flat as assemblies are added:
+
+    cd test/benchmark
+    PYTHONPATH=../../lib python figure_memory.py --assemblies 5,20,50
+
+The run fails (exit status 1) if any figure outlives the report, if the
+report holds on to more than --max-retained-mb, or if the traced peak at
+the most assemblies is more than --max-growth times the peak at the fewest.
+RSS is informational: the key figure's raster grows with the number of
+assemblies, and the matplotlib raster buffers are not traced.
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import traceback
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import synthetic_fasta  # noqa: E402
+from kb_assembly_compare import contig_compare  # noqa: E402
+
+DEFAULT_ASSEMBLIES = '5,20,50'
+DEFAULT_CONTIGS = 2000
+DEFAULT_MAX_GROWTH = 1.5
+DEFAULT_MAX_RETAINED_MB = 1.0
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _live_figures():
+    from matplotlib.figure import Figure
+    import matplotlib.pyplot as plt
+    gc.collect()
+    return {'pyplot': len(plt.get_fignums()),
+            'objects': sum(1 for obj in gc.get_objects()
+                           if isinstance(obj, Figure))}
+
+
+def measure(n_assemblies, n_contigs, profile):
+    """Render a report of n_assemblies in this process and measure it."""
+    names = ['assembly_'+str(i) for i in range(n_assemblies)]
+    lens = [[int(x) for x in synthetic_fasta.contig_lengths(
+        n_contigs, profile, seed=i)] for i in range(n_assemblies)]
+    dist = contig_compare.compare_contig_distributions(lens)
+    out_dir = tempfile.mkdtemp()
+    try:
+        # warm up the fonts and backends, so they are not counted
+        contig_compare.render_distribution_report(
+            names[:1],
+            contig_compare.compare_contig_distributions([list(lens[0])]),
+            os.path.join(out_dir, 'warmup'))
+        gc.collect()
+        rss_before = _max_rss()
+        tracemalloc.start()
+        start = time.perf_counter()
+        rendered = contig_compare.render_distribution_report(
+            names, dist, os.path.join(out_dir, 'report'))
+        wall = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        n_hists = len(os.listdir(rendered['hist_dir'])) // 2
+    finally:
+        shutil.rmtree(out_dir)
+    return {'assemblies': n_assemblies,
+            'contigs': n_contigs,
+            'figures': len(rendered['figures']) + n_hists,
+            'wall_s': wall,
+            'rss_growth_bytes': _max_rss() - rss_before,
+            'traced_peak_bytes': traced_peak,
+            'retained_bytes': retained,
+            'live_figures': _live_figures()}
+
+
+def _run_child(args, conn):
+    try:
+        conn.send(('ok', measure(*args)))
+    except BaseException:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def measure_isolated(*args):
+    mp = multiprocessing.get_context('fork') \
+        if 'fork' in multiprocessing.get_all_start_methods() \
+        else multiprocessing.get_context()
+    parent_conn, child_conn = mp.Pipe(duplex=False)
+    proc = mp.Process(target=_run_child, args=(args, child_conn))
+    proc.start()
+    child_conn.close()
+    status, result = parent_conn.recv()
+    proc.join()
+    if status != 'ok':
+        raise RuntimeError('rendering failed:\n'+result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--assemblies', default=DEFAULT_ASSEMBLIES,
+                        help='comma separated assembly counts')
+    parser.add_argument('--contigs', type=int, default=DEFAULT_CONTIGS,
+                        help='contigs per assembly')
+    parser.add_argument('--profile', default=synthetic_fasta.DEFAULT_PROFILE,
+                        choices=sorted(synthetic_fasta.PROFILES))
+    parser.add_argument('--max-growth', type=float,
+                        default=DEFAULT_MAX_GROWTH)
+    parser.add_argument('--max-retained-mb', type=float,
+                        default=DEFAULT_MAX_RETAINED_MB)
+    parser.add_argument('--output', help='JSON results file')
+    args = parser.parse_args()
+
+    results = []
+    for n_assemblies in [int(n) for n in args.assemblies.split(',')]:
+        result = measure_isolated(n_assemblies, args.contigs, args.profile)
+        results.append(result)
+        print('{:>5} assemblies {:>5} figures {:>8.2f} s  traced peak '
+              '{:>6.1f} MB  retained {:>5.2f} MB  RSS +{:>6.1f} MB  '
+              'live figures {}'.format(
+                  result['assemblies'], result['figures'], result['wall_s'],
+                  result['traced_peak_bytes'] / 1e6,
+                  result['retained_bytes'] / 1e6,
+                  result['rss_growth_bytes'] / 1e6,
+                  result['live_figures']['objects']))
+        sys.stdout.flush()
+    if args.output:
+        with open(args.output, 'w') as output_handle:
+            json.dump(results, output_handle, indent=2)
+
+    failures = []
+    for result in results:
+        if result['live_figures']['pyplot'] or \
+                result['live_figures']['objects']:
+            failures.append('{} figures alive after rendering {} '
+                            'assemblies'.format(
+                                result['live_figures']['objects'],
+                                result['assemblies']))
+        if result['retained_bytes'] > args.max_retained_mb * 1e6:
+            failures.append('{:.1f} MB held after rendering {} '
+                            'assemblies'.format(result['retained_bytes'] / 1e6,
+                                                result['assemblies']))
+    first = results[0]['traced_peak_bytes']
+    last = results[-1]['traced_peak_bytes']
+    if len(results) > 1 and last > args.max_growth * max(first, 1):
+        failures.append('rendering peak grew {:.2f}x from {} to {} '
+                        'assemblies'.format(last / float(max(first, 1)),
+                                            results[0]['assemblies'],
+                                            results[-1]['assemblies']))
+    for failure in failures:
+        print('REGRESSION '+failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
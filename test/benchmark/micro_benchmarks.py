@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the FASTA scanning, contig statistics and plotting hot
+paths.
+
+Each case is timed at several input sizes (best of --repeat runs) and run
+once more under tracemalloc for its peak memory.  Throughput is reported in
+contigs/s, and MB/s for the cases that read FASTA.
+
+    cd test/benchmark
+    PYTHONPATH=../../lib python micro_benchmarks.py --save-baseline base.json
+    ... change something ...
+    PYTHONPATH=../../lib python micro_benchmarks.py --baseline base.json
+
+With --baseline the run fails (exit status 1) when a case is slower than the
+baseline by more than --threshold (a ratio, default 1.25); cases that take
+under a millisecond are not compared.  Baselines are
+machine specific: make them on the machine that runs the comparison.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+import synthetic_fasta  # noqa: E402
+from kb_assembly_compare import contig_index, contig_stats, fasta_chunks, \
+    plots, report_html, scoring  # noqa: E402
+
+DEFAULT_SIZES = '1000,100000,1000000'
+DEFAULT_THRESHOLD = 1.25
+DEFAULT_WORK_DIR = os.path.join('/tmp', 'kb_assembly_compare_benchmark')
+# assemblies in the report table and key benchmarks
+DEFAULT_ASSEMBLIES = 4
+# figures are slow to draw: skip them above this many contigs
+MAX_FIGURE_CONTIGS = 1000000
+# cases faster than this are too noisy to flag as regressions
+MIN_COMPARE_S = 0.001
+
+
+class Case(object):
+    """
+    A micro-benchmark.  setup(size, env) returns the argument of run(), and
+    the number of contigs and bytes processed per run.
+    """
+
+    def __init__(self, name, setup, run, max_size=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+
+
+def _sorted_lens(size, env):
+    lens = [int(x) for x in synthetic_fasta.contig_lengths(size)]
+    return contig_stats.sort_lens(lens)
+
+
+def _assembly_lens(size, env):
+    return [_sorted_lens(size, env) for _ in range(env['assemblies'])]
+
+
+def setup_scan(size, env):
+    assembly = synthetic_fasta.cached_assembly(
+        os.path.join(env['work_dir'], 'data'), size,
+        line_width=env['line_width'])
+    return assembly['path'], size, assembly['file_bytes']
+
+
+def run_scan(path):
+    contig_stats.read_contig_lengths(path)
+
+
+def setup_filter(size, env):
+    path, n_contigs, n_bytes = setup_scan(size, env)
+    return ((path, os.path.join(env['out_dir'], 'filtered.fa')), n_contigs,
+            n_bytes)
+
+
+def run_filter(args):
+    contig_stats.filter_fasta(args[0], args[1], 1000)
+
+
+def run_scan_chunks(path):
+    for start, end in fasta_chunks.plan_chunks(path):
+        fasta_chunks.chunk_lengths(path, start, end)
+
+
+def run_scan_composition(path):
+    fasta_chunks.file_composition(path)
+
+
+def run_scan_hashed(path):
+    fasta_chunks.file_composition(path, hash_contigs=True)
+
+
+def setup_duplicate_stats(size, env):
+    # a third of each assembly's contigs are in every assembly
+    rand = np.random.RandomState(0)
+    lens = _assembly_lens(size, env)
+    shared = rand.randint(-2**62, 2**62, size // 3)
+    digests = [np.concatenate((shared, rand.randint(-2**62, 2**62,
+                                                    size - len(shared))))
+               for _ in lens]
+    return (lens, digests), size * len(lens), 0
+
+
+def run_duplicate_stats(args):
+    contig_index.duplicate_stats(*args)
+
+
+def setup_contig_kmers(size, env):
+    path, n_contigs, n_bytes = setup_scan(size, env)
+    return (path, fasta_chunks.file_contig_keys(path)[0]), n_contigs, n_bytes
+
+
+def run_contig_kmers(args):
+    fasta_chunks.contig_kmers(*args)
+
+
+def setup_containment(size, env):
+    (path, offsets), n_contigs, _ = setup_contig_kmers(size, env)
+    lens = fasta_chunks.file_contig_keys(path)[1]
+    return (lens,) + fasta_chunks.contig_kmers(path, offsets), n_contigs, 0
+
+
+def run_containment(args):
+    contig_index.containment_candidates(*args)
+
+
+def setup_lens(size, env):
+    return _sorted_lens(size, env), size, 0
+
+
+def run_sort_n_stats(lens):
+    lens = contig_stats.sort_lens(list(lens))
+    cumulative, total_len = contig_stats.cumulative_lens(lens)
+    contig_stats.n_stats(lens, cumulative, total_len)
+
+
+def run_bucket_counts(lens):
+    contig_stats.bucket_counts(lens)
+
+
+def run_histogram_binning(lens):
+    contig_stats.length_histograms(lens, lens[0],
+                                   contig_stats.hist_binwidths(lens[0]))
+
+
+def setup_cell_color(size, env):
+    # a high-good and a low-good metric of size assemblies
+    vals = np.arange(size)
+    return np.array([vals, vals]), size, 0
+
+
+def run_cell_color(values):
+    top = values.shape[1] - 1
+    scoring.color_bins(values, [top, 0], [0, top], [False, True])
+
+
+def setup_html_table(size, env):
+    lens = _assembly_lens(size, env)
+    percs = contig_stats.PERCS
+    len_buckets = contig_stats.LEN_BUCKETS
+    N = {perc: [] for perc in percs}
+    L = {perc: [] for perc in percs}
+    summary_stats = []
+    cumulative_len_stats = []
+    for ass_lens in lens:
+        cumulative, total_len = contig_stats.cumulative_lens(ass_lens)
+        this_N, this_L = contig_stats.n_stats(ass_lens, cumulative, total_len)
+        for perc in percs:
+            N[perc].append(this_N[perc])
+            L[perc].append(this_L[perc])
+        this_summary_stats, this_cumulative_len_stats = \
+            contig_stats.bucket_counts(ass_lens)
+        summary_stats.append(this_summary_stats)
+        cumulative_len_stats.append(this_cumulative_len_stats)
+    max_lens = [ass_lens[0] for ass_lens in lens]
+    scores = scoring.score_assemblies(max_lens, N, L, summary_stats,
+                                      cumulative_len_stats, percs, len_buckets)
+    names = ['assembly_' + str(i) for i in range(len(lens))]
+    args = (names, max_lens, N, L, summary_stats, cumulative_len_stats,
+            scores, percs, len_buckets, 'key.png', 'cum.png',
+            'sorted.png', [['h0.png', 'h1.png', 'h2.png'] for _ in names])
+    return args, len(lens), 0
+
+
+def run_html_table(args):
+    report_html.write_contig_distribution_html(io.StringIO(), *args)
+
+
+def _figure_paths(env, name):
+    return (os.path.join(env['out_dir'], name + '.png'),
+            os.path.join(env['out_dir'], name + '.pdf'))
+
+
+def setup_key_plot(size, env):
+    names = ['assembly_' + str(i) for i in range(env['assemblies'])]
+    return (names,) + _figure_paths(env, 'key'), len(names), 0
+
+
+def setup_cumulative_plot(size, env):
+    cumulative = [contig_stats.cumulative_lens(ass_lens)[0]
+                  for ass_lens in _assembly_lens(size, env)]
+    return ((cumulative,) + _figure_paths(env, 'cumulative'),
+            size * len(cumulative), 0)
+
+
+def setup_sorted_plot(size, env):
+    lens = _assembly_lens(size, env)
+    return (lens,) + _figure_paths(env, 'sorted'), size * len(lens), 0
+
+
+def setup_histogram_plot(size, env):
+    lens = _sorted_lens(size, env)
+    hist_binwidth = contig_stats.hist_binwidths(lens[0])
+    hist_cnt_by_bin = contig_stats.length_histograms(
+        lens, lens[0], hist_binwidth)
+    top_hist_cnt = contig_stats.top_hist_counts([hist_cnt_by_bin])
+    # the 0-10Kbp histogram, which has most of the contigs
+    args = (hist_cnt_by_bin[0], 0, contig_stats.hist_long_len(0, lens[0]),
+            hist_binwidth[0], top_hist_cnt[0]) + \
+        _figure_paths(env, 'histogram')
+    return args, size, 0
+
+
+def setup_length_gc_plot(size, env):
+    rand = np.random.RandomState(0)
+    lens_and_gc = [(ass_lens, rand.normal(0.5, 0.03, len(ass_lens)))
+                   for ass_lens in _assembly_lens(size, env)]
+    return ((lens_and_gc,) + _figure_paths(env, 'length_gc'),
+            size * len(lens_and_gc), 0)
+
+
+def _plot(plot_function):
+    def run(args):
+        plot_function(*args)
+        plt.close('all')
+    return run
+
+
+CASES = [
+    Case('scan_fasta', setup_scan, run_scan),
+    Case('scan_fasta_chunks', setup_scan, run_scan_chunks),
+    Case('scan_composition', setup_scan, run_scan_composition),
+    Case('scan_hashed', setup_scan, run_scan_hashed),
+    Case('filter_fasta', setup_filter, run_filter),
+    Case('sort_n_stats', setup_lens, run_sort_n_stats),
+    Case('bucket_counts', setup_lens, run_bucket_counts),
+    Case('histogram_binning', setup_lens, run_histogram_binning),
+    Case('cell_color', setup_cell_color, run_cell_color),
+    Case('duplicate_stats', setup_duplicate_stats, run_duplicate_stats),
+    Case('contig_kmers', setup_contig_kmers, run_contig_kmers),
+    Case('containment_index', setup_containment, run_containment),
+    # the table and the key only depend on the number of assemblies
+    Case('html_table', setup_html_table, run_html_table, max_size=1000),
+    Case('key_plot', setup_key_plot, _plot(plots.plot_key),
+         max_size=1000),
+    Case('cumulative_plot', setup_cumulative_plot,
+         _plot(plots.plot_cumulative_lengths), max_size=MAX_FIGURE_CONTIGS),
+    Case('sorted_plot', setup_sorted_plot,
+         _plot(plots.plot_sorted_lengths), max_size=MAX_FIGURE_CONTIGS),
+    Case('histogram_plot', setup_histogram_plot,
+         _plot(plots.plot_length_histogram), max_size=MAX_FIGURE_CONTIGS),
+    Case('length_gc_plot', setup_length_gc_plot,
+         _plot(plots.plot_length_vs_gc), max_size=100000),
+]
+
+
+def measure(case, size, env, repeat):
+    arg, n_contigs, n_bytes = case.setup(size, env)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        case.run(arg)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    case.run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = min(times)
+    result = {'size': size,
+              'best_s': best,
+              'mean_s': sum(times) / len(times),
+              'peak_bytes': peak,
+              'contigs': n_contigs,
+              'contigs_per_s': n_contigs / best if best else None}
+    if n_bytes:
+        result['bytes'] = n_bytes
+        result['mb_per_s'] = n_bytes / best / 1e6 if best else None
+    return result
+
+
+def run_cases(cases, sizes, env, repeat):
+    results = {}
+    for case in cases:
+        results[case.name] = {}
+        for size in sizes:
+            if case.max_size is not None and size > case.max_size:
+                continue
+            result = measure(case, size, env, repeat)
+            results[case.name][str(size)] = result
+            print('{:<18} {:>9} {:>10.4f} s {:>14} {:>10} {:>10.1f} MB'.format(
+                case.name, size, result['best_s'],
+                '{:.0f} contigs/s'.format(result['contigs_per_s'] or 0),
+                '{:.1f} MB/s'.format(result['mb_per_s'])
+                if 'mb_per_s' in result else '',
+                result['peak_bytes'] / 1e6))
+            sys.stdout.flush()
+    return results
+
+
+def check_regressions(results, baseline, threshold):
+    """The cases slower than the baseline by more than threshold."""
+    regressions = []
+    for name, by_size in results.items():
+        for size, result in by_size.items():
+            before = baseline['results'].get(name, {}).get(size)
+            if before is None or before['best_s'] < MIN_COMPARE_S:
+                continue
+            ratio = result['best_s'] / before['best_s']
+            if ratio > threshold:
+                regressions.append((name, size, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--cases', default=','.join(c.name for c in CASES))
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma separated contig counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--assemblies', type=int, default=DEFAULT_ASSEMBLIES)
+    parser.add_argument('--line-width', type=int,
+                        default=synthetic_fasta.DEFAULT_LINE_WIDTH)
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR)
+    parser.add_argument('--output', help='JSON results file')
+    parser.add_argument('--save-baseline', help='write the results here as '
+                        'the baseline for later runs')
+    parser.add_argument('--baseline', help='fail on regressions against '
+                        'this baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    by_name = {case.name: case for case in CASES}
+    cases = []
+    for name in args.cases.split(','):
+        if name not in by_name:
+            parser.error('unknown case ' + name)
+        cases.append(by_name[name])
+    out_dir = tempfile.mkdtemp()
+    env = {'work_dir': args.work_dir, 'out_dir': out_dir,
+           'assemblies': args.assemblies, 'line_width': args.line_width}
+    try:
+        results = run_cases(cases, [int(s) for s in args.sizes.split(',')],
+                            env, args.repeat)
+    finally:
+        shutil.rmtree(out_dir)
+    output = {'date': datetime.utcnow().isoformat(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'repeat': args.repeat,
+              'results': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as output_handle:
+                json.dump(output, output_handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_handle:
+            baseline = json.load(baseline_handle)
+        regressions = check_regressions(results, baseline, args.threshold)
+        for name, size, ratio in regressions:
+            print('REGRESSION {} at {} contigs: {:.2f}x slower than the '
+                  'baseline'.format(name, size, ratio))
+        if regressions:
+            sys.exit(1)
+        print('no regressions against ' + args.baseline)
+
+
+if __name__ == '__main__':
+    main()
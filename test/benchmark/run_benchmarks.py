@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmarks of the app methods on synthetic assemblies.
+
+Each scenario runs one Impl method against the in-process service fakes in
+fake_services.py, on assemblies from synthetic_fasta.py, in a fresh process
+(so the peak RSS is the scenario's own).  Results are written as JSON, and
+--compare prints the change against the JSON of an earlier run:
+
+    cd test/benchmark
+    PYTHONPATH=../../lib python run_benchmarks.py --sizes 1000,100000 \
+        --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+os.environ.setdefault('SDK_CALLBACK_URL', 'http://localhost/fake/callback')
+
+import synthetic_fasta  # noqa: E402
+from fake_services import FakeKBase, fake_config, fake_context, \
+    patch_impl  # noqa: E402
+
+METHODS = {
+    'filter': 'run_filter_contigs_by_length',
+    'distribution': 'run_contig_distribution_compare',
+    'combine': 'run_combine_assemblies',
+    'mummer': 'run_benchmark_assemblies_against_genomes_with_MUMmer4',
+}
+DEFAULT_SIZES = '10,1000,100000'
+DEFAULT_WORK_DIR = os.path.join('/tmp', 'kb_assembly_compare_benchmark')
+MIN_CONTIG_LENGTH = 1000
+
+
+def _method_params(method_key, kbase, assembly_refs):
+    params = {'workspace_name': kbase.workspace_name,
+              'input_assembly_refs': assembly_refs}
+    if method_key == 'filter':
+        params['min_contig_length'] = MIN_CONTIG_LENGTH
+        params['output_name'] = 'filtered'
+    elif method_key == 'combine':
+        params['output_name'] = 'combined'
+    elif method_key == 'mummer':
+        genome_ref = kbase.add_genome('benchmark_genome', assembly_refs[0],
+                                      'Synthetic organism')
+        params['input_genome_refs'] = [genome_ref]
+        params['desc'] = 'benchmark'
+    return params
+
+
+def run_scenario(scenario):
+    """Run one scenario in this process and return its measurements."""
+    from kb_assembly_compare import instrumentation
+    from kb_assembly_compare.kb_assembly_compareImpl import kb_assembly_compare
+
+    work_dir = scenario['work_dir']
+    scratch = os.path.join(work_dir, 'scratch', str(os.getpid()))
+    kbase = FakeKBase(scratch)
+    assemblies = []
+    assembly_refs = []
+    for i in range(scenario['assemblies']):
+        assembly = synthetic_fasta.cached_assembly(
+            os.path.join(work_dir, 'data'), scenario['n_contigs'],
+            scenario['profile'], scenario['line_width'], seed=i)
+        assemblies.append(assembly)
+        assembly_refs.append(kbase.add_assembly('assembly_' + str(i + 1),
+                                                assembly['path']))
+    params = _method_params(scenario['method'], kbase, assembly_refs)
+
+    stages = {}
+
+    def on_stage(method_name, stage, wall, cpu, nbytes):
+        totals = stages.setdefault(stage, {'wall_s': 0.0, 'cpu_s': 0.0,
+                                           'bytes': 0})
+        totals['wall_s'] += wall
+        totals['cpu_s'] += cpu
+        totals['bytes'] += nbytes
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log if not scenario['verbose']
+                                    else sys.stdout):
+        impl = kb_assembly_compare(fake_config(scratch))
+        instrumentation.add_stage_listener(on_stage)
+        wall_start = time.time()
+        cpu_start = instrumentation.cpu_seconds()
+        try:
+            with patch_impl(kbase):
+                getattr(impl, METHODS[scenario['method']])(fake_context(),
+                                                           params)
+        finally:
+            instrumentation.remove_stage_listener(on_stage)
+        wall = time.time() - wall_start
+        cpu = instrumentation.cpu_seconds() - cpu_start
+    return {'wall_s': wall,
+            'cpu_s': cpu,
+            'peak_rss_bytes': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'total_bp': sum(a['total_bp'] for a in assemblies),
+            'file_bytes': sum(a['file_bytes'] for a in assemblies),
+            'stages': stages,
+            'service_calls': kbase.calls}
+
+
+def _run_child(scenario, conn):
+    try:
+        conn.send(('ok', run_scenario(scenario)))
+    except BaseException:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def _run_isolated(scenario):
+    if scenario['in_process']:
+        return run_scenario(scenario)
+    mp = multiprocessing.get_context('fork') \
+        if 'fork' in multiprocessing.get_all_start_methods() \
+        else multiprocessing.get_context()
+    # not a (daemonic) Pool worker, so the methods can start their own pools
+    parent_conn, child_conn = mp.Pipe(duplex=False)
+    proc = mp.Process(target=_run_child, args=(scenario, child_conn))
+    proc.start()
+    child_conn.close()
+    status, result = parent_conn.recv()
+    proc.join()
+    if status != 'ok':
+        raise RuntimeError('scenario '+scenario_name(scenario)+' failed:\n' +
+                           result)
+    return result
+
+
+def scenario_name(scenario):
+    return '{method}/{profile}/{n_contigs}x{assemblies}/w{line_width}'.format(
+        **scenario)
+
+
+def run_benchmarks(scenarios, repeat=1):
+    results = []
+    for scenario in scenarios:
+        runs = [_run_isolated(scenario) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run['wall_s'])
+        result = {'name': scenario_name(scenario),
+                  'method': METHODS[scenario['method']],
+                  'n_contigs': scenario['n_contigs'],
+                  'assemblies': scenario['assemblies'],
+                  'profile': scenario['profile'],
+                  'line_width': scenario['line_width'],
+                  'repeat': repeat,
+                  'wall_s': best['wall_s'],
+                  'wall_s_median': statistics.median(
+                      run['wall_s'] for run in runs),
+                  'cpu_s': best['cpu_s'],
+                  'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs),
+                  'total_bp': best['total_bp'],
+                  'file_bytes': best['file_bytes'],
+                  'contigs_per_s': scenario['n_contigs'] *
+                  scenario['assemblies'] / best['wall_s'],
+                  'mb_per_s': best['file_bytes'] / best['wall_s'] / 1e6,
+                  'stages': best['stages'],
+                  'service_calls': best['service_calls']}
+        results.append(result)
+        print('{:<55} {:>9.3f} s {:>9.1f} MB/s {:>8.0f} MB RSS'.format(
+            result['name'], result['wall_s'], result['mb_per_s'],
+            result['peak_rss_bytes'] / 1e6))
+        sys.stdout.flush()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the wall time and peak RSS ratios against a baseline run."""
+    old = {r['name']: r for r in baseline['results']}
+    print('\n{:<55} {:>10} {:>10}'.format('SCENARIO', 'WALL', 'RSS'))
+    for result in results:
+        before = old.get(result['name'])
+        if before is None:
+            continue
+        print('{:<55} {:>9.2f}x {:>9.2f}x'.format(
+            result['name'], result['wall_s'] / before['wall_s'],
+            result['peak_rss_bytes'] / float(before['peak_rss_bytes'])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--methods', default=','.join(sorted(METHODS)),
+                        help='comma separated: ' + ', '.join(sorted(METHODS)))
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma separated contig counts per assembly')
+    parser.add_argument('--profile', default=synthetic_fasta.DEFAULT_PROFILE,
+                        choices=sorted(synthetic_fasta.PROFILES))
+    parser.add_argument('--line-widths',
+                        default=str(synthetic_fasta.DEFAULT_LINE_WIDTH),
+                        help='comma separated, 0 for unwrapped')
+    parser.add_argument('--assemblies', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR)
+    parser.add_argument('--output', help='JSON results file')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--in-process', action='store_true',
+                        help="don't run each scenario in a fresh process")
+    parser.add_argument('--verbose', action='store_true',
+                        help='show the method logs')
+    args = parser.parse_args()
+
+    scenarios = []
+    for method in args.methods.split(','):
+        if method not in METHODS:
+            parser.error('unknown method ' + method)
+        for size in args.sizes.split(','):
+            for line_width in args.line_widths.split(','):
+                scenarios.append({'method': method,
+                                  'n_contigs': int(size),
+                                  'profile': args.profile,
+                                  'line_width': int(line_width),
+                                  'assemblies': args.assemblies,
+                                  'work_dir': args.work_dir,
+                                  'in_process': args.in_process,
+                                  'verbose': args.verbose})
+    results = run_benchmarks(scenarios, args.repeat)
+    output = {'commit': _git_commit(),
+              'date': datetime.utcnow().isoformat(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as output_handle:
+            json.dump(output, output_handle, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_handle:
+            compare(results, json.load(baseline_handle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic FASTA assemblies for benchmarking.
+
+Contig lengths are drawn from lognormal distributions that resemble real
+assemblies (a few long contigs for an isolate, a long tail of short contigs
+for a metagenome), and sequence is cut from a random base pool so that even
+10M contig files are written at disk speed.  Lines are wrapped at line_width
+bases, or not at all with line_width=0.
+
+    python synthetic_fasta.py --contigs 100000 --profile metagenome \
+        --line-width 60 out.fa
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+# median contig length, lognormal sigma, minimum and maximum length
+PROFILES = {
+    'isolate':    {'median': 60000, 'sigma': 1.3, 'min': 500, 'max': 5000000},
+    'draft':      {'median': 4000,  'sigma': 1.2, 'min': 200, 'max': 1000000},
+    'metagenome': {'median': 900,   'sigma': 0.9, 'min': 200, 'max': 500000},
+    'uniform':    {'median': 1000,  'sigma': 0.0, 'min': 1000, 'max': 1000},
+}
+DEFAULT_PROFILE = 'draft'
+DEFAULT_LINE_WIDTH = 60
+# random bases are cut from a pool of this many bases
+POOL_BASES = 4 * 1024 * 1024
+# contigs are written in batches of this many
+WRITE_BATCH = 10000
+
+
+def contig_lengths(n_contigs, profile=DEFAULT_PROFILE, seed=0):
+    """Draw n_contigs lengths for a length profile, as an int64 array."""
+    params = PROFILES[profile]
+    rng = np.random.RandomState(seed)
+    if params['sigma'] == 0:
+        lens = np.full(n_contigs, params['median'], dtype=np.int64)
+    else:
+        lens = rng.lognormal(np.log(params['median']), params['sigma'],
+                             n_contigs)
+        lens = np.clip(lens, params['min'], params['max']).astype(np.int64)
+    return lens
+
+
+def _base_pool(n_bases, gc, rng, line_width):
+    at = (1.0 - gc) / 2.0
+    bases = rng.choice(np.frombuffer(b'ACGT', dtype=np.uint8), size=n_bases,
+                       p=[at, gc / 2.0, gc / 2.0, at])
+    if line_width:
+        # a newline after every line_width bases, so any slice starting at a
+        # multiple of line_width+1 is a run of whole, wrapped lines
+        n_bases -= n_bases % line_width
+        rows = bases[:n_bases].reshape(-1, line_width)
+        newlines = np.full((rows.shape[0], 1), ord('\n'), dtype=np.uint8)
+        bases = np.hstack([rows, newlines]).ravel()
+    return bases.tobytes()
+
+
+def _wrapped_seq(pool, start, seq_len, line_width):
+    if not line_width:
+        if seq_len <= len(pool) - start:
+            return pool[start:start + seq_len] + b'\n'
+        reps = seq_len // len(pool) + 2
+        return (pool * reps)[start:start + seq_len] + b'\n'
+    n_bytes = seq_len + seq_len // line_width
+    if n_bytes <= len(pool) - start:
+        seq = pool[start:start + n_bytes]
+    else:
+        reps = n_bytes // len(pool) + 2
+        seq = (pool * reps)[start:start + n_bytes]
+    if seq_len % line_width:
+        seq += b'\n'
+    return seq
+
+
+def write_fasta(path, lens, line_width=DEFAULT_LINE_WIDTH, gc=0.5, seed=0,
+                name_prefix='contig'):
+    """Write a FASTA file with contigs of the given lengths."""
+    rng = np.random.RandomState(seed + 1)
+    pool = _base_pool(POOL_BASES, gc, rng, line_width)
+    step = line_width + 1 if line_width else 1
+    n_starts = len(pool) // step
+    starts = rng.randint(0, n_starts, size=len(lens)) * step
+    with open(path, 'wb') as fasta_handle:
+        for batch_start in range(0, len(lens), WRITE_BATCH):
+            chunk = []
+            for i in range(batch_start, min(batch_start + WRITE_BATCH,
+                                            len(lens))):
+                chunk.append(b'>' + name_prefix.encode() + b'_' +
+                             str(i + 1).encode() + b' len=' +
+                             str(int(lens[i])).encode() + b'\n')
+                chunk.append(_wrapped_seq(pool, int(starts[i]), int(lens[i]),
+                                          line_width))
+            fasta_handle.write(b''.join(chunk))
+    return path
+
+
+def generate_assembly(path, n_contigs, profile=DEFAULT_PROFILE,
+                      line_width=DEFAULT_LINE_WIDTH, gc=0.5, seed=0):
+    """
+    Write a synthetic assembly and return a description of it, including
+    the contig lengths, for checking results against.
+    """
+    lens = contig_lengths(n_contigs, profile, seed)
+    write_fasta(path, lens, line_width, gc, seed)
+    return {'path': path,
+            'n_contigs': int(n_contigs),
+            'total_bp': int(lens.sum()),
+            'file_bytes': os.path.getsize(path),
+            'profile': profile,
+            'line_width': line_width,
+            'gc': gc,
+            'seed': seed,
+            'lens': lens}
+
+
+def cached_assembly(work_dir, n_contigs, profile=DEFAULT_PROFILE,
+                    line_width=DEFAULT_LINE_WIDTH, gc=0.5, seed=0):
+    """generate_assembly(), reusing a file made earlier with the same args."""
+    name = '{}_{}_w{}_gc{}_s{}'.format(profile, n_contigs, line_width,
+                                       int(gc * 100), seed)
+    path = os.path.join(work_dir, name + '.fa')
+    meta_path = path + '.json'
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as meta_handle:
+            meta = json.load(meta_handle)
+        meta['lens'] = contig_lengths(n_contigs, profile, seed)
+        return meta
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    meta = generate_assembly(path, n_contigs, profile, line_width, gc, seed)
+    with open(meta_path, 'w') as meta_handle:
+        json.dump({k: v for k, v in meta.items() if k != 'lens'}, meta_handle)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('output', help='FASTA file to write')
+    parser.add_argument('--contigs', type=int, default=1000)
+    parser.add_argument('--profile', choices=sorted(PROFILES),
+                        default=DEFAULT_PROFILE)
+    parser.add_argument('--line-width', type=int, default=DEFAULT_LINE_WIDTH,
+                        help='bases per line, 0 for unwrapped')
+    parser.add_argument('--gc', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    meta = generate_assembly(args.output, args.contigs, args.profile,
+                             args.line_width, args.gc, args.seed)
+    del meta['lens']
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == '__main__':
+    main()
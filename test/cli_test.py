@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare import cli
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.fasta_dir = os.path.join(self.scratch, 'assemblies')
+        os.makedirs(self.fasta_dir)
+        self._write('a.fa', [('c1', 'A' * 1500), ('c2', 'C' * 600),
+                             ('c3', 'G' * 20)])
+        self._write('b.fasta', [('d1', 'T' * 12000)])
+        with open(os.path.join(self.fasta_dir, 'notes.txt'), 'w') as handle:
+            handle.write('not a FASTA file\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def _write(self, name, records, width=60):
+        with open(os.path.join(self.fasta_dir, name), 'w') as handle:
+            for contig_id, seq in records:
+                handle.write('>'+contig_id+' desc\n')
+                for i in range(0, len(seq), width):
+                    handle.write(seq[i:i+width]+'\n')
+
+    def _run(self, argv):
+        out = io.StringIO()
+        self.assertEqual(cli.main(argv, out), 0)
+        return out.getvalue()
+
+    def test_stats(self):
+        lines = self._run(['stats', self.fasta_dir, '--jobs', '2']).split('\n')
+        columns = lines[0].split('\t')
+        rows = [dict(zip(columns, line.split('\t'))) for line in lines[1:3]]
+        self.assertEqual([row['assembly'] for row in rows], ['a', 'b'])
+        self.assertEqual(rows[0]['contigs'], '3')
+        self.assertEqual(rows[0]['total_len'], '2120')
+        self.assertEqual(rows[0]['N50'], '1500')
+        self.assertEqual(rows[0]['num_contigs_ge_500'], '2')
+        self.assertEqual(rows[1]['len_contigs_ge_10000'], '12000')
+
+    def test_stats_colors(self):
+        stats = json.loads(self._run(['stats', self.fasta_dir, '--format',
+                                      'json', '--colors']))
+        self.assertEqual(stats[1]['colors']['max_len'], '#bbbbff')
+        self.assertEqual(stats[0]['colors']['max_len'], '#ffbbbb')
+        # both have L50 1
+        self.assertEqual(stats[0]['colors']['L50'], '#ffffff')
+        lines = self._run(['stats', self.fasta_dir, '--colors']).split('\n')
+        row = dict(zip(lines[0].split('\t'), lines[2].split('\t')))
+        self.assertEqual(row['N50_color'], '#bbbbff')
+
+    def test_filter(self):
+        output_dir = os.path.join(self.scratch, 'filtered')
+        out = self._run(['filter', os.path.join(self.fasta_dir, 'a.fa'),
+                         '--min-contig-length', '500',
+                         '--output-dir', output_dir, '--jobs', '1'])
+        self.assertIn('a\t3\t2\t', out)
+        with open(os.path.join(output_dir,
+                               'a.min_contig_length500bp.fa')) as handle:
+            self.assertEqual(handle.read(), '>c1 desc\n' + 'A' * 1500 +
+                             '\n>c2 desc\n' + 'C' * 600 + '\n')
+
+    def test_compare(self):
+        report_dir = os.path.join(self.scratch, 'report')
+        out = self._run(['compare', self.fasta_dir, '--output-dir',
+                         report_dir])
+        self.assertIn('ASSEMBLY STATS for a', out)
+        self.assertIn('ASSEMBLY STATS for b', out)
+        self.assertTrue(os.path.exists(
+            os.path.join(report_dir, 'contig_distribution_report.html')))
+        self.assertTrue(os.path.exists(
+            os.path.join(report_dir, 'histograms',
+                         'hist_len_plot-b_hist_window_10000-100000.png')))
+        self.assertIn('Stats file: ' +
+                      os.path.join(report_dir, 'contig_length_stats.tsv'), out)
+
+    def test_compare_gaps(self):
+        self._write('s.fa', [('s1', 'A' * 700 + 'N' * 25 + 'C' * 300),
+                             ('s2', 'GGNNNNG')])
+        out = self._run(['compare', os.path.join(self.fasta_dir, 's.fa'),
+                         '--min-gap-length', '4'])
+        self.assertIn('\tGaps (N-runs >= 4 bp):\t2 (29 bp)\n', out)
+        self.assertIn('\tContigs split at gaps:\t4\n', out)
+        self.assertIn('\tContig N50 (L50):\t700 (1)\n', out)
+        self.assertIn('\tN50 (L50):\t1025 (1)\n', out)
+        self.assertEqual(cli.main(['compare', self.fasta_dir,
+                                   '--min-gap-length', '0'],
+                                  io.StringIO()), 1)
+
+    def test_compare_duplicates(self):
+        seq = 'AACGTTGCAG' * 100
+        rev_comp = seq[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+        dup_dir = os.path.join(self.scratch, 'dups')
+        os.makedirs(dup_dir)
+        self.fasta_dir = dup_dir
+        self._write('x.fa', [('x1', seq), ('x2', seq), ('x3', 'A' * 700)])
+        self._write('y.fa', [('y1', rev_comp.lower()), ('y2', 'C' * 700)])
+        out = self._run(['compare', dup_dir, '--duplicates'])
+        self.assertIn('\tDuplicate contigs within assembly:\t1 (1000 bp)\n',
+                      out)
+        self.assertIn('\tContigs shared with other assemblies:\t2 '
+                      '(2000 bp)\n', out)
+        self.assertIn('\tDistinct contig sequences:\t3 of 5 contigs\n', out)
+        self.assertIn('\tRedundant copies:\t2 (2000 bp)\n', out)
+        self.assertNotIn('Duplicate contigs',
+                         self._run(['compare', dup_dir]))
+
+    def test_combine(self):
+        combined_path = os.path.join(self.scratch, 'combined.fa')
+        # a copy of c1, and a reverse complement within d1 as is c1
+        self._write('c.fa', [('e1', 'A' * 1500), ('e2', 'A' * 1000)])
+        out = self._run(['combine', self.fasta_dir, '--output', combined_path,
+                         '--kmer-scale', '1'])
+        self.assertIn('COMBINED ASSEMBLY of 3 assemblies', out)
+        self.assertIn('\tExact duplicates removed:\t1 (1500 bp)\n', out)
+        self.assertIn('\tContained contigs removed:\t2 (2500 bp)\n', out)
+        self.assertIn('Combined assembly: '+combined_path+'\n', out)
+        with open(combined_path) as handle:
+            self.assertEqual([line for line in handle.read().split('\n')
+                              if line.startswith('>')],
+                             ['>a.c2 desc', '>a.c3 desc', '>b.d1 desc'])
+        out = self._run(['combine', self.fasta_dir, '--output', combined_path,
+                         '--keep-contained'])
+        self.assertNotIn('Contained contigs removed', out)
+        self.assertIn('\tContigs kept:\t5 (15120 bp)\n', out)
+
+    def test_protein_fasta_skipped(self):
+        self._write('proteins.faa', [('p1', 'MKVLAT' * 50)])
+        self.assertEqual(sorted(os.path.basename(path) for path in
+                                cli.find_fasta_files([self.fasta_dir])),
+                         ['a.fa', 'b.fasta'])
+
+    def test_missing_input(self):
+        self.assertEqual(cli.main(['stats', os.path.join(self.scratch, 'x')],
+                                  io.StringIO()), 1)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare import contig_combine
+
+
+def rev_comp(seq):
+    return seq[::-1].translate(str.maketrans('ACGTacgt', 'TGCAtgca'))
+
+
+class ContigCombineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        rand = random.Random(5)
+        self.big = ''.join(rand.choice('ACGT') for _ in range(3000))
+        self.other = ''.join(rand.choice('ACGT') for _ in range(2000))
+        # differs from the big contig at one base
+        self.nearly = self.big[1000:1400] + \
+            ('C' if self.big[1400] != 'C' else 'G') + self.big[1401:1600]
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def _write(self, name, records, width=60):
+        path = os.path.join(self.scratch, name)
+        with open(path, 'w') as handle:
+            for contig_id, seq in records:
+                handle.write('>'+contig_id+'\n')
+                for i in range(0, len(seq), width):
+                    handle.write(seq[i:i+width]+'\n')
+        return path
+
+    def _read(self, path):
+        records = []
+        with open(path) as handle:
+            for line in handle:
+                if line.startswith('>'):
+                    records.append([line[1:].rstrip('\n'), ''])
+                else:
+                    records[-1][1] += line.rstrip('\n')
+        return [tuple(record) for record in records]
+
+    def _combine(self, remove_contained=True, workers=1):
+        paths = [self._write('a.fa', [('a1 desc', self.big),
+                                      ('a2', self.big[500:900]),
+                                      ('a3', self.nearly)]),
+                 self._write('b.fa', [('b1', rev_comp(self.big).lower()),
+                                      ('b2', rev_comp(self.big[2000:2600])),
+                                      ('b3', self.other),
+                                      ('b4', 'ACGTAC')])]
+        combined_path = os.path.join(self.scratch, 'combined.fa')
+        combined = contig_combine.combine_assemblies(
+            paths, ['a', 'b'], combined_path, remove_contained, workers,
+            self.scratch, 1000, 15, 4)
+        return combined, self._read(combined_path)
+
+    def test_combine(self):
+        for workers in (1, 3):
+            combined, records = self._combine(workers=workers)
+            self.assertEqual(records, [('a.a1 desc', self.big),
+                                       ('a.a3', self.nearly),
+                                       ('b.b3', self.other),
+                                       ('b.b4', 'ACGTAC')])
+            self.assertEqual(combined['contigs'], [3, 4])
+            self.assertEqual(combined['duplicates'], [0, 1])
+            self.assertEqual(combined['duplicates_bp'], [0, 3000])
+            self.assertEqual(combined['contained'], [1, 1])
+            self.assertEqual(combined['contained_bp'], [400, 600])
+            self.assertEqual(combined['combined'], [2, 2])
+            self.assertEqual(combined['combined_bp'], [3600, 2006])
+            self.assertEqual(combined['unsampled'], 1)
+
+    def test_keep_contained(self):
+        combined, records = self._combine(remove_contained=False)
+        self.assertEqual([record[0] for record in records],
+                         ['a.a1 desc', 'a.a2', 'a.a3', 'b.b2', 'b.b3',
+                          'b.b4'])
+        self.assertEqual(combined['contained'], [0, 0])
+        text = contig_combine.combine_report_text(['a', 'b'], combined)
+        self.assertIn('\tExact duplicates removed:\t1 (3000 bp)\n', text)
+        self.assertNotIn('Contained', text)
+
+    def test_report_text(self):
+        combined, _ = self._combine()
+        text = contig_combine.combine_report_text(['a', 'b'], combined)
+        self.assertTrue(text.startswith('COMBINED ASSEMBLY of 2 assemblies'))
+        self.assertIn('\tInput contigs:\t7 (9606 bp)\n', text)
+        self.assertIn('\tContained contigs removed:\t2 (1000 bp)\n', text)
+        self.assertIn('\tContigs kept:\t4 (5606 bp)\n', text)
+        self.assertIn('\tToo short to look for in longer contigs:\t1\n', text)
+        self.assertIn('ASSEMBLY b\n\tInput contigs:\t4 (5606 bp)\n', text)
+
+    def test_nothing_to_remove(self):
+        paths = [self._write('a.fa', [('a1', self.big), ('a2', 'ACGT' * 5)]),
+                 self._write('b.fa', [('b1', self.other)]),
+                 self._write('empty.fa', [])]
+        combined_path = os.path.join(self.scratch, 'combined.fa')
+        for workers in (1, 3):
+            combined = contig_combine.combine_assemblies(
+                paths, ['a', 'b', 'empty'], combined_path, True, workers,
+                self.scratch, 1000, 15, 4)
+            self.assertEqual(combined['duplicates'], [0, 0, 0])
+            self.assertEqual(combined['contained'], [0, 0, 0])
+            self.assertEqual(combined['combined'], [2, 1, 0])
+            self.assertEqual([header for header, _ in
+                              self._read(combined_path)],
+                             ['a.a1', 'a.a2', 'b.b1'])
+        # one short contig and an empty file
+        combined = contig_combine.combine_assemblies(
+            [self._write('short.fa', [('s1', self.big[:20])]), paths[2]],
+            ['short', 'empty'], combined_path)
+        self.assertEqual(combined['combined'], [1, 0])
+        self.assertEqual(combined['unsampled'], 1)
+
+    def test_header_prefixes(self):
+        self.assertEqual(contig_combine.header_prefixes(['a b', 'x', 'x']),
+                         ['a_b.', 'x_2.', 'x_3.'])
+
+    def test_bad_params(self):
+        path = self._write('a.fa', [('a1', self.big)])
+        out_path = os.path.join(self.scratch, 'out.fa')
+        with self.assertRaises(ValueError):
+            contig_combine.combine_assemblies([path], ['a'], out_path,
+                                              kmer_length=33)
+        with self.assertRaises(ValueError):
+            contig_combine.combine_assemblies([path], ['a'], out_path,
+                                              kmer_scale=0)
+        with self.assertRaises(ValueError):
+            contig_combine.combine_assemblies([path], [], out_path)
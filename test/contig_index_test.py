@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from kb_assembly_compare import contig_index
+
+
+class ContigIndexTest(unittest.TestCase):
+
+    def test_duplicate_stats(self):
+        # digests 1 and 2 share a length of 100 but are different sequences
+        lens = [[100, 100, 100, 50], [100, 70], [50, 30]]
+        digests = [[1, 1, 2, 3], [1, 4], [3, 5]]
+        duplicates = contig_index.duplicate_stats(lens, digests)
+        self.assertEqual(duplicates['within'], [1, 0, 0])
+        self.assertEqual(duplicates['within_bp'], [100, 0, 0])
+        self.assertEqual(duplicates['shared'], [3, 1, 1])
+        self.assertEqual(duplicates['shared_bp'], [250, 100, 50])
+        self.assertEqual(duplicates['contigs'], 8)
+        self.assertEqual(duplicates['distinct'], 5)
+        self.assertEqual(duplicates['distinct_shared'], 2)
+        self.assertEqual(duplicates['redundant'], 3)
+        self.assertEqual(duplicates['redundant_bp'], 250)
+
+    def test_length_is_part_of_the_key(self):
+        duplicates = contig_index.duplicate_stats([[10], [11]], [[7], [7]])
+        self.assertEqual(duplicates['shared'], [0, 0])
+        self.assertEqual(duplicates['distinct'], 2)
+
+    def test_digest_per_contig(self):
+        with self.assertRaises(ValueError):
+            contig_index.duplicate_stats([[10, 20]], [[1]])
+
+    def test_first_copies(self):
+        is_first = contig_index.first_copies([[100, 100, 50], [100, 70]],
+                                             [[1, 1, 3], [1, 4]])
+        self.assertEqual([ass_first.tolist() for ass_first in is_first],
+                         [[True, False, True], [False, True]])
+
+    def test_containment_candidates(self):
+        # contig 1 has all the hashes of contigs 0 and 3, contig 2 those of 3
+        # only, and contig 4 has no hashes
+        lens = [100, 500, 300, 50, 10]
+        kmer_counts = [2, 4, 2, 1, 0]
+        kmer_hashes = [5, 9, 1, 5, 7, 9, 2, 7, 7]
+        candidates = contig_index.containment_candidates(lens, kmer_counts,
+                                                         kmer_hashes)
+        self.assertEqual([(contig, longer.tolist())
+                          for contig, longer in candidates],
+                         [(0, [1]), (3, [1, 2])])
+        probes = contig_index.MAX_PROBES
+        try:
+            contig_index.MAX_PROBES = 1
+            self.assertEqual([(contig, longer.tolist()) for contig, longer in
+                              contig_index.containment_candidates(
+                                  lens, kmer_counts, kmer_hashes)],
+                             [(0, [1]), (3, [1, 2])])
+        finally:
+            contig_index.MAX_PROBES = probes
+        contained = contig_index.contained_contigs(
+            lens, kmer_counts, kmer_hashes,
+            lambda contig, longer_contig: (contig, longer_contig) != (3, 1))
+        self.assertEqual(contained.tolist(), [True, False, False, True, False])
+        with self.assertRaises(ValueError):
+            contig_index.containment_candidates(lens, kmer_counts, [1])
+
+    def test_no_containment_candidates(self):
+        self.assertEqual(contig_index.containment_candidates(
+            [10, 20], [1, 1], [1, 2]), [])
+        self.assertEqual(contig_index.containment_candidates([], [], []), [])
+        self.assertEqual(contig_index.contained_contigs(
+            [10, 20], [1, 1], [1, 2], None).tolist(), [False, False])
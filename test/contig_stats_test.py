@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare import contig_stats
+
+
+class ContigStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_read_contig_lengths(self):
+        path = os.path.join(self.scratch, 'a.fa')
+        with open(path, 'w') as handle:
+            handle.write('>c1 desc\nACGT\nAC\n>c2\n\n>c3\nA C\n')
+        self.assertEqual(contig_stats.read_contig_lengths(path), [6, 2])
+
+    def test_n_stats(self):
+        lens = contig_stats.sort_lens([10, 40, 20, 30])
+        cumulative, total_len = contig_stats.cumulative_lens(lens)
+        self.assertEqual(cumulative, [40, 70, 90, 100])
+        N, L = contig_stats.n_stats(lens, cumulative, total_len)
+        self.assertEqual(N, {50: 30, 75: 20, 90: 20})
+        self.assertEqual(L, {50: 2, 75: 3, 90: 3})
+
+    def test_bucket_counts(self):
+        lens = contig_stats.sort_lens([2000000, 5000, 999, 500, 1])
+        counts, bp = contig_stats.bucket_counts(lens)
+        self.assertEqual(counts, {1000000: 1, 100000: 1, 10000: 1, 1000: 2,
+                                  500: 4, 1: 5})
+        self.assertEqual(bp[1000], 2005000)
+        self.assertEqual(bp[1], 2006500)
+
+    def test_length_histograms(self):
+        lens = contig_stats.sort_lens([250000, 20000, 1200, 300])
+        max_len = lens[0]
+        binwidth = contig_stats.hist_binwidths(max_len)
+        hist_cnt_by_bin = contig_stats.length_histograms(
+            lens, max_len, binwidth)
+        self.assertEqual([sum(cnts) for cnts in hist_cnt_by_bin], [2, 1, 1])
+        self.assertEqual(hist_cnt_by_bin[0][0], 1)
+        self.assertEqual(hist_cnt_by_bin[0][2], 1)
+        self.assertEqual(sum(hist_cnt_by_bin[2]), 1)
+        self.assertEqual(contig_stats.top_hist_counts([hist_cnt_by_bin]),
+                         [1, 1, 1])
+
+    def test_short_assembly_histogram(self):
+        # fewer bp than long contig bins: used to divide by zero
+        self.assertEqual(contig_stats.hist_binwidths(50)[2], 1)
+
+    def test_composition_stats(self):
+        # in file order: 40% GC, all N, 50% GC with a quarter ambiguous
+        composition = contig_stats.composition_stats(
+            [10, 5, 20], [4, 0, 8], [0, 5, 4])
+        self.assertAlmostEqual(composition['gc_fraction'], 12 / 26.0)
+        self.assertEqual(composition['ambiguous'], 9)
+        self.assertAlmostEqual(composition['ambiguous_fraction'], 9 / 35.0)
+        # longest first, as sort_lens() orders the lengths
+        self.assertEqual(composition['contig_gc'][:2].tolist(), [0.5, 0.4])
+        self.assertTrue(math.isnan(composition['contig_gc'][2]))
+        gc_hist = composition['gc_hist']
+        self.assertEqual(len(gc_hist), contig_stats.GC_BINS)
+        self.assertEqual(gc_hist[40], 10)
+        self.assertEqual(gc_hist[50], 20)
+        self.assertEqual(gc_hist.sum(), 30)
+        # all G+C falls in the last bin
+        self.assertEqual(contig_stats.composition_stats(
+            [3], [3], [0])['gc_hist'][-1], 3)
+
+    def test_gap_stats(self):
+        # a scaffold of 60 + 30 bp split by a 10 bp gap, and a 20 bp contig
+        gaps = contig_stats.gap_stats([100, 20], [1, 0], [10, 0], [60, 30])
+        self.assertEqual(gaps['gaps'], 1)
+        self.assertEqual(gaps['gap_bp'], 10)
+        self.assertEqual(gaps['contigs'], 3)
+        self.assertEqual(gaps['contig_len'], 110)
+        self.assertEqual(gaps['contig_N'], {50: 60, 75: 30, 90: 20})
+        self.assertEqual(gaps['contig_L'], {50: 1, 75: 2, 90: 3})
+        # all gap
+        self.assertEqual(contig_stats.gap_stats([10], [1], [10], [])[
+            'contig_N'], {50: 0, 75: 0, 90: 0})
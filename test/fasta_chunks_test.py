@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare import contig_stats, fasta_chunks, parallel_scan
+
+
+def text_lengths(fasta_path):
+    """The line by line text mode scan the byte scanner replaced."""
+    lens = []
+    with open(fasta_path, 'r') as ass_handle:
+        seq_buf = ''
+        for fasta_line in ass_handle:
+            if fasta_line.startswith('>'):
+                if seq_buf != '':
+                    lens.append(len(seq_buf))
+                    seq_buf = ''
+            else:
+                seq_buf += ''.join(fasta_line.split())
+        if seq_buf != '':
+            lens.append(len(seq_buf))
+    return lens
+
+
+def text_digest(seq):
+    """canonical_digest() of a str sequence without whitespace."""
+    forward = seq.upper()
+    reverse = forward.translate(str.maketrans('ACGTUNRYKMBVDHSW',
+                                              'TGCAANYRMKVBHDSW'))[::-1]
+    return int.from_bytes(hashlib.sha1(min(forward, reverse).encode())
+                          .digest()[:8], 'little', signed=True)
+
+
+def text_sampled_kmers(seq, kmer_length, kmer_scale):
+    """sampled_kmers() of a str sequence, one k-mer at a time."""
+    mask = 2**64 - 1
+
+    def _mix(value):
+        value ^= value >> 30
+        value = (value * 0xbf58476d1ce4e5b9) & mask
+        value ^= value >> 27
+        value = (value * 0x94d049bb133111eb) & mask
+        return value ^ (value >> 31)
+
+    def _packed(kmer):
+        return int(''.join(str('ACGT'.index(base)) for base in kmer), 4)
+
+    seq = seq.upper()
+    hashes = set()
+    for start in range(len(seq) - kmer_length + 1):
+        kmer = seq[start:start+kmer_length]
+        if set(kmer) - set('ACGT'):
+            continue
+        rev_comp = kmer.translate(str.maketrans('ACGT', 'TGCA'))[::-1]
+        kmer_hash = _mix(min(_packed(kmer), _packed(rev_comp)))
+        if kmer_hash <= mask // kmer_scale:
+            hashes.add(kmer_hash)
+    return sorted(hashes)
+
+
+def text_composition(fasta_path, min_gap_length=10, hash_contigs=False):
+    """The chunk_composition() lists from the text mode scan."""
+    seqs = []
+    with open(fasta_path, 'r') as ass_handle:
+        seq_buf = ''
+        for fasta_line in ass_handle:
+            if fasta_line.startswith('>'):
+                if seq_buf != '':
+                    seqs.append(seq_buf)
+                    seq_buf = ''
+            else:
+                seq_buf += ''.join(fasta_line.split())
+        if seq_buf != '':
+            seqs.append(seq_buf)
+    gap_re = re.compile('[Nn]{'+str(min_gap_length)+',}')
+    gaps = [gap_re.findall(seq) for seq in seqs]
+    split_lens = []
+    for seq, seq_gaps in zip(seqs, gaps):
+        if seq_gaps:
+            split_lens += [len(piece) for piece in gap_re.split(seq) if piece]
+    return ([len(seq) for seq in seqs],
+            [sum(seq.upper().count(base) for base in 'GC') for seq in seqs],
+            [len(seq) - sum(seq.upper().count(base) for base in 'ACGT')
+             for seq in seqs],
+            [len(seq_gaps) for seq_gaps in gaps],
+            [sum(len(gap) for gap in seq_gaps) for seq_gaps in gaps],
+            split_lens,
+            [text_digest(seq) for seq in seqs] if hash_contigs else [])
+
+
+def text_filter(fasta_path, filtered_path, min_contig_length):
+    """The line by line text mode filter the byte filter replaced."""
+    counts = [0, 0]
+    with open(fasta_path, 'r') as ass_handle, \
+            open(filtered_path, 'w') as filt_handle:
+        seq_buf = ''
+        last_header = ''
+        for fasta_line in ass_handle:
+            if fasta_line.startswith('>'):
+                if seq_buf != '':
+                    counts[0] += 1
+                    if len(seq_buf) >= min_contig_length:
+                        counts[1] += 1
+                        filt_handle.write(last_header)
+                        filt_handle.write(seq_buf+"\n")
+                    seq_buf = ''
+                last_header = fasta_line
+            else:
+                seq_buf += ''.join(fasta_line.split())
+        if seq_buf != '':
+            counts[0] += 1
+            if len(seq_buf) >= min_contig_length:
+                counts[1] += 1
+                filt_handle.write(last_header)
+                filt_handle.write(seq_buf+"\n")
+    return tuple(counts)
+
+
+class FastaChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def _write(self, name, text):
+        path = os.path.join(self.scratch, name)
+        with open(path, 'wb') as handle:
+            handle.write(text)
+        return path
+
+    def _random_fasta(self, name, n_contigs, seed=1):
+        rand = random.Random(seed)
+        records = []
+        for i in range(n_contigs):
+            seq = ''.join(rand.choice('ACGTN')
+                          for _ in range(rand.randint(0, 400)))
+            width = rand.choice([10, 60, 1000])
+            lines = [seq[j:j+width] for j in range(0, len(seq), width)]
+            records.append('>contig_'+str(i)+' len='+str(len(seq))+'\n' +
+                           ''.join(line+'\n' for line in lines))
+        return self._write(name, ''.join(records).encode())
+
+    def _check_against_text_scan(self, path, chunk_bytes, min_len=100):
+        chunks = fasta_chunks.plan_chunks(path, chunk_bytes)
+        # the chunks tile the file and start at records
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], os.path.getsize(path))
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start:start+1], b'>')
+
+        lens = []
+        for start, end in chunks:
+            lens.extend(fasta_chunks.chunk_lengths(path, start, end))
+        self.assertEqual(lens, text_lengths(path))
+        self.assertEqual(contig_stats.read_contig_lengths(path), lens)
+
+        expected_path = path+'.expected'
+        expected_counts = text_filter(path, expected_path, min_len)
+        for workers in (1, 2):
+            filtered_path = path+'.filtered'
+            counts = parallel_scan.filter_assemblies(
+                [path], [filtered_path], min_len, workers, chunk_bytes)
+            self.assertEqual(counts, [expected_counts])
+            with open(expected_path, 'rb') as expected, \
+                    open(filtered_path, 'rb') as filtered:
+                self.assertEqual(filtered.read(), expected.read())
+        return chunks
+
+    def test_chunked_matches_text_scan(self):
+        path = self._random_fasta('random.fa', 300)
+        for chunk_bytes in (1, 997, 10000, 10**9):
+            self._check_against_text_scan(path, chunk_bytes)
+        self.assertGreater(len(fasta_chunks.plan_chunks(path, 10000)), 5)
+
+    def test_odd_records(self):
+        # text before the first header, an empty record, CRLF line ends,
+        # spaces in a sequence, and a final line without a newline
+        path = self._write('odd.fa', b'ACGT\n>e\n>c1 x\r\nAC GT\r\nAAA\r\n'
+                                     b'>c2\nA\tC\n>c3\n' + b'G' * 150)
+        self.assertEqual(contig_stats.read_contig_lengths(path),
+                         [4, 7, 2, 150])
+        # '>' inside a header or sequence line does not start a record
+        path = self._write('gt.fa', b'>a>b\nAC>G\n>c\nT\n')
+        self.assertEqual(contig_stats.read_contig_lengths(path), [4, 1])
+        self._check_against_text_scan(path, 3, min_len=2)
+        for chunk_bytes in (1, 5, 10**6):
+            self._check_against_text_scan(path, chunk_bytes, min_len=3)
+
+    def test_parallel_scan_of_one_file(self):
+        path = self._random_fasta('one.fa', 200, seed=2)
+        expected = text_lengths(path)
+        self.assertEqual(parallel_scan.scan_contig_lengths(
+            [path, path], 3, self.scratch, 2000), [expected, expected])
+
+    def test_composition_matches_text_scan(self):
+        path = self._random_fasta('composition.fa', 300, seed=3)
+        odd_path = self._write('odd.fa', b'acgtn\n>e\n>c1 x\r\nAC GT\r\nRYN\r\n'
+                                         b'>c2\nG\tc\n>c3\n' + b'G' * 150)
+        gap_path = self._write('gaps.fa', b'>s1\nNNNACGTNNNNNNNN\nNNACnnnnnG\n'
+                                          b'>s2\nNNNN\n>s3\nACNNNG\n')
+        for fasta_path in (path, odd_path, gap_path):
+            for min_gap_length, hash_contigs in ((1, False), (3, True),
+                                                 (10, False)):
+                expected = text_composition(fasta_path, min_gap_length,
+                                            hash_contigs)
+                self.assertEqual(fasta_chunks.file_composition(
+                    fasta_path, min_gap_length, hash_contigs), expected)
+                self.assertEqual(expected[0], text_lengths(fasta_path))
+                for workers, chunk_bytes in ((1, 10**9), (2, 10**9),
+                                             (2, 997), (2, 7)):
+                    self.assertEqual(
+                        parallel_scan.scan_contig_composition(
+                            [fasta_path, fasta_path], workers, self.scratch,
+                            chunk_bytes, min_gap_length, hash_contigs),
+                        [dict(zip(parallel_scan.COMPOSITION_FIELDS,
+                                  expected),
+                              min_gap_length=min_gap_length)] * 2)
+        self.assertEqual(text_composition(odd_path)[:3],
+                         ([5, 7, 2, 150], [2, 2, 2, 150], [1, 3, 0, 0]))
+        # gaps at the ends, across lines and in lower case
+        self.assertEqual(text_composition(gap_path, 3)[3:],
+                         ([3, 1, 1], [18, 4, 3], [4, 2, 1, 2, 1], []))
+        self.assertEqual(text_composition(gap_path, 5)[3:],
+                         ([2, 0, 0], [15, 0, 0], [7, 2, 1], []))
+
+    def test_canonical_digest(self):
+        digest = fasta_chunks.canonical_digest
+        self.assertEqual(digest(b'AACGTTG\n'), digest(b'caa\ncgtt\n'))
+        self.assertEqual(digest(b'ACGRN'), digest(b'NYCGT'))
+        self.assertNotEqual(digest(b'AACG'), digest(b'AACC'))
+        self.assertEqual(digest(b'GATTACA'), text_digest('GATTACA'))
+
+    def test_composition_counts_in_blocks(self):
+        seq = b'GATTACA\nNNNN\n' * 100
+        block_bytes = fasta_chunks.COUNT_BLOCK_BYTES
+        try:
+            fasta_chunks.COUNT_BLOCK_BYTES = 64
+            self.assertEqual(fasta_chunks._seq_composition(seq)[:5],
+                             (1100, 200, 400, 0, 0))
+        finally:
+            fasta_chunks.COUNT_BLOCK_BYTES = block_bytes
+        self.assertEqual(fasta_chunks._seq_composition(seq, 4)[:5],
+                         (1100, 200, 400, 100, 400))
+
+    def test_sampled_kmers(self):
+        rand = random.Random(4)
+        seq = ''.join(rand.choice('ACGTacgtN') for _ in range(600))
+        rev_comp = seq[::-1].translate(str.maketrans('ACGTacgt', 'TGCAtgca'))
+        for kmer_length in (1, 5, 16, 31, 32):
+            hashes = fasta_chunks.sampled_kmers(seq.encode(), kmer_length, 3)
+            self.assertEqual(hashes.tolist(),
+                             text_sampled_kmers(seq, kmer_length, 3))
+            self.assertEqual(fasta_chunks.sampled_kmers(
+                rev_comp.encode(), kmer_length, 3).tolist(), hashes.tolist())
+        # the hashes of a contained sequence are among the others'
+        sub_hashes = fasta_chunks.sampled_kmers(
+            rev_comp[100:300].encode(), 15, 4)
+        self.assertTrue(set(sub_hashes.tolist()) <=
+                        set(fasta_chunks.sampled_kmers(
+                            seq.encode(), 15, 4).tolist()))
+        self.assertEqual(len(fasta_chunks.sampled_kmers(b'ACG', 5)), 0)
+
+    def test_contig_keys_and_kmers(self):
+        path = self._random_fasta('keys.fa', 100, seed=5)
+        offsets, lens, digests = fasta_chunks.file_contig_keys(path)
+        records = []
+        with open(path) as handle:
+            for line in handle:
+                if line.startswith('>'):
+                    records.append([line[1:].rstrip('\n'), ''])
+                else:
+                    records[-1][1] += line.rstrip('\n')
+        records = [record for record in records if record[1]]
+        self.assertEqual(lens, [len(seq) for _, seq in records])
+        self.assertEqual(digests, [text_digest(seq) for _, seq in records])
+        with fasta_chunks.mapped_file(path) as mm:
+            self.assertEqual(
+                [fasta_chunks.read_contig(mm, offset)[0].decode()
+                 for offset in offsets], [header for header, _ in records])
+        block_bases = fasta_chunks.KMER_BLOCK_BASES
+        try:
+            # contigs hashed alone and in batches
+            fasta_chunks.KMER_BLOCK_BASES = 300
+            counts, hashes = fasta_chunks.contig_kmers(path, offsets, 9, 2)
+        finally:
+            fasta_chunks.KMER_BLOCK_BASES = block_bases
+        expected = [text_sampled_kmers(seq, 9, 2) for _, seq in records]
+        self.assertEqual(counts, [len(seq_hashes) for seq_hashes in expected])
+        self.assertEqual(hashes.tolist(), [kmer_hash for seq_hashes in expected
+                                           for kmer_hash in seq_hashes])
+
+    def test_write_contigs(self):
+        path = self._write('write.fa', b'AC\n>a x\nAC\nGT\n>b\n\n>c\nT')
+        offsets = fasta_chunks.file_contig_keys(path)[0]
+        out_path = os.path.join(self.scratch, 'out.fa')
+        with open(out_path, 'wb') as out_handle:
+            fasta_chunks.write_contigs(path, offsets, out_handle, b'p.')
+        with open(out_path, 'rb') as out_handle:
+            self.assertEqual(out_handle.read(),
+                             b'>p.contig\nAC\n>p.a x\nACGT\n>p.c\nT\n')
+        self.assertTrue(fasta_chunks.contains_sequence(b'AACGTT', b'CGT'))
+        self.assertTrue(fasta_chunks.contains_sequence(b'AACCTT', b'AGG'))
+        self.assertFalse(fasta_chunks.contains_sequence(b'AACCTT', b'ACT'))
+
+    def test_empty_file(self):
+        path = self._write('empty.fa', b'')
+        self.assertEqual(fasta_chunks.plan_chunks(path), [])
+        self.assertEqual(contig_stats.read_contig_lengths(path), [])
+        filtered_path = path+'.filtered'
+        self.assertEqual(parallel_scan.filter_assemblies(
+            [path], [filtered_path], 1, 2), [(0, 0)])
+        self.assertEqual(os.path.getsize(filtered_path), 0)
+        self.assertEqual(parallel_scan.scan_contig_composition([path], 2),
+                         [{'lens': [], 'gc': [], 'ambiguous': [],
+                           'gaps': [], 'gap_bp': [], 'split_lens': [],
+                           'digests': [], 'min_gap_length': 10}])
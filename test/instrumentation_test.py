@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from kb_assembly_compare.instrumentation import RunTimer
+
+
+def _spin(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+class RunTimerTest(unittest.TestCase):
+
+    def test_stages_accumulate(self):
+        timer = RunTimer('run_test')
+        timer.stage('fetch')
+        timer.add_bytes(100)
+        time.sleep(0.05)
+        timer.stage('upload')
+        timer.add_bytes(10)
+        timer.stage('fetch')
+        timer.add_bytes(50)
+        timer.stop()
+        stages = {s['stage']: s for s in timer.to_dict()['stages']}
+        self.assertEqual(list(stages), ['fetch', 'upload'])
+        self.assertEqual(stages['fetch']['calls'], 2)
+        self.assertEqual(stages['fetch']['bytes'], 150)
+        self.assertGreaterEqual(stages['fetch']['wall_s'], 0.05)
+        self.assertGreater(stages['fetch']['peak_rss_bytes'], 0)
+        # bytes outside a stage are ignored
+        timer.add_bytes(1000)
+        self.assertEqual(timer.stages['upload'].nbytes, 10)
+
+    def test_span_resumes_open_stage(self):
+        timer = RunTimer('run_test')
+        timer.stage('render')
+        with timer.span('upload', nbytes=20):
+            pass
+        self.assertEqual(timer._current.name, 'render')
+        timer.stop()
+        self.assertEqual(timer.stages['render'].calls, 2)
+        self.assertEqual(timer.stages['upload'].nbytes, 20)
+
+    def test_cpu_includes_workers(self):
+        timer = RunTimer('run_test')
+        timer.stage('scan')
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            list(executor.map(_spin, [0.2, 0.2]))
+        timer.stop()
+        self.assertGreater(timer.stages['scan'].cpu, 0.3)
+        self.assertGreater(timer.total_cpu(), 0.3)
+
+    def test_format_table(self):
+        timer = RunTimer('run_test')
+        timer.stage('scan')
+        timer.stop()
+        lines = timer.format_table().split("\n")
+        self.assertEqual(lines[0], 'TIMING for run_test')
+        self.assertTrue(lines[2].startswith('scan'))
+        self.assertTrue(lines[-1].startswith('TOTAL'))
+
+    def test_format_table_open_stage(self):
+        # the table put in the report, while the report stage runs
+        timer = RunTimer('run_test')
+        timer.stage('scan')
+        timer.stage('report')
+        lines = timer.format_table().split("\n")
+        self.assertEqual([line.split()[0] for line in lines[2:-1]],
+                         ['scan', 'TOTAL'])
+        self.assertEqual(lines[-1],
+                         '(report still running, its open call not included)')
+        timer.stop()
+        self.assertEqual(timer.stages['report'].calls, 1)
+        self.assertTrue(timer.format_table().split("\n")[-1]
+                        .startswith('TOTAL'))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from installed_clients import jsoncodec
+
+
+class _JSONable(object):
+
+    def toJSONable(self):
+        return {'a': 1}
+
+
+class JSONCodecTest(unittest.TestCase):
+
+    def test_roundtrip_all_installed_codecs(self):
+        obj = {'id': '123', 'params': [{'ref': '1/2/3', 'n': 2 ** 70,
+                                        'x': 1.5, 'u': 'café'}],
+               'set': {3}, 'obj': _JSONable()}
+        expected = {'id': '123', 'params': [{'ref': '1/2/3', 'n': 2 ** 70,
+                                             'x': 1.5, 'u': 'café'}],
+                    'set': [3], 'obj': {'a': 1}}
+        for name in ('orjson', 'ujson', 'json'):
+            try:
+                codec = jsoncodec.get_codec(name)
+            except ImportError:
+                continue
+            self.assertEqual(codec.loads(codec.dumpb(obj)), expected, name)
+            self.assertEqual(codec.loads(codec.dumps(obj)), expected, name)
+            self.assertIsInstance(codec.dumps(obj), str)
+            self.assertIsInstance(codec.dumpb(obj), bytes)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            jsoncodec.get_codec('nope')
+
+    def test_bad_json_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            jsoncodec.loads(b'{"method": ')
+
+    def test_gzip(self):
+        body = jsoncodec.dumpb({'x': 'y' * 100000})
+        packed = jsoncodec.gzip_compress(body)
+        self.assertLess(len(packed), len(body))
+        self.assertEqual(jsoncodec.gzip_decompress(packed), body)
+        self.assertEqual(jsoncodec.maybe_gzip_decompress(packed), body)
+        self.assertEqual(jsoncodec.maybe_gzip_decompress(body), body)
+
+    def test_accepts_gzip(self):
+        self.assertTrue(jsoncodec.accepts_gzip('gzip, deflate'))
+        self.assertTrue(jsoncodec.accepts_gzip('deflate, GZIP;q=0.5'))
+        self.assertFalse(jsoncodec.accepts_gzip('gzip;q=0'))
+        self.assertFalse(jsoncodec.accepts_gzip('deflate'))
+        self.assertFalse(jsoncodec.accepts_gzip(None))
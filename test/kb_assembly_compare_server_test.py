@@ -167,6 +167,49 @@ class kb_assembly_compareTest(unittest.TestCase):
         pass
 
 
+    def test_combine_assemblies_01 (self):
+        method = 'combine_assemblies_01'
+        
+        print ("\n\nRUNNING: test_combine_assemblies_01()")
+        print ("=====================================\n\n")
+
+        # upload test data
+        try:
+            auClient = AssemblyUtil(self.callback_url, token=self.getContext()['token'])
+        except Exception as e:
+            raise ValueError('Unable to instantiate auClient with callbackURL: '+ self.callback_url +' ERROR: ' + str(e))
+        ass_file_1 = 'assembly_1.fa'
+        ass_file_2 = 'assembly_2.fa'
+        ass_path_1 = os.path.join(self.scratch, ass_file_1)
+        ass_path_2 = os.path.join(self.scratch, ass_file_2)
+        shutil.copy(os.path.join("data", ass_file_1), ass_path_1)
+        shutil.copy(os.path.join("data", ass_file_2), ass_path_2)
+        ass_ref_1 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_1},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_1'
+        })
+        ass_ref_2 = auClient.save_assembly_from_fasta({
+            'file': {'path': ass_path_2},
+            'workspace_name': self.getWsName(),
+            'assembly_name': 'assembly_2'
+        })
+
+        # run method
+        input_refs = [ ass_ref_1, ass_ref_2 ]
+        base_output_name = method+'_output'
+        params = {
+            'workspace_name': self.getWsName(),
+            'input_assembly_refs': input_refs,
+            'remove_contained_contigs': 1,
+            'output_name': base_output_name
+        }
+        result = self.getImpl().run_combine_assemblies(self.getContext(),params)
+        print('RESULT:')
+        pprint(result)
+        pass
+
+
     def HIDE_run_benchmark_assemblies_against_genomes_with_MUMmer4_01 (self):
         # Prepare test objects in workspace if needed using
         # self.getWsClient().save_objects({'workspace': self.getWsName(),
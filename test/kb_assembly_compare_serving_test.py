@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+# the Impl the server module builds on import needs a deploy config; the SDK
+# test environment has a real one
+_scratch = tempfile.mkdtemp()
+if not os.environ.get('KB_DEPLOYMENT_CONFIG'):
+    _config_path = os.path.join(_scratch, 'deploy.cfg')
+    with open(_config_path, 'w') as _config_handle:
+        _config_handle.write(
+            '[kb_assembly_compare]\n'
+            'workspace-url = http://localhost/fake/ws\n'
+            'shock-url = http://localhost/fake/shock\n'
+            'handle-service-url = http://localhost/fake/handle\n'
+            'srv-wiz-url = http://localhost/fake/srv_wiz\n'
+            'scratch = ' + _scratch + '\n')
+    os.environ['KB_DEPLOYMENT_CONFIG'] = _config_path
+os.environ.setdefault('SDK_CALLBACK_URL', 'http://localhost/fake/callback')
+
+import kb_assembly_compare.kb_assembly_compareServer as server  # noqa: E402
+
+
+def tearDownModule():
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+
+def _hold_slot(limiter, method_name, held):
+    held.put(limiter.acquire(method_name))
+
+
+class ServingTest(unittest.TestCase):
+    # the serving limits of the standalone server, without KBase services
+
+    def setUp(self):
+        self.config = server.config
+        self.method_limiter = server.application.method_limiter
+        self.added_methods = []
+
+    def tearDown(self):
+        server.config = self.config
+        self._set_limiter(self.method_limiter)
+        for method_name in self.added_methods:
+            del server.application.rpc_service.method_data[method_name]
+
+    def _add_method(self, method_name, method):
+        server.application.rpc_service.add(method, name=method_name,
+                                           types=[dict])
+        self.added_methods.append(method_name)
+
+    def _set_limiter(self, limiter):
+        server.application.method_limiter = limiter
+        server.application.rpc_service.method_limiter = limiter
+
+    def _batch_service(self, heavy_workers=None):
+        # run_sleep sleeps for its seconds and returns them, keeping count
+        # of the calls running at once
+        service = server.JSONRPCServiceCustom(
+            batch_workers=4, method_limiter=server.MethodLimiter(
+                ['test.run_sleep'], heavy_workers))
+        running = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def run_sleep(ctx, params):
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(params['seconds'])
+            with lock:
+                running['now'] -= 1
+            return [params['seconds']]
+
+        def fail(ctx, params):
+            raise ValueError('failed on purpose')
+
+        service.add(run_sleep, name='test.run_sleep', types=[dict])
+        service.add(fail, name='test.fail', types=[dict])
+        return service, running
+
+    def _batch_context(self):
+        ctx = server.MethodContext(None)
+        ctx.update({'module': 'test', 'method': 'run_sleep',
+                    'call_id': None, 'provenance': []})
+        return ctx
+
+    def _call_app(self, body):
+        body = json.dumps(body).encode('utf8')
+        environ = {'REQUEST_METHOD': 'POST',
+                   'CONTENT_LENGTH': str(len(body)),
+                   'REMOTE_ADDR': '127.0.0.1',
+                   'wsgi.input': io.BytesIO(body)}
+        started = {}
+
+        def start_response(status, headers):
+            started['status'] = status
+
+        response_body = b''.join(server.application(environ, start_response))
+        return started['status'], \
+            json.loads(response_body) if response_body else None
+
+    def test_get_config_int(self):
+        server.config = None
+        self.assertIsNone(server.get_config_int(server.WORKERS))
+        self.assertEqual(server.get_config_int(server.WORKERS, 4), 4)
+        server.config = {server.WORKERS: '', server.MAX_QUEUE: '3'}
+        self.assertEqual(server.get_config_int(server.WORKERS, 4), 4)
+        self.assertEqual(server.get_config_int(server.MAX_QUEUE, 8), 3)
+        self.assertEqual(server.get_config_int(server.HEAVY_WORKERS, 1), 1)
+
+    def test_method_limiter(self):
+        limiter = server.MethodLimiter(['m.run_a', 'm.run_b'], 2)
+        self.assertTrue(limiter.acquire('m.run_a'))
+        self.assertTrue(limiter.acquire('m.run_b'))
+        # the slots are shared by the heavy methods, and others aren't capped
+        self.assertFalse(limiter.acquire('m.run_a'))
+        self.assertTrue(limiter.acquire('m.status'))
+        limiter.release('m.run_b')
+        self.assertTrue(limiter.acquire('m.run_a'))
+        uncapped = server.MethodLimiter(['m.run_a'])
+        self.assertTrue(all(uncapped.acquire('m.run_a') for _ in range(10)))
+        with self.assertRaises(ValueError):
+            server.MethodLimiter(['m.run_a'], 0)
+
+    def test_method_limiter_across_processes(self):
+        fork = multiprocessing.get_context('fork')
+        limiter = server.MethodLimiter(['m.run_a'], 1)
+        limiter.share_between_processes()
+        held = fork.Queue()
+        proc = fork.Process(target=_hold_slot,
+                            args=(limiter, 'm.run_a', held))
+        proc.start()
+        self.assertTrue(held.get(timeout=30))
+        proc.join()
+        # the slot the other process took is taken here too
+        self.assertFalse(limiter.acquire('m.run_a'))
+        limiter.release('m.run_a')
+        self.assertTrue(limiter.acquire('m.run_a'))
+
+    def test_heavy_method_busy(self):
+        self._add_method('test.run_heavy', lambda ctx, params: [params])
+        self._set_limiter(server.MethodLimiter(['test.run_heavy'], 1))
+        request = {'version': '1.1', 'id': '1', 'method': 'test.run_heavy',
+                   'params': [{'x': 1}]}
+        status, response = self._call_app(request)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response['result'], [{'x': 1}])
+        server.application.method_limiter.acquire('test.run_heavy')
+        status, response = self._call_app(request)
+        self.assertEqual(status, server.SERVER_BUSY_STATUS)
+        self.assertEqual(response['error']['name'], 'Server busy')
+        self.assertEqual(response['id'], '1')
+
+    def test_full_queue_rejected(self):
+        entered = threading.Event()
+        release = threading.Event()
+
+        def blocking_app(environ, start_response):
+            entered.set()
+            release.wait(30)
+            start_response('200 OK', [('content-type', 'text/plain')])
+            return [b'done']
+
+        httpd = server.PooledWSGIServer(('localhost', 0),
+                                        server._WSGIRequestHandler,
+                                        workers=1, max_queue=0)
+        httpd.set_app(blocking_app)
+        port = httpd.server_address[1]
+        serving = threading.Thread(target=httpd.serve_forever)
+        serving.start()
+        first = {}
+
+        def first_request():
+            conn = http.client.HTTPConnection('localhost', port, timeout=30)
+            conn.request('POST', '/', body=b'{}')
+            first['status'] = conn.getresponse().status
+            conn.close()
+
+        requesting = threading.Thread(target=first_request)
+        try:
+            requesting.start()
+            self.assertTrue(entered.wait(30))
+            # the one worker is busy and nothing may queue
+            conn = http.client.HTTPConnection('localhost', port, timeout=30)
+            conn.request('POST', '/', body=b'{}')
+            response = conn.getresponse()
+            self.assertEqual(response.status, 503)
+            self.assertEqual(response.getheader('Retry-After'), '1')
+            self.assertEqual(json.loads(response.read())['error']['name'],
+                             'Server busy')
+            conn.close()
+        finally:
+            release.set()
+            requesting.join(30)
+            httpd.shutdown()
+            serving.join(30)
+            httpd.server_close()
+        self.assertEqual(first['status'], 200)
+
+    def test_batch_in_request_order(self):
+        service, running = self._batch_service()
+        batch = [{'version': '1.1', 'id': str(i), 'method': 'test.run_sleep',
+                  'params': [{'seconds': seconds}]}
+                 for i, seconds in enumerate([0.3, 0.1, 0.2])]
+        # a failing request and a notification among them
+        batch.insert(1, {'version': '1.1', 'id': 'bad', 'method': 'test.fail',
+                         'params': [{}]})
+        batch.append({'version': '1.1', 'method': 'test.run_sleep',
+                      'params': [{'seconds': 0.0}]})
+        responses = service.call_py(self._batch_context(), batch)
+        self.assertEqual([response['id'] for response in responses],
+                         ['0', 'bad', '1', '2'])
+        self.assertEqual([response.get('result') for response in responses],
+                         [[0.3], None, [0.1], [0.2]])
+        self.assertIn('failed on purpose', responses[1]['error']['error'])
+        self.assertGreater(running['max'], 1)
+
+    def test_batch_heavy_cap(self):
+        service, running = self._batch_service(heavy_workers=1)
+        batch = [{'version': '1.1', 'id': str(i), 'method': 'test.run_sleep',
+                  'params': [{'seconds': 0.3}]} for i in range(4)]
+        responses = service.call_py(self._batch_context(), batch)
+        self.assertEqual(running['max'], 1)
+        self.assertEqual([response['id'] for response in responses],
+                         ['0', '1', '2', '3'])
+        busy = [response for response in responses if 'error' in response]
+        self.assertLess(len(busy), 4)
+        self.assertTrue(busy)
+        for response in busy:
+            self.assertEqual(response['error']['name'], 'Server busy')
+        # the slot is free again after the batch
+        self.assertTrue(service.method_limiter.acquire('test.run_sleep'))
+
+    def test_batch_heavy_method_busy(self):
+        self._add_method('test.run_heavy', lambda ctx, params: [params])
+        self._add_method('test.light', lambda ctx, params: [params])
+        self._set_limiter(server.MethodLimiter(['test.run_heavy'], 1))
+        server.application.method_limiter.acquire('test.run_heavy')
+        status, responses = self._call_app([
+            {'version': '1.1', 'id': '1', 'method': 'test.run_heavy',
+             'params': [{}]},
+            {'version': '1.1', 'id': '2', 'method': 'test.light',
+             'params': [{'x': 2}]}])
+        # only the heavy request is refused
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(responses[0]['error']['name'], 'Server busy')
+        self.assertEqual(responses[1]['result'], [{'x': 2}])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from kb_assembly_compare import instrumentation
+from kb_assembly_compare.metrics import Histogram, ServiceMetrics
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_histogram_is_cumulative(self):
+        hist = Histogram('test_seconds', 'Test.', ['method'],
+                         buckets=(1, 10))
+        for value in (0.5, 5, 50):
+            hist.observe(value, method='m')
+        self.assertEqual(hist.render()[2:], [
+            'kb_assembly_compare_test_seconds_bucket{method="m",le="1"} 1',
+            'kb_assembly_compare_test_seconds_bucket{method="m",le="10"} 2',
+            'kb_assembly_compare_test_seconds_bucket{method="m",le="+Inf"} 3',
+            'kb_assembly_compare_test_seconds_sum{method="m"} 55.5',
+            'kb_assembly_compare_test_seconds_count{method="m"} 3'])
+
+    def test_requests(self):
+        metrics = ServiceMetrics()
+        metrics.request_started('run_x')
+        self.assertEqual(metrics.in_flight.get(method='run_x'), 1)
+        metrics.request_finished('run_x', 0.2, failed=True)
+        metrics.request_rejected('run_x')
+        self.assertEqual(metrics.in_flight.get(method='run_x'), 0)
+        text = metrics.render()
+        self.assertIn('kb_assembly_compare_requests_total{method="run_x"} 1',
+                      text)
+        self.assertIn(
+            'kb_assembly_compare_request_errors_total{method="run_x"} 1', text)
+        self.assertIn(
+            'kb_assembly_compare_requests_rejected_total{method="run_x"} 1',
+            text)
+        self.assertIn('# TYPE kb_assembly_compare_request_duration_seconds '
+                      'histogram', text)
+
+    def test_stage_listener(self):
+        metrics = ServiceMetrics()
+        instrumentation.add_stage_listener(metrics.observe_stage)
+        try:
+            timer = instrumentation.RunTimer('run_x')
+            timer.stage('scan')
+            timer.add_bytes(100)
+            timer.stage('upload')
+            timer.stage('scan')
+            timer.add_bytes(20)
+            timer.stop()
+        finally:
+            instrumentation.remove_stage_listener(metrics.observe_stage)
+        self.assertEqual(metrics.stage_bytes.get(method='run_x', stage='scan'),
+                         120)
+        self.assertIn('kb_assembly_compare_stage_duration_seconds_count'
+                      '{method="run_x",stage="scan"} 2', metrics.render())
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+os.environ.setdefault('SDK_CALLBACK_URL', 'http://localhost/fake/callback')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'benchmark'))
+
+from fake_services import FakeKBase, fake_config, fake_context, \
+    patch_impl  # noqa: E402
+import synthetic_fasta  # noqa: E402
+from kb_assembly_compare.kb_assembly_compareImpl import \
+    kb_assembly_compare  # noqa: E402
+
+
+class OfflineImplTest(unittest.TestCase):
+    # the app methods run against the in-process service fakes
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.kbase = FakeKBase(os.path.join(self.scratch, 'ws'))
+        self.impl = kb_assembly_compare(fake_config(self.scratch))
+        self.assemblies = []
+        self.refs = []
+        for i, line_width in enumerate((60, 0)):
+            path = os.path.join(self.scratch, 'assembly_%d.fa' % i)
+            self.assemblies.append(synthetic_fasta.generate_assembly(
+                path, 200, line_width=line_width, seed=i))
+            self.refs.append(self.kbase.add_assembly('assembly_%d' % i, path))
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_filter_contigs_by_length(self):
+        set_ref = self.kbase.add_assembly_set('assembly_set', self.refs)
+        with patch_impl(self.kbase):
+            ret = self.impl.run_filter_contigs_by_length(fake_context(), {
+                'workspace_name': self.kbase.workspace_name,
+                'input_assembly_refs': [set_ref],
+                'min_contig_length': 2000,
+                'output_name': 'filtered'})[0]
+        self.assertEqual(self.kbase.get_object(ret['report_ref'])['info'][1],
+                         ret['report_name'])
+        for i, assembly in enumerate(self.assemblies):
+            filtered = self.kbase.get_object(
+                'assembly_%d.min_contig_length2000bp' % i)
+            with open(filtered['path']) as filtered_handle:
+                n_contigs = sum(1 for line in filtered_handle
+                                if line.startswith('>'))
+            self.assertEqual(n_contigs, int((assembly['lens'] >= 2000).sum()))
+        self.assertEqual(self.kbase.calls['save_assembly_set_v1'], 1)
+
+    def test_contig_distribution_compare(self):
+        with patch_impl(self.kbase):
+            self.impl.run_contig_distribution_compare(fake_context(), {
+                'workspace_name': self.kbase.workspace_name,
+                'input_assembly_refs': self.refs})
+        report = self.kbase.reports[-1]
+        self.assertIn('TIMING for run_contig_distribution_compare',
+                      report['message'])
+        self.assertIn('\tGaps (N-runs >= 10 bp):\t0 (0 bp)\n',
+                      report['message'])
+        self.assertEqual(len(report['html_links']), 1)
+        self.assertGreater(len(report['file_links']), 0)
+        # the default stats file
+        names = [link['name'] for link in report['file_links']]
+        self.assertIn('contig_length_stats.tsv', names)
+        self.assertNotIn('contig_lengths.int64', names)
+
+    def test_contig_distribution_stats_export(self):
+        with patch_impl(self.kbase):
+            self.impl.run_contig_distribution_compare(fake_context(), {
+                'workspace_name': self.kbase.workspace_name,
+                'input_assembly_refs': self.refs,
+                'stats_format': 'json',
+                'dump_contig_lengths': 1})
+        links = {link['name']: link
+                 for link in self.kbase.reports[-1]['file_links']}
+        self.assertNotIn('contig_length_stats.tsv', links)
+        lens_path = self.kbase.shock[
+            links['contig_lengths.int64']['shock_id']]['path']
+        self.assertEqual(os.path.getsize(lens_path),
+                         8 * sum(len(assembly['lens'])
+                                 for assembly in self.assemblies))
+        self.assertIn('contig_length_stats.json', links)
+
+    def test_contig_distribution_duplicates(self):
+        copy_ref = self.kbase.add_assembly('assembly_copy',
+                                           self.assemblies[0]['path'])
+        with patch_impl(self.kbase):
+            self.impl.run_contig_distribution_compare(fake_context(), {
+                'workspace_name': self.kbase.workspace_name,
+                'input_assembly_refs': self.refs + [copy_ref],
+                'find_duplicate_contigs': 1})
+        n_contigs = len(self.assemblies[0]['lens'])
+        self.assertIn('\tContigs shared with other assemblies:\t' +
+                      str(n_contigs)+' (', self.kbase.reports[-1]['message'])
+
+    def test_output_dirs_unique(self):
+        # each call writes to its own output dir, so concurrent calls under
+        # thread serving don't overwrite each other's files
+        with patch_impl(self.kbase):
+            for _ in range(2):
+                self.impl.run_contig_distribution_compare(fake_context(), {
+                    'workspace_name': self.kbase.workspace_name,
+                    'input_assembly_refs': self.refs})
+        output_dirs = [name for name in os.listdir(self.scratch)
+                       if name.startswith('output.')]
+        self.assertEqual(len(output_dirs), 2)
+
+    def test_contig_distribution_min_gap_length(self):
+        with patch_impl(self.kbase):
+            with self.assertRaises(ValueError):
+                self.impl.run_contig_distribution_compare(fake_context(), {
+                    'workspace_name': self.kbase.workspace_name,
+                    'input_assembly_refs': self.refs,
+                    'min_gap_length': 0})
+            self.impl.run_contig_distribution_compare(fake_context(), {
+                'workspace_name': self.kbase.workspace_name,
+                'input_assembly_refs': self.refs,
+                'min_gap_length': '25'})
+        self.assertIn('\tGaps (N-runs >= 25 bp):\t',
+                      self.kbase.reports[-1]['message'])
+
+    def test_combine_assemblies(self):
+        set_ref = self.kbase.add_assembly_set('assembly_set', self.refs)
+        copy_ref = self.kbase.add_assembly('assembly_copy',
+                                           self.assemblies[0]['path'])
+        for remove_contained in (0, 1):
+            with patch_impl(self.kbase):
+                ret = self.impl.run_combine_assemblies(fake_context(), {
+                    'workspace_name': self.kbase.workspace_name,
+                    'input_assembly_refs': [set_ref, copy_ref],
+                    'remove_contained_contigs': remove_contained,
+                    'output_name': 'combined'})[0]
+            report = self.kbase.get_object(ret['report_ref'])
+            self.assertEqual(report['info'][1], ret['report_name'])
+            message = self.kbase.reports[-1]['message']
+            self.assertIn('COMBINED ASSEMBLY of 3 assemblies', message)
+            self.assertIn('ASSEMBLY assembly_copy\n\tInput contigs:\t' +
+                          str(len(self.assemblies[0]['lens'])), message)
+            self.assertEqual('Contained contigs removed' in message,
+                             remove_contained == 1)
+            with open(self.kbase.get_object('combined')['path']) as handle:
+                headers = [line for line in handle if line.startswith('>')]
+            self.assertFalse([header for header in headers
+                              if header.startswith('>assembly_copy.')])
+            self.assertLessEqual(len(headers),
+                                 sum(len(assembly['lens'])
+                                     for assembly in self.assemblies))
+        self.assertEqual(self.kbase.calls['save_assembly_from_fasta'], 2)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare import parallel_scan
+
+
+class ParallelScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.paths = []
+        # sizes chosen so that later files finish first
+        for i, lens in enumerate([[5000, 30, 7], [12, 4], [9], [1, 2, 3, 4]]):
+            path = os.path.join(self.scratch, str(i)+'.fa')
+            with open(path, 'w') as handle:
+                for j, contig_len in enumerate(lens):
+                    handle.write('>c'+str(j)+'\n'+'A'*contig_len+'\n')
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_scan_in_input_order(self):
+        expected = [[5000, 30, 7], [12, 4], [9], [1, 2, 3, 4]]
+        for workers in (1, 3):
+            self.assertEqual(parallel_scan.scan_contig_lengths(
+                self.paths, workers, self.scratch), expected)
+        # the length files are cleaned up
+        self.assertEqual(sorted(os.listdir(self.scratch)),
+                         ['0.fa', '1.fa', '2.fa', '3.fa'])
+
+    def test_filter_in_input_order(self):
+        filtered = [path+'.filtered' for path in self.paths]
+        counts = parallel_scan.filter_assemblies(self.paths, filtered, 4, 2)
+        self.assertEqual(counts, [(3, 3), (2, 2), (1, 1), (4, 1)])
+        with open(filtered[3]) as handle:
+            self.assertEqual(handle.read(), '>c3\nAAAA\n')
+
+    def test_scan_workers(self):
+        self.assertEqual(parallel_scan.scan_workers({'scan-workers': '3'}), 3)
+        self.assertEqual(parallel_scan.scan_workers({'scan-workers': '0'}), 1)
+        self.assertEqual(parallel_scan.scan_workers({}), os.cpu_count() or 1)
+
+    def test_contig_keys_and_kmers_in_input_order(self):
+        expected_lens = [[5000, 30, 7], [12, 4], [9], [1, 2, 3, 4]]
+        for workers in (1, 3):
+            keys = parallel_scan.scan_contig_keys(self.paths, workers,
+                                                  self.scratch, 100)
+            self.assertEqual([list(file_keys['lens']) for file_keys in keys],
+                             expected_lens)
+            self.assertEqual(list(keys[0]['offsets']), [0, 5005, 5040])
+            samples = parallel_scan.sample_contig_kmers(
+                self.paths, [file_keys['offsets'] for file_keys in keys],
+                workers, 100, 3, 1)
+            # every contig has the one k-mer AAA if it is long enough
+            self.assertEqual([counts for counts, _ in samples],
+                             [[1, 1, 1], [1, 1], [1], [0, 0, 1, 1]])
+            self.assertEqual(
+                [sum(len(hashes) for hashes in file_hashes)
+                 for _, file_hashes in samples], [3, 2, 1, 2])
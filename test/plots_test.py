@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from kb_assembly_compare import contig_compare, contig_stats, \
+    plots  # noqa: E402
+
+
+class PlotsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def _paths(self, name):
+        return (os.path.join(self.scratch, name+'.png'),
+                os.path.join(self.scratch, name+'.pdf'))
+
+    def test_renderer_reuses_one_figure(self):
+        with plots.FigureRenderer() as renderer:
+            fig = plots.plot_key(['a', 'b'], *self._paths('key'),
+                                 renderer=renderer)
+            self.assertIs(plots.plot_sorted_lengths(
+                [[5, 3, 1], [4, 4]], *self._paths('sorted'),
+                renderer=renderer), fig)
+            self.assertEqual(len(fig.axes), 1)
+            self.assertEqual(renderer.figures_drawn, 2)
+        self.assertIsNone(renderer.fig)
+        self.assertEqual(plt.get_fignums(), [])
+        for name in ('key', 'sorted'):
+            for path in self._paths(name):
+                self.assertGreater(os.path.getsize(path), 0)
+
+    def test_report_leaves_no_figures(self):
+        dist = contig_compare.compare_contig_distributions(
+            [[150000, 20000, 800, 300], [9000, 40]])
+        rendered = contig_compare.render_distribution_report(
+            ['a', 'b'], dist, os.path.join(self.scratch, 'report'))
+        self.assertEqual(len(os.listdir(rendered['hist_dir'])), 2 * 4)
+        gc.collect()
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertFalse([obj for obj in gc.get_objects()
+                          if isinstance(obj, Figure)])
+
+    def test_report_with_composition(self):
+        scans = [{'lens': [300, 150000], 'gc': [0, 75000],
+                  'ambiguous': [300, 0]},
+                 {'lens': [9000, 40], 'gc': [3000, 30], 'ambiguous': [0, 2]}]
+        dist = contig_compare.compare_contig_distributions(
+            [scan['lens'] for scan in scans], composition=scans)
+        self.assertEqual(dist['lens'], [[150000, 300], [9000, 40]])
+        rendered = contig_compare.render_distribution_report(
+            ['a', 'b'], dist, os.path.join(self.scratch, 'report'))
+        self.assertEqual([png for png, _, _ in rendered['figures'][3:]],
+                         ['gc_content_plot.png', 'length_vs_gc_plot.png'])
+        with open(os.path.join(self.scratch, 'report',
+                               rendered['html_file'])) as html_handle:
+            self.assertIn('src="length_vs_gc_plot.png"', html_handle.read())
+        # the all-ambiguous contig has no point
+        ax = plots.plot_length_vs_gc(
+            [(dist['lens'][ass_i], dist['composition'][ass_i]['contig_gc'])
+             for ass_i in range(2)], *self._paths('len_gc')).axes[0]
+        self.assertEqual(len(ax.collections), 1)
+        self.assertEqual(len(ax.collections[0].get_offsets()), 3)
+        text = contig_compare.distribution_report_text(['a', 'b'], dist)
+        self.assertIn("\tGC content:\t50.00 %\n", text)
+        self.assertIn("\tAmbiguous bases:\t300 bp (0.20 %)\n", text)
+
+    def test_histogram_draws_bin_counts(self):
+        lens = contig_stats.sort_lens([9999, 9500, 1200, 1000, 999, 300, 0])
+        binwidth = contig_stats.hist_binwidths(lens[0])
+        hist_cnt_by_bin = contig_stats.length_histograms(lens, lens[0],
+                                                         binwidth)
+        fig = plots.plot_length_histogram(
+            hist_cnt_by_bin[0], 0, contig_stats.hist_long_len(0, lens[0]),
+            binwidth[0], max(hist_cnt_by_bin[0]), *self._paths('hist'))
+        heights = [patch.get_height() for patch in fig.axes[0].patches]
+        self.assertEqual(heights[:len(hist_cnt_by_bin[0])],
+                         hist_cnt_by_bin[0])
+        self.assertFalse(any(heights[len(hist_cnt_by_bin[0]):]))
+        self.assertEqual(sum(heights), len(lens))
+
+    def test_comparison_lines_in_one_collection(self):
+        lens = [[5000000, 300000, 2000, 2000, 15], [40000, 900]]
+        ax = plots.plot_sorted_lengths(lens, *self._paths('sorted')).axes[0]
+        self.assertEqual(len(ax.lines), 0)
+        self.assertEqual(len(ax.collections), 1)
+        self.assertEqual(len(ax.collections[0].get_segments()), 2)
+        # the limits ax.plot() autoscales the step lines to
+        ref_ax = Figure().add_subplot(1, 1, 1)
+        for ass_lens in lens:
+            x_coords, y_coords, running_sum = [], [], 0
+            for val in ass_lens:
+                x_coords += [running_sum / 1e6, (running_sum + val) / 1e6]
+                y_coords += [val / 1e6, val / 1e6]
+                running_sum += val
+            ref_ax.plot(x_coords, y_coords)
+        for lim, ref_lim in ((ax.get_xlim(), ref_ax.get_xlim()),
+                             (ax.get_ylim(), ref_ax.get_ylim())):
+            self.assertAlmostEqual(lim[0], ref_lim[0])
+            self.assertAlmostEqual(lim[1], ref_lim[1])
+
+    def test_cumulative_single_contig(self):
+        fig = plots.plot_cumulative_lengths([[1200]], *self._paths('cum'))
+        xlim = fig.axes[0].get_xlim()
+        self.assertLess(xlim[0], 1)
+        self.assertGreater(xlim[1], 1)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_assembly_compare.instrumentation import RunTimer
+from kb_assembly_compare.profiling import MethodProfiler
+
+
+class _FakeDFU(object):
+
+    def __init__(self):
+        self.uploaded = []
+
+    def file_to_shock(self, params):
+        self.uploaded.append(params)
+        return {'shock_id': str(len(self.uploaded))}
+
+
+class MethodProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_off_by_default(self):
+        profiler = MethodProfiler('run_x', self.scratch, {})
+        profiler.start()
+        self.assertIsNone(profiler.stop())
+        self.assertEqual(profiler.upload(_FakeDFU()), [])
+        self.assertEqual(os.listdir(self.scratch), [])
+
+    def test_profile_with_tracemalloc(self):
+        config = {'profile-methods': 'run_y, run_x',
+                  'profile-tracemalloc': 'true', 'profile-top-n': '5'}
+        profiler = MethodProfiler('run_x', self.scratch, config)
+        timer = RunTimer('run_x')
+        profiler.start()
+        timer.stage('scan')
+        data = [str(i) for i in range(10000)]
+        timer.stage('stats')
+        sorted(data)
+        timer.stop()
+        summary_path = profiler.stop()
+
+        with open(summary_path) as summary_handle:
+            summary = summary_handle.read()
+        self.assertIn('top 5 functions by cumulative time', summary)
+        self.assertIn('traced memory at stage boundaries', summary)
+        self.assertIn('top allocation growth during scan', summary)
+        self.assertEqual(sorted(os.listdir(profiler.output_dir)),
+                         ['run_x.prof', 'run_x.profile.txt',
+                          'tracemalloc_scan.snapshot',
+                          'tracemalloc_stats.snapshot'])
+
+        dfu = _FakeDFU()
+        file_links = profiler.upload(dfu)
+        self.assertEqual([link['name'] for link in file_links],
+                         ['run_x.profile.txt', 'run_x_profile.zip'])
+        self.assertEqual(dfu.uploaded[1]['pack'], 'zip')
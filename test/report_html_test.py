@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import io
+import re
+import unittest
+
+from kb_assembly_compare import contig_compare, report_html
+
+
+class ReportHtmlTest(unittest.TestCase):
+
+    def _write(self, names, lens, **kwargs):
+        dist = contig_compare.compare_contig_distributions(lens)
+        html_handle = io.StringIO()
+        report_html.write_contig_distribution_html(
+            html_handle, names, dist['max_lens'], dist['N'], dist['L'],
+            dist['summary_stats'], dist['cumulative_len_stats'],
+            dist['scores'], dist['percs'], dist['len_buckets'], 'key.png',
+            'cum.png', 'sorted.png',
+            [['h'+str(i)+'.png'] for i in range(len(names))], **kwargs)
+        return html_handle.getvalue()
+
+    def test_cells_use_shared_classes(self):
+        page = self._write(['a', 'b', 'c'], [[5000, 300], [40000, 20, 10],
+                                             [900]])
+        self.assertNotIn('bgcolor', page)
+        self.assertEqual(page.count('<tbody '), 3)
+        classes = set(re.findall(r'\bc([0-9a-f]{6})\b', page))
+        self.assertTrue(classes)
+        for color in classes:
+            self.assertIn('td.c'+color+' { background: #'+color+'; }', page)
+        # the longest contig cell of the best assembly
+        self.assertIn('<td class="longest cbbbbff" rowspan=6>40000</td>',
+                      page)
+
+    def test_sort_keys_and_paging(self):
+        page = self._write(['<b>'], [[1200, 300]], page_size=10)
+        self.assertIn('data-name="&lt;b&gt;"', page)
+        self.assertIn('data-n50="1200"', page)
+        self.assertIn('data-length="1500"', page)
+        self.assertIn("pageSize.value = '10';", page)
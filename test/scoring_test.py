@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from kb_assembly_compare import contig_compare, scoring
+
+
+def reference_cell_color(val, best, worst, low_good=False):
+    """The scalar cell coloring the report used before scoring.py."""
+    if best == worst:
+        return '#ffffff'
+    digits = scoring.INTENSITY_DIGITS
+    base_intensity = 11
+    top = 15 - base_intensity
+    mid = 0.5 * (best + worst)
+    if val == mid:
+        return '#ffffff'
+    if (val < mid) if low_good else (val > mid):
+        rescaled_val = int(0.5 + top * (val-best) / (mid-best))
+        shade = digits[base_intensity + rescaled_val]
+        return '#'+shade+shade+'ff'
+    rescaled_val = int(0.5 + top * (val-worst) / (mid-worst))
+    shade = digits[base_intensity + rescaled_val]
+    return '#ff'+shade+shade
+
+
+class ScoringTest(unittest.TestCase):
+
+    def test_color_bins_match_reference(self):
+        rng = random.Random(3)
+        for _ in range(500):
+            hi = rng.choice([5, 100, 10**6, 10**12])
+            vals = [rng.randint(0, hi) for _ in range(rng.randint(1, 8))]
+            for low_good in (False, True):
+                best, worst = (min(vals), max(vals)) if low_good else \
+                    (max(vals), min(vals))
+                bins = scoring.color_bins([vals], [best], [worst],
+                                          [low_good])[0]
+                self.assertEqual(
+                    list(scoring.COLOR_LUT[bins]),
+                    [reference_cell_color(val, best, worst, low_good)
+                     for val in vals])
+
+    def test_score_assemblies(self):
+        dist = contig_compare.compare_contig_distributions(
+            [[150000, 20000, 800], [9000, 40], [9000, 8000, 7000]])
+        scores = dist['scores']
+        self.assertEqual(len(scores['metrics']), scores['values'].shape[0])
+        self.assertEqual(scores['values'].shape[1], 3)
+        max_len = scores['metrics'].index('max_len')
+        self.assertEqual(list(scores['values'][max_len]), [150000, 9000, 9000])
+        self.assertEqual(list(scoring.cell_colors(scores)[max_len]),
+                         ['#bbbbff', '#ffbbbb', '#ffbbbb'])
+        L50 = scores['metrics'].index('L50')
+        self.assertTrue(scores['low_good'][L50])
+        self.assertEqual(scores['best'][L50], 1)
+        self.assertEqual(scores['worst'][L50], 2)
+        self.assertEqual(dist['best_val']['L'][50], 1)
+        self.assertEqual(dist['worst_val']['len'], 9000)
+        self.assertEqual(dist['best_val']['summary_stats'][1], 3)
+
+    def test_cell_color(self):
+        self.assertEqual(scoring.cell_color(10, 10, 1), '#bbbbff')
+        self.assertEqual(scoring.cell_color(1, 10, 1), '#ffbbbb')
+        self.assertEqual(scoring.cell_color(5, 5, 5), '#ffffff')
+        self.assertEqual(scoring.cell_color(1, 1, 10, low_good=True),
+                         '#bbbbff')
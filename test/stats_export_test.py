@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from kb_assembly_compare import contig_compare, stats_export
+
+
+class StatsExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.lens = [[1500, 600, 20], [12000]]
+        self.dist = contig_compare.compare_contig_distributions(
+            [list(ass_lens) for ass_lens in self.lens])
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def test_parse_stats_formats(self):
+        self.assertEqual(stats_export.parse_stats_formats(None), ['tsv'])
+        self.assertEqual(stats_export.parse_stats_formats('json,tsv'),
+                         ['tsv', 'json'])
+        self.assertEqual(stats_export.parse_stats_formats('both'),
+                         ['tsv', 'json'])
+        self.assertEqual(stats_export.parse_stats_formats('none'), [])
+        with self.assertRaises(ValueError):
+            stats_export.parse_stats_formats('parquet')
+
+    def test_export(self):
+        files = stats_export.export_stats(['a', 'b'], self.dist, self.scratch,
+                                          ['tsv', 'json'], dump_lens=True)
+        self.assertEqual([name for name, _ in files],
+                         ['contig_length_stats.tsv',
+                          'contig_length_stats.json', 'contig_lengths.int64'])
+
+        with open(os.path.join(self.scratch,
+                               'contig_length_stats.tsv')) as tsv_handle:
+            lines = tsv_handle.read().splitlines()
+        columns = lines[0].split('\t')
+        self.assertEqual(columns, stats_export.stats_columns())
+        row = dict(zip(columns, lines[1].split('\t')))
+        self.assertEqual(row['assembly'], 'a')
+        self.assertEqual(row['total_len'], '2120')
+        self.assertEqual(row['N50'], '1500')
+        self.assertEqual(row['num_contigs_ge_500'], '2')
+
+        with open(os.path.join(self.scratch,
+                               'contig_length_stats.json')) as json_handle:
+            table = json.load(json_handle)
+        self.assertEqual(table['columns'], columns)
+        self.assertEqual(table['data']['contigs'], [3, 1])
+        self.assertEqual(table['data']['len_contigs_ge_10000'], [0, 12000])
+        self.assertEqual(table['colors']['max_len'], ['#ffbbbb', '#bbbbff'])
+
+        lens_file = table['contig_lengths']
+        all_lens = np.fromfile(os.path.join(self.scratch, lens_file['file']),
+                               dtype=lens_file['dtype'])
+        split = np.split(all_lens,
+                         np.cumsum(table['data'][lens_file['counts']])[:-1])
+        self.assertEqual([list(ass_lens) for ass_lens in split], self.lens)
+
+    def test_no_formats(self):
+        self.assertEqual(stats_export.export_stats(['a', 'b'], self.dist,
+                                                   self.scratch, []), [])